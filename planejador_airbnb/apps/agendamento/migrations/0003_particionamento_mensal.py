@@ -0,0 +1,154 @@
+"""
+Particiona `agendamento` por mês de check-in (PostgreSQL; em outros bancos não faz nada).
+
+A tabela é recriada como `PARTITION BY RANGE (data_checkin)`, com uma partição por mês
+(`agendamento_AAAAMM`) e a partição `agendamento_padrao` para datas sem partição, de modo que
+nenhuma inserção falhe. A função `criar_particao_agendamento(date)` cria a partição de um mês
+(movendo para ela as linhas que estiverem na padrão) e é usada pelo comando `manter_particoes`,
+pelo `gerar_dados_sinteticos` e pela ingestão do scraper.
+
+Como a chave primária de uma tabela particionada precisa conter a coluna de partição, ela passa a
+ser `(id, data_checkin)`; `id` continua vindo da mesma sequência e sendo único na prática. Pelo
+mesmo motivo não pode haver chave estrangeira apontando para `agendamento.id`: a de `anuncio` é
+removida (o Django continua apagando os anúncios em cascata).
+"""
+from datetime import date
+
+from django.db import migrations
+
+MESES_A_FRENTE = 18
+
+SQL_FUNCAO = """
+CREATE OR REPLACE FUNCTION criar_particao_agendamento(mes date) RETURNS text AS $$
+DECLARE
+    inicio date := date_trunc('month', mes)::date;
+    fim date := (date_trunc('month', mes) + interval '1 month')::date;
+    nome text := 'agendamento_' || to_char(mes, 'YYYYMM');
+BEGIN
+    IF to_regclass(nome) IS NOT NULL THEN
+        RETURN nome;
+    END IF;
+    EXECUTE format('CREATE TABLE %I (LIKE agendamento INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', nome);
+    EXECUTE format(
+        'WITH movidas AS (DELETE FROM agendamento_padrao WHERE data_checkin >= %L AND data_checkin < %L '
+        'RETURNING *) INSERT INTO %I SELECT * FROM movidas', inicio, fim, nome
+    );
+    EXECUTE format('ALTER TABLE agendamento ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)', nome, inicio, fim);
+    RETURN nome;
+END
+$$ LANGUAGE plpgsql;
+"""
+
+SQL_PARTICIONAR = """
+DO $$
+DECLARE
+    restricao record;
+BEGIN
+    FOR restricao IN
+        SELECT conrelid::regclass AS tabela, conname FROM pg_constraint
+        WHERE confrelid = 'agendamento'::regclass AND contype = 'f'
+    LOOP
+        EXECUTE format('ALTER TABLE %s DROP CONSTRAINT %I', restricao.tabela, restricao.conname);
+    END LOOP;
+END
+$$;
+
+ALTER TABLE agendamento RENAME TO agendamento_nao_particionado;
+ALTER TABLE agendamento_nao_particionado RENAME CONSTRAINT agendamento_pkey TO agendamento_nao_particionado_pkey;
+ALTER INDEX IF EXISTS agendamento_imovel_id_f20360a9 RENAME TO agendamento_nao_particionado_imovel_id;
+
+CREATE TABLE agendamento (
+    id bigint GENERATED BY DEFAULT AS IDENTITY,
+    imovel_id bigint NOT NULL,
+    data_checkin date NOT NULL,
+    data_checkout date NULL,
+    preco_total numeric(10, 2) NULL,
+    preco_por_dia numeric(10, 2) NULL,
+    hospedes integer NOT NULL CONSTRAINT agendamento_hospedes_check CHECK (hospedes >= 0),
+    link varchar(1024) NOT NULL,
+    CONSTRAINT agendamento_pkey PRIMARY KEY (id, data_checkin),
+    CONSTRAINT agendamento_imovel_id_f20360a9_fk_imovel_id FOREIGN KEY (imovel_id) REFERENCES imovel (id)
+        DEFERRABLE INITIALLY DEFERRED
+) PARTITION BY RANGE (data_checkin);
+CREATE INDEX agendamento_imovel_id_f20360a9 ON agendamento (imovel_id);
+CREATE TABLE agendamento_padrao PARTITION OF agendamento DEFAULT;
+"""
+
+SQL_COPIAR = """
+INSERT INTO agendamento (id, imovel_id, data_checkin, data_checkout, preco_total, preco_por_dia, hospedes, link)
+SELECT id, imovel_id, data_checkin, data_checkout, preco_total, preco_por_dia, hospedes, link
+FROM agendamento_nao_particionado;
+SELECT setval(pg_get_serial_sequence('agendamento', 'id'), coalesce(max(id), 0) + 1, false) FROM agendamento;
+DROP TABLE agendamento_nao_particionado;
+ANALYZE agendamento;
+"""
+
+
+def _somar_meses(mes, quantidade):
+    indice = mes.year * 12 + mes.month - 1 + quantidade
+    return date(indice // 12, indice % 12 + 1, 1)
+
+
+def _meses(inicio, fim):
+    mes = inicio.replace(day=1)
+    while mes <= fim:
+        yield mes
+        mes = _somar_meses(mes, 1)
+
+
+def particionar(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT min(data_checkin), max(data_checkin) FROM agendamento")
+        primeiro, ultimo = cursor.fetchone()
+        hoje = date.today()
+        inicio = min(primeiro or hoje, hoje)
+        fim = max(ultimo or hoje, _somar_meses(hoje.replace(day=1), MESES_A_FRENTE))
+
+        cursor.execute(SQL_PARTICIONAR)
+        cursor.execute(SQL_FUNCAO)
+        # Partições criadas antes da cópia: cada linha já vai direto para o seu mês
+        for mes in _meses(inicio, fim):
+            cursor.execute("SELECT criar_particao_agendamento(%s)", [mes])
+        cursor.execute(SQL_COPIAR)
+
+
+def desfazer(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("""
+            ALTER TABLE agendamento RENAME TO agendamento_particionado;
+            ALTER TABLE agendamento_particionado RENAME CONSTRAINT agendamento_pkey TO agendamento_particionado_pkey;
+            ALTER INDEX agendamento_imovel_id_f20360a9 RENAME TO agendamento_particionado_imovel_id;
+            CREATE TABLE agendamento (
+                id bigint GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+                imovel_id bigint NOT NULL REFERENCES imovel (id) DEFERRABLE INITIALLY DEFERRED,
+                data_checkin date NOT NULL,
+                data_checkout date NULL,
+                preco_total numeric(10, 2) NULL,
+                preco_por_dia numeric(10, 2) NULL,
+                hospedes integer NOT NULL CHECK (hospedes >= 0),
+                link varchar(1024) NOT NULL
+            );
+            CREATE INDEX agendamento_imovel_id_f20360a9 ON agendamento (imovel_id);
+            INSERT INTO agendamento SELECT id, imovel_id, data_checkin, data_checkout, preco_total,
+                   preco_por_dia, hospedes, link FROM agendamento_particionado;
+            SELECT setval(pg_get_serial_sequence('agendamento', 'id'), coalesce(max(id), 0) + 1, false)
+            FROM agendamento;
+            DROP TABLE agendamento_particionado;
+            DROP FUNCTION IF EXISTS criar_particao_agendamento(date);
+        """)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agendamento', '0002_agendamento_link'),
+        ('imovel', '__first__'),
+    ]
+
+    operations = [
+        migrations.RunPython(particionar, desfazer),
+    ]
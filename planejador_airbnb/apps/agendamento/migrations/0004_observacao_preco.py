@@ -0,0 +1,51 @@
+# Generated by Django 5.2.3 on 2026-10-19 13:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# As coletas chegam em ordem de data: cada faixa de 32 páginas cobre poucos dias, e o
+# autosummarize resume as faixas novas sem esperar o VACUUM
+SQL_BRIN = """
+CREATE INDEX observacao_preco_observado_em_brin ON observacao_preco
+USING brin (observado_em) WITH (pages_per_range = 32, autosummarize = on)
+"""
+
+
+def criar_brin(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(SQL_BRIN)
+
+
+def remover_brin(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS observacao_preco_observado_em_brin")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agendamento', '0003_particionamento_mensal'),
+        ('imovel', '__first__'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ObservacaoPreco',
+            fields=[
+                ('pk', models.CompositePrimaryKey('agendamento_id', 'observado_em', blank=True, editable=False, primary_key=True, serialize=False)),
+                ('agendamento', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='observacoes_preco', to='agendamento.agendamento')),
+                ('imovel', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='observacoes_preco', to='imovel.imovel')),
+                ('observado_em', models.DateField()),
+                ('preco_total_centavos', models.PositiveIntegerField()),
+                ('antecedencia_dias', models.SmallIntegerField()),
+                ('noites', models.PositiveSmallIntegerField()),
+                ('hospedes', models.PositiveSmallIntegerField()),
+            ],
+            options={
+                'verbose_name': 'Observação de preço',
+                'verbose_name_plural': 'Observações de preço',
+                'db_table': 'observacao_preco',
+            },
+        ),
+        migrations.RunPython(criar_brin, remover_brin),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 5.2.3 on 2026-10-19 14:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Preenche as cópias de todos os agendamentos existentes (a manutenção depois fica com
+# apps.core.resumo_imovel e com a importação do scraper). Os índices são criados depois,
+# para não serem atualizados linha a linha.
+SQL_PREENCHER = """
+UPDATE agendamento
+SET cidade_id = r.cidade_id, bairro_id = r.bairro_id, quartos = r.quartos, camas = r.camas,
+    banheiros = r.banheiros, nota = r.nota, qtd_avaliacoes = r.qtd_avaliacoes
+FROM (
+    SELECT i.id AS imovel_id, i.cidade_id, i.bairro_id, i.quartos, i.camas, i.banheiros,
+           v.nota, v.qtd_avaliacoes
+    FROM imovel i
+    LEFT JOIN avaliacao v ON v.id = (SELECT MAX(id) FROM avaliacao WHERE imovel_id = i.id)
+) r
+WHERE agendamento.imovel_id = r.imovel_id
+"""
+
+
+def preencher(apps, schema_editor):
+    schema_editor.execute(SQL_PREENCHER)
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute("ANALYZE agendamento")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agendamento', '0004_observacao_preco'),
+        ('imovel', '__first__'),
+        ('localizacoes', '__first__'),
+        ('avaliacoes', '__first__'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='agendamento',
+            name='bairro',
+            field=models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='localizacoes.bairro'),
+        ),
+        migrations.AddField(
+            model_name='agendamento',
+            name='banheiros',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='agendamento',
+            name='camas',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='agendamento',
+            name='cidade',
+            field=models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='localizacoes.cidade'),
+        ),
+        migrations.AddField(
+            model_name='agendamento',
+            name='nota',
+            field=models.DecimalField(blank=True, decimal_places=1, max_digits=3, null=True),
+        ),
+        migrations.AddField(
+            model_name='agendamento',
+            name='qtd_avaliacoes',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='agendamento',
+            name='quartos',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(preencher, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='agendamento',
+            index=models.Index(fields=['cidade', 'data_checkin', 'preco_por_dia'], include=('hospedes', 'data_checkout'), name='agendamento_cidade_busca'),
+        ),
+        migrations.AddIndex(
+            model_name='agendamento',
+            index=models.Index(fields=['bairro', 'data_checkin', 'preco_por_dia'], include=('hospedes', 'data_checkout'), name='agendamento_bairro_busca'),
+        ),
+    ]
@@ -0,0 +1,106 @@
+from django.db import migrations
+
+# Remove as duplicatas das chaves naturais e cria as restrições únicas que os modelos declaram
+# (Bairro: cidade + nome; Imovel: id_imovel; Avaliacao e Anuncio: um por imóvel/agendamento).
+# Os apps localizacoes, imovel, avaliacoes e anuncios não têm migrações: em bancos novos o
+# `migrate --run-syncdb` já cria as tabelas com as restrições e aqui nada é alterado.
+#
+# Bairros e imóveis repetidos são fundidos no de menor id (o que a importação já usava) e as
+# referências apontadas para ele; das avaliações e dos anúncios fica o mais recente (maior id).
+# As cópias em agendamento dos imóveis fundidos são corrigidas pelo `atualizar_estatisticas`.
+SQL_DEDUPLICAR = (
+    """
+    CREATE TEMPORARY TABLE bairro_duplicado AS
+    SELECT b.id AS antigo, m.id AS novo
+    FROM bairro b
+    JOIN (SELECT cidade_id, nome, MIN(id) AS id FROM bairro GROUP BY cidade_id, nome HAVING COUNT(*) > 1) m
+      ON m.cidade_id = b.cidade_id AND m.nome = b.nome
+    WHERE b.id <> m.id
+    """,
+    "UPDATE imovel SET bairro_id = d.novo FROM bairro_duplicado d WHERE imovel.bairro_id = d.antigo",
+    "UPDATE agendamento SET bairro_id = d.novo FROM bairro_duplicado d WHERE agendamento.bairro_id = d.antigo",
+    # Estatísticas são recalculadas pelo atualizar_estatisticas
+    "DELETE FROM estatistica_local WHERE bairro_id IN (SELECT antigo FROM bairro_duplicado)",
+    "DELETE FROM histograma_preco_local WHERE bairro_id IN (SELECT antigo FROM bairro_duplicado)",
+    "DELETE FROM bairro WHERE id IN (SELECT antigo FROM bairro_duplicado)",
+    "DROP TABLE bairro_duplicado",
+    """
+    CREATE TEMPORARY TABLE imovel_duplicado AS
+    SELECT i.id AS antigo, m.id AS novo
+    FROM imovel i
+    JOIN (SELECT id_imovel, MIN(id) AS id FROM imovel GROUP BY id_imovel HAVING COUNT(*) > 1) m
+      ON m.id_imovel = i.id_imovel
+    WHERE i.id <> m.id
+    """,
+    "UPDATE agendamento SET imovel_id = d.novo FROM imovel_duplicado d WHERE agendamento.imovel_id = d.antigo",
+    "UPDATE observacao_preco SET imovel_id = d.novo FROM imovel_duplicado d WHERE observacao_preco.imovel_id = d.antigo",
+    "UPDATE avaliacao SET imovel_id = d.novo FROM imovel_duplicado d WHERE avaliacao.imovel_id = d.antigo",
+    "DELETE FROM imovel WHERE id IN (SELECT antigo FROM imovel_duplicado)",
+    "DROP TABLE imovel_duplicado",
+    """
+    DELETE FROM avaliacao
+    WHERE EXISTS (SELECT 1 FROM avaliacao v WHERE v.imovel_id = avaliacao.imovel_id AND v.id > avaliacao.id)
+    """,
+    """
+    DELETE FROM anuncio
+    WHERE EXISTS (SELECT 1 FROM anuncio n WHERE n.agendamento_id = anuncio.agendamento_id AND n.id > anuncio.id)
+    """,
+)
+
+# (tabela, colunas, nome da restrição). Os nomes são os que o Django usa ao criar as tabelas:
+# os das UniqueConstraint dos modelos e, para os OneToOneField, o padrão do PostgreSQL
+UNICOS = (
+    ('bairro', ('cidade_id', 'nome'), 'bairro_cidade_nome_unico'),
+    ('imovel', ('id_imovel',), 'imovel_id_imovel_unico'),
+    ('avaliacao', ('imovel_id',), 'avaliacao_imovel_id_key'),
+    ('anuncio', ('agendamento_id',), 'anuncio_agendamento_id_key'),
+)
+
+
+def deduplicar(apps, schema_editor):
+    for sql in SQL_DEDUPLICAR:
+        schema_editor.execute(sql)
+
+
+def criar_unicos(apps, schema_editor):
+    conexao = schema_editor.connection
+    q = schema_editor.quote_name
+    if conexao.vendor == 'postgresql':
+        # As FKs do Django são DEFERRABLE: as verificações pendentes dos UPDATEs da deduplicação
+        # precisam rodar antes do ALTER TABLE
+        schema_editor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+    for tabela, colunas, nome in UNICOS:
+        with conexao.cursor() as cursor:
+            restricoes = conexao.introspection.get_constraints(cursor, tabela)
+        if any(r['unique'] and tuple(r['columns']) == colunas for r in restricoes.values()):
+            continue
+        lista = ', '.join(q(coluna) for coluna in colunas)
+        if conexao.vendor == 'postgresql':
+            schema_editor.execute(f"ALTER TABLE {q(tabela)} ADD CONSTRAINT {q(nome)} UNIQUE ({lista})")
+        else:
+            schema_editor.execute(f"CREATE UNIQUE INDEX {q(nome)} ON {q(tabela)} ({lista})")
+        # O índice comum da ForeignKey fica redundante com o único
+        for indice, r in restricoes.items():
+            if r['index'] and not r['unique'] and not r['primary_key'] and tuple(r['columns']) == colunas:
+                schema_editor.execute(f"DROP INDEX {q(indice)}")
+
+    if conexao.vendor == 'postgresql':
+        for tabela, _, _ in UNICOS:
+            schema_editor.execute(f"ANALYZE {q(tabela)}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agendamento', '0005_resumo_imovel'),
+        ('core', '0003_versaodados'),
+        ('anuncios', '__first__'),
+        ('avaliacoes', '__first__'),
+        ('imovel', '__first__'),
+        ('localizacoes', '__first__'),
+    ]
+
+    operations = [
+        migrations.RunPython(deduplicar, migrations.RunPython.noop),
+        migrations.RunPython(criar_unicos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+from datetime import date
+
+from django.db import migrations
+
+# Índices de agendamento para as consultas de estadias futuras (só PostgreSQL; ver
+# apps.core.indices). Criados na tabela pai, propagam para as partições existentes e para as
+# criadas depois por criar_particao_agendamento (CREATE TABLE ... LIKE e ATTACH).
+#
+# O BRIN de data_checkin ocupa poucas centenas de kB e resolve intervalos de datas quando as
+# linhas chegam agrupadas por check-in, como na importação do scraper.
+SQL_BRIN = """
+CREATE INDEX agendamento_data_checkin_brin ON agendamento
+USING brin (data_checkin) WITH (pages_per_range = 32, autosummarize = on)
+"""
+
+# Primeiro índice parcial, com o corte no mês da migração. O manter_particoes cria os dos
+# meses seguintes (com CONCURRENTLY) e apaga este.
+SQL_FUTURO = """
+CREATE INDEX agendamento_futuro_local_{corte:%Y%m} ON agendamento
+(cidade_id, bairro_id, data_checkin, hospedes) INCLUDE (data_checkout)
+WHERE data_checkin >= '{corte:%Y-%m-%d}' AND preco_por_dia IS NOT NULL
+"""
+
+
+def criar_indices(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(SQL_BRIN)
+    schema_editor.execute(SQL_FUTURO.format(corte=date.today().replace(day=1)))
+    schema_editor.execute("ANALYZE agendamento")
+
+
+def remover_indices(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS agendamento_data_checkin_brin")
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT indexname FROM pg_indexes WHERE schemaname = 'public' AND tablename = 'agendamento' "
+            "AND indexname ~ '^agendamento_futuro_local_[0-9]{6}$'"
+        )
+        nomes = [nome for nome, in cursor.fetchall()]
+    for nome in nomes:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {schema_editor.quote_name(nome)}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agendamento', '0006_chaves_naturais'),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_indices, remover_indices),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.3 on 2026-10-19 14:26
+
+from importlib import import_module
+
+import django.db.models.expressions
+import django.db.models.functions.comparison
+import django.db.models.functions.math
+from django.db import migrations, models
+
+# Diária em centavos como coluna gerada (STORED): a migração regrava a tabela uma vez. As
+# partições novas precisam da mesma expressão (INCLUDING GENERATED) e, como não se grava valor
+# em coluna gerada, as linhas vindas da partição padrão são copiadas sem ela.
+SQL_FUNCAO = """
+CREATE OR REPLACE FUNCTION criar_particao_agendamento(mes date) RETURNS text AS $$
+DECLARE
+    inicio date := date_trunc('month', mes)::date;
+    fim date := (date_trunc('month', mes) + interval '1 month')::date;
+    nome text := 'agendamento_' || to_char(mes, 'YYYYMM');
+    colunas text;
+BEGIN
+    IF to_regclass(nome) IS NOT NULL THEN
+        RETURN nome;
+    END IF;
+    SELECT string_agg(quote_ident(attname), ', ' ORDER BY attnum) INTO colunas
+    FROM pg_attribute
+    WHERE attrelid = 'agendamento'::regclass AND attnum > 0 AND NOT attisdropped AND attgenerated = '';
+    EXECUTE format(
+        'CREATE TABLE %I (LIKE agendamento INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING GENERATED)', nome
+    );
+    EXECUTE format(
+        'WITH movidas AS (DELETE FROM agendamento_padrao WHERE data_checkin >= %L AND data_checkin < %L '
+        'RETURNING %s) INSERT INTO %I (%s) SELECT * FROM movidas', inicio, fim, colunas, nome, colunas
+    );
+    EXECUTE format('ALTER TABLE agendamento ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)', nome, inicio, fim);
+    RETURN nome;
+END
+$$ LANGUAGE plpgsql;
+"""
+
+
+def _recriar_funcao(schema_editor, sql):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(sql)
+
+
+def atualizar_funcao_particao(apps, schema_editor):
+    _recriar_funcao(schema_editor, SQL_FUNCAO)
+
+
+def restaurar_funcao_particao(apps, schema_editor):
+    _recriar_funcao(schema_editor, import_module('apps.agendamento.migrations.0003_particionamento_mensal').SQL_FUNCAO)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agendamento', '0007_indices_futuros'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='agendamento',
+            name='preco_por_dia_centavos',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.comparison.Cast(django.db.models.functions.math.Round(django.db.models.expressions.CombinedExpression(models.F('preco_por_dia'), '*', models.Value(100))), models.IntegerField()), output_field=models.IntegerField(blank=True, null=True)),
+        ),
+        # Depois da coluna: a função lê as colunas não geradas de agendamento
+        migrations.RunPython(atualizar_funcao_particao, restaurar_funcao_particao),
+    ]
@@ -1,6 +1,9 @@
 from django.db import models
+from django.db.models import F
+from django.db.models.functions import Cast, Round
 
 from apps.imovel.models import Imovel
+from apps.localizacoes.models import Bairro, Cidade
 
 
 class Agendamento(models.Model):
@@ -13,14 +16,102 @@ class Agendamento(models.Model):
     data_checkout = models.DateField(null=True, blank=True)
     preco_total = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     preco_por_dia = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    # Diária em centavos, calculada pelo banco a cada gravação (coluna gerada): as agregações e
+    # os laços das views trabalham com inteiros, sem construir um Decimal por linha
+    preco_por_dia_centavos = models.GeneratedField(
+        expression=Cast(Round(F('preco_por_dia') * 100), models.IntegerField()),
+        output_field=models.IntegerField(null=True, blank=True),
+        db_persist=True,
+    )
     hospedes = models.PositiveIntegerField()
     link = models.URLField(max_length=1024, verbose_name="Link")
 
+    # Cópias do imóvel e da sua avaliação mais recente (apps.core.resumo_imovel): a busca filtra
+    # e ordena só em `agendamento`
+    cidade = models.ForeignKey(
+        Cidade,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    bairro = models.ForeignKey(
+        Bairro,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    quartos = models.IntegerField(null=True, blank=True)
+    camas = models.IntegerField(null=True, blank=True)
+    banheiros = models.IntegerField(null=True, blank=True)
+    nota = models.DecimalField(max_digits=3, decimal_places=1, null=True, blank=True)
+    qtd_avaliacoes = models.PositiveIntegerField(null=True, blank=True)
+
     class Meta:
         db_table = 'agendamento'
         verbose_name = "Agendamento"
         verbose_name_plural = "Agendamentos"
         ordering = ['data_checkin']
+        # Filtros da busca e das APIs por local e data, já na ordem da listagem; com hóspedes e
+        # checkout incluídos, as APIs de filtros leem só o índice (include é ignorado fora do PostgreSQL)
+        indexes = [
+            models.Index(
+                fields=['cidade', 'data_checkin', 'preco_por_dia'], include=['hospedes', 'data_checkout'],
+                name='agendamento_cidade_busca'
+            ),
+            models.Index(
+                fields=['bairro', 'data_checkin', 'preco_por_dia'], include=['hospedes', 'data_checkout'],
+                name='agendamento_bairro_busca'
+            ),
+        ]
+
+    def __str__(self):
+        return f"Agendamento para Imóvel ID {self.imovel.id}: {self.data_checkin} a {self.data_checkout}"
+
+
+class ObservacaoPreco(models.Model):
+    """
+    Preço de um agendamento visto em uma coleta: uma linha por agendamento e dia de coleta,
+    só acrescentada (o `Agendamento` guarda apenas o último preço).
+
+    A tabela é pensada para centenas de milhões de linhas: preço em centavos inteiros, noites,
+    hóspedes e antecedência (check-in menos dia da coleta) em smallint e nenhuma chave
+    estrangeira verificada pelo banco. Os campos seguem a ordem de alinhamento do PostgreSQL
+    (8, 4 e 2 bytes), sem preenchimento entre colunas. Além da chave primária, que atende
+    às consultas por agendamento, há só um índice BRIN em `observado_em` (migração 0004):
+    como as coletas são gravadas em ordem de data, ele ocupa poucos KB por milhão de linhas.
+    """
+    pk = models.CompositePrimaryKey('agendamento_id', 'observado_em')
+    agendamento = models.ForeignKey(
+        Agendamento,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        related_name='observacoes_preco'
+    )
+    # Redundante com o agendamento: a evolução por local filtra pelo imóvel sem ler `agendamento`
+    imovel = models.ForeignKey(
+        Imovel,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        related_name='observacoes_preco'
+    )
+    observado_em = models.DateField()
+    preco_total_centavos = models.PositiveIntegerField()
+    antecedencia_dias = models.SmallIntegerField()
+    noites = models.PositiveSmallIntegerField()
+    hospedes = models.PositiveSmallIntegerField()
+
+    class Meta:
+        db_table = 'observacao_preco'
+        verbose_name = "Observação de preço"
+        verbose_name_plural = "Observações de preço"
 
     def __str__(self):
-        return f"Agendamento para Imóvel ID {self.imovel.id}: {self.data_checkin} a {self.data_checkout}"
\ No newline at end of file
+        return f"Agendamento {self.agendamento_id} em {self.observado_em}: {self.preco_total_centavos / 100:.2f}"
@@ -4,10 +4,14 @@ from apps.agendamento.models import Agendamento
 
 
 class Anuncio(models.Model):
-    agendamento = models.ForeignKey(
+    # agendamento é particionado por mês (a chave primária no banco é (id, data_checkin)), então
+    # a integridade fica com o Django e com a ingestão, sem constraint no banco. Um anúncio
+    # (título e link) por agendamento
+    agendamento = models.OneToOneField(
         Agendamento,
         on_delete=models.CASCADE,
-        related_name='anuncios'
+        related_name='anuncio',
+        db_constraint=False,
     )
     titulo = models.CharField(max_length=255, verbose_name="Título")
     link = models.URLField(max_length=1024, verbose_name="Link")
@@ -4,10 +4,11 @@ from apps.imovel.models import Imovel
 
 
 class Avaliacao(models.Model):
-    imovel = models.ForeignKey(
+    # Avaliação atual do imóvel: cada coleta sobrescreve a anterior
+    imovel = models.OneToOneField(
         Imovel,
         on_delete=models.CASCADE,
-        related_name='avaliacoes'
+        related_name='avaliacao'
     )
     nota = models.DecimalField(
         max_digits=3,
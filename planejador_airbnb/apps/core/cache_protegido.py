@@ -0,0 +1,250 @@
+"""
+Cache de cálculos caros com proteção contra estouro (cache stampede).
+
+Quando uma chave de cache expira, todas as requisições simultâneas recalculavam o mesmo
+agregado pesado ao mesmo tempo. `obter_ou_calcular` evita isso com:
+
+- coalescência (single-flight): no mesmo processo, só uma thread calcula cada chave e as
+  demais esperam o resultado dela. Uma trava no próprio cache (`cache.add`) estende isso
+  aos outros workers quando o cache é compartilhado (`CACHE_BACKEND=redis` ou
+  `memcached`); com o cache em memória local, cada worker calcula a sua cópia;
+- stale-while-revalidate: depois do TTL o valor continua guardado por mais `obsoleto`
+  segundos; nesse intervalo ele é servido imediatamente e o recálculo vai para segundo plano;
+- expiração antecipada probabilística (XFetch): perto do fim do TTL, cada leitura tem uma
+  chance crescente (proporcional ao tempo do cálculo) de disparar a renovação antes de a
+  chave expirar, de modo que raramente alguém encontra o cache vazio;
+- renovação em segundo plano: um pequeno pool de threads (`CACHE_RENOVACAO_WORKERS`)
+  recalcula as chaves agendadas. Com `CACHE_RENOVACAO_EM_SEGUNDO_PLANO` desligado (testes),
+  a renovação acontece na própria requisição, ainda coalescida.
+
+Uso:
+
+    dados = obter_ou_calcular(f"graficos_{chave}", lambda: calcular(filtros), ttl=600, nome='graficos')
+
+Os contadores por `nome` (acertos, cálculos, esperas coalescidas, valores obsoletos servidos e
+renovações) ficam em `estatisticas_cache` e são expostos em `/metricas/`.
+"""
+import logging
+import math
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturoTimeoutError
+from contextlib import nullcontext
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Intervalo entre as verificações de quem espera o cálculo de outro processo
+INTERVALO_ESPERA = 0.05
+
+
+class EstatisticasCache:
+    """Contadores por nome de cálculo, para medir a coalescência e a renovação."""
+
+    CAMPOS = ('acertos', 'calculos', 'coalescidos', 'obsoletos', 'antecipados', 'segundo_plano', 'erros')
+
+    def __init__(self):
+        self._trava = threading.Lock()
+        self._por_nome = {}
+
+    def registrar(self, nome, campo):
+        with self._trava:
+            valores = self._por_nome.setdefault(nome, dict.fromkeys(self.CAMPOS, 0))
+            valores[campo] += 1
+
+    def valores(self):
+        with self._trava:
+            return {nome: dict(valores) for nome, valores in self._por_nome.items()}
+
+    def limpar(self):
+        with self._trava:
+            self._por_nome.clear()
+
+    def texto_prometheus(self):
+        descricoes = {
+            'acertos': 'Leituras atendidas pelo cache dentro do TTL.',
+            'calculos': 'Cálculos efetivamente executados.',
+            'coalescidos': 'Leituras que aguardaram o cálculo em andamento de outra requisição.',
+            'obsoletos': 'Valores servidos após o TTL enquanto a renovação acontecia.',
+            'antecipados': 'Renovações disparadas antes do TTL (expiração probabilística).',
+            'segundo_plano': 'Renovações executadas pelo pool de segundo plano.',
+            'erros': 'Cálculos que falharam.',
+        }
+        por_nome = self.valores()
+        linhas = []
+        for campo in self.CAMPOS:
+            metrica = f'planejador_cache_{campo}_total'
+            linhas += [f'# HELP {metrica} {descricoes[campo]}', f'# TYPE {metrica} counter']
+            linhas += [f'{metrica}{{calculo="{nome}"}} {valores[campo]}' for nome, valores in sorted(por_nome.items())]
+        return '\n'.join(linhas) + '\n'
+
+
+estatisticas_cache = EstatisticasCache()
+
+# Cálculos em andamento neste processo: chave -> Future com o resultado
+_em_andamento = {}
+_trava_em_andamento = threading.Lock()
+
+_executor = None
+_trava_executor = threading.Lock()
+
+
+def _pool_renovacao():
+    global _executor
+    with _trava_executor:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'CACHE_RENOVACAO_WORKERS', 2),
+                thread_name_prefix='renovacao-cache',
+            )
+        return _executor
+
+
+def _calcular_e_gravar(chave, funcao, ttl, obsoleto, nome):
+    inicio = time.perf_counter()
+    try:
+        valor = funcao()
+    except Exception:
+        estatisticas_cache.registrar(nome, 'erros')
+        raise
+    duracao = time.perf_counter() - inicio
+    cache.set(chave, {'valor': valor, 'expira_em': time.time() + ttl, 'duracao': duracao}, ttl + obsoleto)
+    estatisticas_cache.registrar(nome, 'calculos')
+    return valor
+
+
+def _calcular_com_trava(chave, funcao, ttl, obsoleto, nome, espera_maxima):
+    """
+    Calcula a chave com a trava no cache (entre processos, se o cache for compartilhado). Se
+    outro processo já estiver calculando, aguarda o valor dele até `espera_maxima` segundos e
+    só então calcula por conta própria.
+    """
+    chave_trava = f'{chave}:calculando'
+    token = uuid.uuid4().hex
+    if cache.add(chave_trava, token, espera_maxima):
+        try:
+            return _calcular_e_gravar(chave, funcao, ttl, obsoleto, nome)
+        finally:
+            if cache.get(chave_trava) == token:
+                cache.delete(chave_trava)
+
+    estatisticas_cache.registrar(nome, 'coalescidos')
+    limite = time.monotonic() + espera_maxima
+    while time.monotonic() < limite:
+        time.sleep(INTERVALO_ESPERA)
+        envelope = cache.get(chave)
+        if envelope is not None and envelope['expira_em'] > time.time():
+            return envelope['valor']
+        if cache.get(chave_trava) is None:
+            break
+    return _calcular_e_gravar(chave, funcao, ttl, obsoleto, nome)
+
+
+def _executar_unico(chave, funcao, ttl, obsoleto, nome, espera_maxima):
+    """Single-flight dentro do processo: a primeira thread calcula, as demais aguardam o mesmo Future."""
+    with _trava_em_andamento:
+        futuro = _em_andamento.get(chave)
+        dono = futuro is None
+        if dono:
+            futuro = _em_andamento[chave] = Future()
+
+    if not dono:
+        estatisticas_cache.registrar(nome, 'coalescidos')
+        try:
+            return futuro.result(timeout=espera_maxima)
+        except FuturoTimeoutError:
+            return _calcular_e_gravar(chave, funcao, ttl, obsoleto, nome)
+
+    try:
+        valor = _calcular_com_trava(chave, funcao, ttl, obsoleto, nome, espera_maxima)
+    except Exception as erro:
+        futuro.set_exception(erro)
+        raise
+    else:
+        futuro.set_result(valor)
+        return valor
+    finally:
+        with _trava_em_andamento:
+            _em_andamento.pop(chave, None)
+
+
+def _renovar(chave, funcao, ttl, obsoleto, nome, espera_maxima):
+    """Agenda a renovação da chave (uma por vez) sem bloquear quem já tem um valor para servir."""
+    with _trava_em_andamento:
+        if chave in _em_andamento:
+            return
+
+    if not getattr(settings, 'CACHE_RENOVACAO_EM_SEGUNDO_PLANO', True):
+        _executar_unico(chave, funcao, ttl, obsoleto, nome, espera_maxima)
+        return
+
+    # A renovação lê do mesmo banco que a requisição que a disparou (réplica ou primário)
+    from .replicas import alias_leitura, leitura_em_replica
+    alias = alias_leitura()
+
+    def _tarefa():
+        try:
+            estatisticas_cache.registrar(nome, 'segundo_plano')
+            with leitura_em_replica(alias) if alias else nullcontext():
+                _executar_unico(chave, funcao, ttl, obsoleto, nome, espera_maxima)
+        except Exception:
+            logger.exception("Falha ao renovar a chave de cache %s em segundo plano.", chave)
+        finally:
+            # Cada thread do pool abre a própria conexão com o banco
+            connections.close_all()
+
+    _pool_renovacao().submit(_tarefa)
+
+
+def _renovar_antes(envelope, beta, agora):
+    # XFetch: -log(U) é exponencial, então a chance de renovar cresce perto do fim do TTL
+    return beta > 0 and agora - envelope['duracao'] * beta * math.log(1.0 - random.random()) >= envelope['expira_em']
+
+
+def obter_ou_calcular(chave, funcao, ttl, obsoleto=None, beta=1.0, espera_maxima=30, nome=None):
+    """
+    Retorna o valor em cache de `chave` ou o calcula com `funcao()` (sem argumentos).
+
+    ttl: segundos em que o valor é considerado atual.
+    obsoleto: segundos extras em que o valor expirado ainda é servido enquanto é renovado
+        em segundo plano (padrão: igual ao TTL).
+    beta: agressividade da renovação antecipada (0 desliga; > 1 renova mais cedo).
+    espera_maxima: tempo máximo aguardando o cálculo de outra requisição.
+    nome: agrupamento dos contadores em `estatisticas_cache` (padrão: a própria chave).
+    """
+    obsoleto = ttl if obsoleto is None else obsoleto
+    nome = nome or chave
+    envelope = cache.get(chave)
+    if envelope is None:
+        return _executar_unico(chave, funcao, ttl, obsoleto, nome, espera_maxima)
+
+    agora = time.time()
+    if agora >= envelope['expira_em']:
+        estatisticas_cache.registrar(nome, 'obsoletos')
+        _renovar(chave, funcao, ttl, obsoleto, nome, espera_maxima)
+    elif _renovar_antes(envelope, beta, agora):
+        estatisticas_cache.registrar(nome, 'antecipados')
+        _renovar(chave, funcao, ttl, obsoleto, nome, espera_maxima)
+    else:
+        estatisticas_cache.registrar(nome, 'acertos')
+    return envelope['valor']
+
+
+async def aobter_ou_calcular(chave, funcao, ttl, obsoleto=None, beta=1.0, espera_maxima=30, nome=None):
+    """
+    Versão de `obter_ou_calcular` para views assíncronas. O valor atual sai direto do cache;
+    expiração, coalescência e cálculo continuam no caminho síncrono, fora do loop de eventos.
+    """
+    envelope = await cache.aget(chave)
+    agora = time.time()
+    if envelope is not None and agora < envelope['expira_em'] and not _renovar_antes(envelope, beta, agora):
+        estatisticas_cache.registrar(nome or chave, 'acertos')
+        return envelope['valor']
+    return await sync_to_async(obter_ou_calcular)(chave, funcao, ttl, obsoleto, beta, espera_maxima, nome)
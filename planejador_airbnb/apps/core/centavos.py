@@ -0,0 +1,36 @@
+"""
+Preços em centavos inteiros nos caminhos quentes das views.
+
+As diárias vêm do banco como inteiros (`Agendamento.preco_por_dia_centavos`, coluna gerada, e
+as colunas `*_centavos` de `EstatisticaLocal`). Somas, mínimos, comparações com o orçamento e
+ordenações são feitas com inteiros; a conversão para reais (float) acontece uma vez, ao montar
+o JSON. Médias são agregadas como soma e contagem inteiras (`soma_e_contagem`): no PostgreSQL,
+AVG de inteiros devolve `numeric`, que o psycopg converte em Decimal linha a linha.
+"""
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db.models import Count, Sum
+
+CAMPO_DIARIA = 'preco_por_dia_centavos'
+
+
+def para_centavos(valor):
+    """Centavos inteiros de um valor em reais (Decimal do formulário, float ou texto)."""
+    return int((Decimal(str(valor)) * 100).quantize(Decimal('1'), ROUND_HALF_UP))
+
+
+def reais(centavos, casas=2):
+    """Reais (float) a partir de centavos; None continua None."""
+    return None if centavos is None else round(centavos / 100, casas)
+
+
+def soma_e_contagem(campo=CAMPO_DIARIA):
+    """Agregações `preco_soma` e `precos` (linhas com preço) para calcular a média com `media_reais`."""
+    return {'preco_soma': Sum(campo), 'precos': Count(campo)}
+
+
+def media_reais(linha, casas=2):
+    """Média em reais de uma linha agregada com `soma_e_contagem` (0.0 se não houver preço)."""
+    if not linha['precos']:
+        return 0.0
+    return round(linha['preco_soma'] / linha['precos'] / 100, casas)
@@ -0,0 +1,261 @@
+"""
+Estatísticas de preço materializadas por localização (tabelas `estatistica_local` e
+`histograma_preco_local`).
+
+Os cabeçalhos da comparação e do planejador mostravam média, mínimo, máximo e total de
+imóveis calculados sobre todos os agendamentos futuros a cada requisição. Agora esses
+números são agregados uma vez, após cada importação, por cidade e por bairro, data de
+check-in, duração da estadia e quantidade mínima de hóspedes; as views leem uma única
+linha (ou algumas centenas, no resumo do planejador) sem tocar em `agendamento`.
+
+Média, mínimo e máximo são distorcidos pelos anúncios de luxo, e mediana ou percentis
+pelo ORM exigiriam ordenar todos os preços a cada requisição. Para isso cada combinação
+guarda também um histograma da diária em faixas fixas de largura logarítmica
+(`FAIXAS_PRECO`, 10% cada): histogramas somam-se faixa a faixa, então a distribuição de
+uma cidade num ano inteiro sai de um `SUM ... GROUP BY faixa` sobre poucas linhas, e a
+mediana e os quartis são estimados com erro relativo de até ~5% (`distribuicao_precos`).
+
+A reconstrução (`atualizar_estatisticas`) apaga e regrava as linhas a partir de uma data
+dentro de uma única transação. No PostgreSQL as leituras concorrentes continuam vendo a
+versão anterior até o commit (MVCC), com o mesmo efeito de um
+`REFRESH MATERIALIZED VIEW CONCURRENTLY`, e a mesma rotina funciona no SQLite local.
+
+Uso após importar dados:
+
+    python manage.py atualizar_estatisticas
+"""
+import math
+from datetime import date
+
+from django.db import connection, transaction
+from django.db.models import Count, Max, Min, Sum
+
+from apps.agendamento.models import Agendamento
+
+from .centavos import media_reais, reais
+from .models import EstatisticaLocal, HistogramaPrecoLocal
+
+
+# Duração da estadia em dias, conforme o banco
+EXPRESSAO_NOITES = {
+    'postgresql': "(a.data_checkout - a.data_checkin)",
+    'sqlite': "CAST(julianday(a.data_checkout) - julianday(a.data_checkin) AS INTEGER)",
+}
+
+# Faixas da diária: a faixa 0 vai de R$ 0 a PRECO_BASE_HISTOGRAMA e cada faixa seguinte é
+# RAZAO_FAIXAS vezes maior que a anterior; a última é aberta (até o maior Decimal(10, 2)).
+PRECO_BASE_HISTOGRAMA = 10.0
+RAZAO_FAIXAS = 1.1
+TOTAL_FAIXAS = 92  # R$ 10 * 1,1^90 ≈ R$ 53 mil
+PRECO_MAXIMO_FAIXAS = 100_000_000
+
+
+def _limites_faixa(faixa):
+    inferior = 0.0 if faixa == 0 else PRECO_BASE_HISTOGRAMA * RAZAO_FAIXAS ** (faixa - 1)
+    superior = PRECO_MAXIMO_FAIXAS if faixa == TOTAL_FAIXAS - 1 else PRECO_BASE_HISTOGRAMA * RAZAO_FAIXAS ** faixa
+    return round(inferior, 2), round(superior, 2)
+
+
+FAIXAS_PRECO = [_limites_faixa(faixa) for faixa in range(TOTAL_FAIXAS)]
+
+# Cada agendamento entra em todos os níveis de hóspedes de 0 até o seu, de modo que o filtro
+# "hospedes >= N" das views corresponde a uma única linha (nível N) por combinação.
+SQL_AGREGA_ESTATISTICAS = """
+    INSERT INTO estatistica_local (
+        cidade_id, bairro_id, data_checkin, noites, hospedes_minimo,
+        total_agendamentos, total_imoveis, total_precos,
+        preco_soma_centavos, preco_minimo_centavos, preco_maximo_centavos
+    )
+    SELECT
+        i.cidade_id, {bairro}, a.data_checkin, {noites}, n.nivel,
+        COUNT(*), COUNT(DISTINCT a.imovel_id), COUNT(a.preco_por_dia_centavos),
+        SUM(a.preco_por_dia_centavos), MIN(a.preco_por_dia_centavos), MAX(a.preco_por_dia_centavos)
+    FROM agendamento a
+    JOIN imovel i ON i.id = a.imovel_id
+    JOIN ({niveis}) n ON a.hospedes >= n.nivel
+    WHERE a.data_checkin >= %s AND a.data_checkout IS NOT NULL
+    GROUP BY i.cidade_id, {agrupamento_bairro} a.data_checkin, {noites}, n.nivel
+"""
+
+# Faixa calculada diretamente a partir do logaritmo da diária (LN e FLOOR existem nos dois
+# bancos; no SQLite o Django os registra na conexão)
+EXPRESSAO_FAIXA = f"""
+    CASE
+        WHEN a.preco_por_dia < {PRECO_BASE_HISTOGRAMA} THEN 0
+        WHEN a.preco_por_dia >= {FAIXAS_PRECO[-1][0]} THEN {TOTAL_FAIXAS - 1}
+        ELSE CAST(FLOOR(LN(a.preco_por_dia / {PRECO_BASE_HISTOGRAMA}) / LN({RAZAO_FAIXAS})) AS INTEGER) + 1
+    END
+"""
+
+SQL_AGREGA_HISTOGRAMA = """
+    INSERT INTO histograma_preco_local (
+        cidade_id, bairro_id, data_checkin, noites, hospedes_minimo, faixa, total
+    )
+    SELECT i.cidade_id, {bairro}, a.data_checkin, {noites}, n.nivel, {faixa}, COUNT(*)
+    FROM agendamento a
+    JOIN imovel i ON i.id = a.imovel_id
+    JOIN ({niveis}) n ON a.hospedes >= n.nivel
+    WHERE a.data_checkin >= %s AND a.data_checkout IS NOT NULL AND a.preco_por_dia IS NOT NULL
+    GROUP BY i.cidade_id, {agrupamento_bairro} a.data_checkin, {noites}, n.nivel, {faixa}
+"""
+
+# Primeiro a cidade inteira (bairro nulo), depois cada bairro
+AGRUPAMENTOS = (("CAST(NULL AS BIGINT)", ""), ("i.bairro_id", "i.bairro_id,"))
+
+ESTATISTICAS_VAZIAS = {
+    'preco_medio_geral': 0.0,
+    'preco_minimo': 0.0,
+    'preco_maximo': 0.0,
+    'preco_mediano': 0.0,
+    'preco_p25': 0.0,
+    'preco_p75': 0.0,
+    'total_propriedades': 0,
+    'total_agendamentos': 0,
+}
+
+
+def _tabela_literal(colunas, linhas):
+    """Tabela derivada com valores fixos (SELECT ... UNION ALL), portável entre os bancos."""
+    return " UNION ALL ".join(
+        "SELECT " + ", ".join(f"{valor} AS {coluna}" for coluna, valor in zip(colunas, linha))
+        for linha in linhas
+    )
+
+
+def atualizar_estatisticas(desde=None):
+    """
+    Reconstrói as estatísticas e os histogramas dos check-ins a partir de `desde` (padrão: hoje)
+    e descarta as linhas de datas já passadas. Retorna (linhas de estatísticas, linhas de histograma).
+    """
+    desde = desde or date.today()
+    noites = EXPRESSAO_NOITES.get(connection.vendor)
+    if noites is None:
+        raise NotImplementedError(f"Banco '{connection.vendor}' não suportado para as estatísticas.")
+
+    maximo_hospedes = Agendamento.objects.filter(data_checkin__gte=desde).aggregate(maximo=Max('hospedes'))['maximo']
+    niveis = _tabela_literal(['nivel'], [[nivel] for nivel in range((maximo_hospedes or 0) + 1)])
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        for modelo in (EstatisticaLocal, HistogramaPrecoLocal):
+            modelo.objects.filter(data_checkin__gte=desde).delete()
+            modelo.objects.filter(data_checkin__lt=min(desde, date.today())).delete()
+
+        totais = [0, 0]
+        for bairro, agrupamento_bairro in AGRUPAMENTOS:
+            for indice, sql in enumerate((SQL_AGREGA_ESTATISTICAS, SQL_AGREGA_HISTOGRAMA)):
+                cursor.execute(
+                    sql.format(bairro=bairro, agrupamento_bairro=agrupamento_bairro, noites=noites,
+                               niveis=niveis, faixa=EXPRESSAO_FAIXA),
+                    [desde],
+                )
+                totais[indice] += cursor.rowcount
+    return tuple(totais)
+
+
+def filtro_local(location_info):
+    """Filtro das tabelas de estatísticas para um local no formato de `ComparacaoForm.get_location_info`."""
+    if location_info['tipo'] == 'bairro':
+        return {'bairro_id': location_info['id']}
+    return {'cidade_id': location_info['cidade_id'], 'bairro__isnull': True}
+
+
+def _quantil(contagens, total, fracao):
+    """Quantil estimado a partir das contagens por faixa, interpolando dentro da faixa."""
+    alvo = fracao * total
+    acumulado = 0
+    for faixa, quantidade in contagens:
+        if acumulado + quantidade >= alvo:
+            inferior, superior = FAIXAS_PRECO[faixa]
+            if faixa == TOTAL_FAIXAS - 1:
+                return inferior
+            posicao = (alvo - acumulado) / quantidade
+            if faixa == 0:
+                return inferior + (superior - inferior) * posicao
+            # Faixas logarítmicas: interpolação geométrica
+            return inferior * math.exp(math.log(superior / inferior) * posicao)
+        acumulado += quantidade
+    return FAIXAS_PRECO[contagens[-1][0]][0]
+
+
+def limitar_aos_extremos(valor, minimo, maximo):
+    """
+    Restringe um quantil estimado pelo histograma ao mínimo e máximo reais: a interpolação
+    dentro da faixa pode passar dos extremos (ex.: p75 acima do maior preço do local).
+    """
+    if minimo is None or maximo is None:
+        return valor
+    return min(max(valor, minimo), maximo)
+
+
+def distribuicao_precos(**filtros):
+    """
+    Mediana, quartis e histograma da diária para os filtros informados (campos de
+    `HistogramaPrecoLocal`, ex.: cidade_id, bairro__isnull, hospedes_minimo, noites,
+    data_checkin__range). As combinações selecionadas são somadas faixa a faixa no banco.
+    """
+    contagens = list(
+        HistogramaPrecoLocal.objects.filter(**filtros)
+        .values('faixa').annotate(quantidade=Sum('total'))
+        .order_by('faixa').values_list('faixa', 'quantidade')
+    )
+    total = sum(quantidade for _, quantidade in contagens)
+    if not total:
+        return {'total': 0, 'p25': 0.0, 'mediana': 0.0, 'p75': 0.0, 'histograma': []}
+
+    return {
+        'total': total,
+        'p25': round(_quantil(contagens, total, 0.25), 2),
+        'mediana': round(_quantil(contagens, total, 0.5), 2),
+        'p75': round(_quantil(contagens, total, 0.75), 2),
+        'histograma': [
+            {'de': FAIXAS_PRECO[faixa][0], 'ate': FAIXAS_PRECO[faixa][1], 'total': quantidade}
+            for faixa, quantidade in contagens
+        ],
+    }
+
+
+def estatisticas_local(location_info, data_checkin, hospedes, quantidade_noites):
+    """
+    Estatísticas dos agendamentos de um local numa data, com `hospedes >= hospedes` e a
+    duração informada: uma linha de `estatistica_local` e o histograma da mesma combinação.
+    """
+    filtros = dict(data_checkin=data_checkin, noites=quantidade_noites, hospedes_minimo=hospedes,
+                   **filtro_local(location_info))
+    linha = EstatisticaLocal.objects.filter(**filtros).first()
+    if linha is None:
+        return dict(ESTATISTICAS_VAZIAS)
+
+    distribuicao = distribuicao_precos(**filtros)
+    minimo, maximo = reais(linha.preco_minimo_centavos or 0), reais(linha.preco_maximo_centavos or 0)
+    return {
+        'preco_medio_geral': reais(linha.preco_medio_centavos or 0),
+        'preco_minimo': minimo,
+        'preco_maximo': maximo,
+        'preco_mediano': limitar_aos_extremos(distribuicao['mediana'], minimo, maximo),
+        'preco_p25': limitar_aos_extremos(distribuicao['p25'], minimo, maximo),
+        'preco_p75': limitar_aos_extremos(distribuicao['p75'], minimo, maximo),
+        'total_propriedades': linha.total_imoveis,
+        'total_agendamentos': linha.total_agendamentos,
+    }
+
+
+def estatisticas_periodo(inicio, fim):
+    """Resumo de todas as cidades para check-ins entre `inicio` e `fim` (inclusive), preços em reais."""
+    filtros = dict(bairro__isnull=True, hospedes_minimo=0, data_checkin__gte=inicio, data_checkin__lte=fim)
+    resumo = EstatisticaLocal.objects.filter(**filtros).aggregate(
+        preco_soma=Sum('preco_soma_centavos'),
+        precos=Sum('total_precos'),
+        preco_minimo_dia=Min('preco_minimo_centavos'),
+        preco_maximo_dia=Max('preco_maximo_centavos'),
+        total_opcoes=Sum('total_agendamentos'),
+        total_cidades=Count('cidade', distinct=True),
+    )
+    resumo['preco_medio_dia'] = media_reais(resumo) if resumo['precos'] else None
+    del resumo['preco_soma'], resumo['precos']
+    resumo['preco_minimo_dia'] = reais(resumo['preco_minimo_dia'])
+    resumo['preco_maximo_dia'] = reais(resumo['preco_maximo_dia'])
+    resumo['preco_mediano_dia'] = limitar_aos_extremos(
+        distribuicao_precos(**filtros)['mediana'], resumo['preco_minimo_dia'], resumo['preco_maximo_dia']
+    )
+    resumo['total_opcoes'] = resumo['total_opcoes'] or 0
+    return resumo
@@ -0,0 +1,94 @@
+"""
+Evolução de preços a partir das observações gravadas a cada coleta (tabela
+`observacao_preco`, modelo `agendamento.ObservacaoPreco`).
+
+Cada série tem um ponto por dia de coleta com a diária média, mínima e máxima dos
+agendamentos observados naquele dia. O recorte sempre inclui um intervalo de datas de
+coleta, limitado a `DIAS_MAXIMO`, para que nenhuma consulta percorra a tabela inteira:
+
+- por agendamento ou imóvel, as observações são lidas pela chave primária
+  (agendamento_id, observado_em), a partir dos IDs dos agendamentos do imóvel;
+- por cidade ou bairro, o intervalo de datas é resolvido pelo índice BRIN de
+  `observado_em` e o local pelo `imovel_id` gravado na própria observação, sem ler
+  `agendamento` (a não ser que a data de check-in seja informada, caso em que só a
+  partição do mês é lida).
+"""
+from datetime import date, timedelta
+
+from django.db.models import Avg, Count, F, FloatField, Max, Min
+from django.db.models.functions import Cast
+
+from apps.agendamento.models import Agendamento, ObservacaoPreco
+
+DIAS_PADRAO = 90
+DIAS_MAXIMO = 366
+
+
+def intervalo_coletas(desde=None, ate=None):
+    """
+    Intervalo de datas de coleta (`desde`, `ate`), por padrão os últimos `DIAS_PADRAO` dias.
+    ValueError se o intervalo for invertido ou maior que `DIAS_MAXIMO`.
+    """
+    ate = ate or date.today()
+    desde = desde or ate - timedelta(days=DIAS_PADRAO - 1)
+    if desde > ate:
+        raise ValueError("'desde' posterior a 'ate'")
+    if (ate - desde).days >= DIAS_MAXIMO:
+        raise ValueError(f"Intervalo maior que {DIAS_MAXIMO} dias")
+    return desde, ate
+
+
+def evolucao_precos(desde, ate, agendamento_id=None, imovel_id=None, cidade_id=None, bairro_id=None,
+                    data_checkin=None, noites=None, hospedes=None):
+    """
+    Série diária da diária (R$) observada entre `desde` e `ate` para um agendamento, um imóvel
+    ou uma localização. `data_checkin`, `noites` e `hospedes` (mínimo) restringem os agendamentos.
+    """
+    observacoes = ObservacaoPreco.objects.filter(observado_em__range=(desde, ate))
+    if agendamento_id:
+        observacoes = observacoes.filter(agendamento_id=agendamento_id)
+    elif imovel_id:
+        agendamentos = Agendamento.objects.filter(imovel_id=imovel_id)
+        if data_checkin:
+            agendamentos = agendamentos.filter(data_checkin=data_checkin)
+        observacoes = observacoes.filter(imovel_id=imovel_id, agendamento_id__in=agendamentos.values('id'))
+    elif cidade_id:
+        observacoes = observacoes.filter(imovel__cidade_id=cidade_id)
+        if bairro_id:
+            observacoes = observacoes.filter(imovel__bairro_id=bairro_id)
+        if data_checkin:
+            observacoes = observacoes.filter(agendamento__data_checkin=data_checkin)
+    else:
+        raise ValueError("Informe agendamento_id, imovel_id ou cidade_id")
+
+    if noites:
+        observacoes = observacoes.filter(noites=noites)
+    if hospedes:
+        observacoes = observacoes.filter(hospedes__gte=hospedes)
+
+    diaria = Cast('preco_total_centavos', FloatField()) / F('noites')
+    pontos = (
+        observacoes.values('observado_em')
+        .annotate(media=Avg(diaria), minimo=Min(diaria), maximo=Max(diaria), total=Count('*'))
+        .order_by('observado_em')
+    )
+    serie = [
+        {
+            'data': ponto['observado_em'].isoformat(),
+            'diaria_media': round(ponto['media'] / 100, 2),
+            'diaria_minima': round(ponto['minimo'] / 100, 2),
+            'diaria_maxima': round(ponto['maximo'] / 100, 2),
+            'observacoes': ponto['total'],
+        }
+        for ponto in pontos
+    ]
+
+    variacao = None
+    if len(serie) > 1 and serie[0]['diaria_media']:
+        variacao = round((serie[-1]['diaria_media'] / serie[0]['diaria_media'] - 1) * 100, 1)
+    return {
+        'desde': desde.isoformat(),
+        'ate': ate.isoformat(),
+        'pontos': serie,
+        'variacao_percentual': variacao,
+    }
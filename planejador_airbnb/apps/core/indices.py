@@ -0,0 +1,128 @@
+"""
+Índices de `agendamento` fora do Django (migração agendamento 0007) e relatório de uso dos
+índices (PostgreSQL).
+
+Quase todas as consultas leem estadias a partir de hoje. Os índices parciais de
+`INDICES_FUTUROS` guardam só os agendamentos com check-in a partir do primeiro dia de um
+mês (o "corte") e com diária: nas partições de meses que já passaram eles ficam vazios. O
+predicado é fixo no índice, então `rolar_indices_futuros`, chamado pelo `manter_particoes`,
+recria os índices com o corte do mês atual e apaga os do corte anterior. As consultas usam
+o índice quando filtram `data_checkin` a partir de uma data igual ou posterior ao corte e
+`preco_por_dia` não nulo.
+
+O índice BRIN de `data_checkin` não precisa de manutenção: o scraper grava cada unidade de
+trabalho (local e data de check-in) de uma vez, então cada faixa de páginas cobre poucos dias.
+"""
+from datetime import date
+
+from django.db import connection
+
+# nome base -> colunas. O nome real leva o mês do corte: agendamento_futuro_local_AAAAMM
+INDICES_FUTUROS = {
+    # APIs de disponibilidade (datas, hóspedes, noites) e listas de cidades e bairros com
+    # estadias futuras, só com o índice (sem ler a tabela)
+    'agendamento_futuro_local': '(cidade_id, bairro_id, data_checkin, hospedes) INCLUDE (data_checkout)',
+}
+
+PREDICADO_FUTURO = "data_checkin >= '{corte}' AND preco_por_dia IS NOT NULL"
+
+# Tamanho e uso de cada índice das tabelas do site; nas particionadas, somados entre as partições
+SQL_USO_INDICES = """
+    WITH RECURSIVE arvore AS (
+        SELECT i.indexrelid AS raiz, i.indexrelid AS indice, i.indrelid AS tabela
+        FROM pg_index i JOIN pg_class t ON t.oid = i.indrelid
+        WHERE t.relname = ANY(%s) AND t.relnamespace = 'public'::regnamespace
+        UNION ALL
+        SELECT a.raiz, h.inhrelid, x.indrelid
+        FROM arvore a JOIN pg_inherits h ON h.inhparent = a.indice JOIN pg_index x ON x.indexrelid = h.inhrelid
+    )
+    SELECT t.relname, r.relname, ix.indisunique OR ix.indisprimary, ix.indpred IS NOT NULL, am.amname,
+           SUM(pg_relation_size(a.indice)), COALESCE(SUM(s.idx_scan), 0), COALESCE(SUM(s.idx_tup_read), 0),
+           MAX(s.last_idx_scan)
+    FROM arvore a
+    JOIN pg_class r ON r.oid = a.raiz
+    JOIN pg_index ix ON ix.indexrelid = a.raiz
+    JOIN pg_class t ON t.oid = ix.indrelid
+    JOIN pg_am am ON am.oid = r.relam
+    LEFT JOIN pg_stat_user_indexes s ON s.indexrelid = a.indice
+    GROUP BY t.relname, r.relname, ix.indisunique, ix.indisprimary, ix.indpred, am.amname
+    ORDER BY t.relname, r.relname
+"""
+
+
+def corte_do_mes(dia=None):
+    return (dia or date.today()).replace(day=1)
+
+
+def indices_futuros_existentes(nome_base):
+    """Nomes dos índices de `nome_base` em `agendamento`, do corte mais antigo para o mais novo."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT indexname FROM pg_indexes WHERE schemaname = 'public' AND tablename = 'agendamento' "
+            "AND indexname ~ %s ORDER BY indexname",
+            [f'^{nome_base}_[0-9]{{6}}$'],
+        )
+        return [nome for nome, in cursor.fetchall()]
+
+
+def _criar_indice_particionado(nome, colunas, predicado):
+    """
+    Cria o índice em cada partição com CONCURRENTLY (a importação continua gravando) e os
+    anexa a um índice criado só na tabela pai, que fica válido quando todas estiverem anexadas.
+    Não pode rodar dentro de uma transação.
+    """
+    q = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {q(nome)} ON ONLY agendamento {colunas} WHERE {predicado}")
+        cursor.execute("""
+            SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'agendamento'::regclass
+              AND NOT EXISTS (
+                  SELECT 1 FROM pg_inherits x JOIN pg_index ix ON ix.indexrelid = x.inhrelid
+                  WHERE x.inhparent = %s::regclass AND ix.indrelid = c.oid
+              )
+            ORDER BY c.relname
+        """, [nome])
+        for particao, in cursor.fetchall():
+            indice = f'{particao}_{nome.removeprefix("agendamento_")}'
+            # Uma tentativa anterior interrompida deixa o índice inválido: é recriado
+            cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {q(indice)}")
+            cursor.execute(f"CREATE INDEX CONCURRENTLY {q(indice)} ON {q(particao)} {colunas} WHERE {predicado}")
+            cursor.execute(f"ALTER INDEX {q(nome)} ATTACH PARTITION {q(indice)}")
+
+
+def rolar_indices_futuros(corte=None):
+    """
+    Recria os índices parciais com o corte do mês de `corte` (padrão: mês atual) e apaga os de
+    cortes anteriores. Não faz nada se o índice do mês já existe. Retorna os índices criados.
+    """
+    corte = corte_do_mes(corte)
+    criados = []
+    for nome_base, colunas in INDICES_FUTUROS.items():
+        nome = f'{nome_base}_{corte:%Y%m}'
+        existentes = indices_futuros_existentes(nome_base)
+        if existentes and existentes[-1] >= nome:
+            continue
+        _criar_indice_particionado(nome, colunas, PREDICADO_FUTURO.format(corte=corte.isoformat()))
+        with connection.cursor() as cursor:
+            for antigo in existentes:
+                cursor.execute(f"DROP INDEX IF EXISTS {connection.ops.quote_name(antigo)}")
+        criados.append(nome)
+    return criados
+
+
+def uso_indices(tabelas):
+    """
+    [{tabela, indice, unico, parcial, tipo, bytes, varreduras, tuplas_lidas, ultima_varredura}]
+    dos índices das `tabelas`. Os contadores são os do pg_stat desde o último reset.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(SQL_USO_INDICES, [list(tabelas)])
+        return [
+            {
+                'tabela': tabela, 'indice': indice, 'unico': unico, 'parcial': parcial, 'tipo': tipo,
+                'bytes': int(tamanho or 0), 'varreduras': int(varreduras), 'tuplas_lidas': int(tuplas),
+                'ultima_varredura': ultima,
+            }
+            for tabela, indice, unico, parcial, tipo, tamanho, varreduras, tuplas, ultima in cursor.fetchall()
+        ]
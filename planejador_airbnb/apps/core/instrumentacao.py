@@ -0,0 +1,534 @@
+"""
+Instrumentação de desempenho das requisições.
+
+Para cada requisição são medidos:
+- quantidade de consultas SQL e tempo total no banco (via `execute_wrappers` instalados em
+  todas as conexões, inclusive as das threads do ORM assíncrono; funciona com DEBUG desligado);
+- acertos e falhas do cache (backend `LocMemCacheInstrumentado`);
+- tempo de serialização (JSON das APIs e renderização dos templates);
+- tamanho da resposta e tempo total.
+
+Os valores são devolvidos no cabeçalho `Server-Timing` (visível nas ferramentas de
+desenvolvedor do navegador), agregados por view no endpoint `/metricas/` em formato
+texto do Prometheus e registrados no log quando a requisição passa do orçamento
+configurado (`INSTRUMENTACAO_LIMITE_CONSULTAS` e `INSTRUMENTACAO_LIMITE_MS`).
+
+Fora de uma requisição (shell, comandos de gerenciamento), use o gerenciador de contexto:
+
+    with instrumentar() as metricas:
+        ...
+    print(metricas.consultas, metricas.tempo_banco)
+
+Detecção de padrões (`INSTRUMENTACAO_DETECTAR_PADROES`, ligada por padrão com DEBUG):
+as consultas são agrupadas pela forma normalizada do SQL (literais e listas de IN
+removidos). Formas repetidas `INSTRUMENTACAO_LIMITE_REPETICOES` vezes (N+1) e consultas
+acima de `INSTRUMENTACAO_CONSULTA_LENTA_MS` são registradas com o trecho da pilha do
+projeto que as originou. Views podem declarar `orcamento_consultas`; com
+`INSTRUMENTACAO_FALHAR_ORCAMENTO` (ligado ao rodar os testes) a requisição que passar do
+orçamento levanta `OrcamentoConsultasExcedido`. Em testes, o mesmo vale para blocos:
+
+    with orcamento_consultas(5):
+        self.client.get(url)
+
+Os agregados ficam na memória de cada processo: com vários workers do gunicorn, cada
+coleta do Prometheus enxerga o worker que atendeu a requisição.
+"""
+import hmac
+import logging
+import os
+import re
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from contextvars import ContextVar
+from decimal import Decimal
+from functools import lru_cache
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.memcached import PyMemcacheCache
+from django.core.cache.backends.redis import RedisCache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+from django.http import JsonResponse as DjangoJsonResponse
+
+from .cache_protegido import estatisticas_cache
+
+logger = logging.getLogger(__name__)
+
+_metricas_atuais = ContextVar('metricas_requisicao', default=None)
+
+CONFIGURACAO_PADRAO = {
+    'INSTRUMENTACAO_LIMITE_CONSULTAS': 20,
+    'INSTRUMENTACAO_LIMITE_MS': 500,
+    'INSTRUMENTACAO_LIMITE_REPETICOES': 5,
+    'INSTRUMENTACAO_CONSULTA_LENTA_MS': 100,
+    'INSTRUMENTACAO_FALHAR_ORCAMENTO': False,
+    'INSTRUMENTACAO_METRICAS_SEM_TOKEN': False,
+}
+
+
+def _configuracao(nome):
+    return getattr(settings, nome, CONFIGURACAO_PADRAO[nome])
+
+
+BALDES_LATENCIA = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+RE_LITERAL_TEXTO = re.compile(r"'(?:[^']|'')*'")
+RE_LITERAL_NUMERO = re.compile(r'\b\d+(?:\.\d+)?\b')
+RE_LISTA_IN = re.compile(r'\bIN\s*\((?:\s*\?\s*,)*\s*\?\s*\)', re.IGNORECASE)
+RE_ESPACOS = re.compile(r'\s+')
+
+
+class OrcamentoConsultasExcedido(AssertionError):
+    """Levantada quando uma view (ou bloco) executa mais consultas que o orçamento declarado."""
+
+
+@lru_cache(maxsize=2048)
+def normalizar_sql(sql):
+    """Forma da consulta: parâmetros e literais viram '?' e listas de IN viram 'IN (...)'."""
+    forma = sql.replace('%s', '?')
+    forma = RE_LITERAL_TEXTO.sub('?', forma)
+    forma = RE_LITERAL_NUMERO.sub('?', forma)
+    forma = RE_LISTA_IN.sub('IN (...)', forma)
+    return RE_ESPACOS.sub(' ', forma).strip()
+
+
+def _pilha_do_projeto():
+    """Quadros da pilha que pertencem ao código do projeto (sem Django e sem este módulo)."""
+    base = str(settings.BASE_DIR)
+    quadros = [
+        quadro for quadro in traceback.extract_stack()[:-3]
+        if quadro.filename.startswith(base) and quadro.filename != __file__
+        and f'{os.sep}site-packages{os.sep}' not in quadro.filename
+    ]
+    return ''.join(traceback.format_list(quadros[-6:]))
+
+
+class MetricasRequisicao:
+    """Valores medidos durante uma requisição (ou um bloco `instrumentar()`)."""
+
+    __slots__ = ('inicio', 'consultas', 'consultas_replica', 'tempo_banco', 'cache_acertos', 'cache_falhas',
+                 'tempo_serializacao', 'tamanho_resposta', 'duracao', 'pai', 'formas', 'lentas',
+                 'orcamento')
+
+    def __init__(self, pai=None, detectar=False):
+        self.pai = pai
+        # forma normalizada -> [quantidade, tempo total, pilha da repetição que disparou o alerta]
+        self.formas = {} if detectar else None
+        self.lentas = []
+        self.orcamento = None
+        self.inicio = time.perf_counter()
+        self.consultas = 0
+        # Consultas em outros aliases que não o primário (réplicas de leitura)
+        self.consultas_replica = 0
+        self.tempo_banco = 0.0
+        self.cache_acertos = 0
+        self.cache_falhas = 0
+        self.tempo_serializacao = 0.0
+        self.tamanho_resposta = 0
+        self.duracao = 0.0
+
+    def finalizar(self):
+        self.duracao = time.perf_counter() - self.inicio
+        return self
+
+    def problemas(self, limite_repeticoes):
+        """Relatório das consultas repetidas (N+1) e lentas, com a pilha de origem."""
+        relatorio = []
+        for forma, (quantidade, tempo, pilha) in (self.formas or {}).items():
+            if quantidade >= limite_repeticoes:
+                relatorio.append(
+                    f"N+1: {quantidade}x ({tempo * 1000:.1f} ms) {forma}\n{pilha or ''}"
+                )
+        for duracao, sql, pilha in self.lentas:
+            relatorio.append(f"Consulta lenta ({duracao * 1000:.1f} ms): {sql}\n{pilha}")
+        return relatorio
+
+    def server_timing(self):
+        replica = f', {self.consultas_replica} na replica' if self.consultas_replica else ''
+        return ', '.join([
+            f'db;dur={self.tempo_banco * 1000:.1f};desc="{self.consultas} consultas{replica}"',
+            f'cache;desc="{self.cache_acertos} acertos, {self.cache_falhas} falhas"',
+            f'ser;dur={self.tempo_serializacao * 1000:.1f};desc="serializacao"',
+            f'total;dur={self.duracao * 1000:.1f}',
+        ])
+
+
+def metricas_atuais():
+    """Métricas da requisição em andamento, ou None fora de uma requisição instrumentada."""
+    return _metricas_atuais.get()
+
+
+def _registrar_forma(metricas, sql, duracao):
+    registro = metricas.formas.get(forma := normalizar_sql(sql))
+    if registro is None:
+        registro = metricas.formas[forma] = [0, 0.0, None]
+    registro[0] += 1
+    registro[1] += duracao
+    # A pilha só é capturada quando a forma atinge o limite, para manter o custo baixo
+    if registro[0] == _configuracao('INSTRUMENTACAO_LIMITE_REPETICOES'):
+        registro[2] = _pilha_do_projeto()
+    if duracao * 1000 > _configuracao('INSTRUMENTACAO_CONSULTA_LENTA_MS'):
+        metricas.lentas.append((duracao, sql, _pilha_do_projeto()))
+
+
+def _medir_consulta(execute, sql, params, many, context):
+    metricas = _metricas_atuais.get()
+    if metricas is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duracao = time.perf_counter() - inicio
+        replica = context['connection'].alias != DEFAULT_DB_ALIAS
+        # Blocos aninhados (ex.: orcamento_consultas() em volta de uma requisição) também contam
+        while metricas is not None:
+            metricas.consultas += 1
+            metricas.consultas_replica += replica
+            metricas.tempo_banco += duracao
+            if metricas.formas is not None:
+                _registrar_forma(metricas, sql, duracao)
+            metricas = metricas.pai
+
+
+def _instalar_medicao(conexao):
+    if _medir_consulta not in conexao.execute_wrappers:
+        conexao.execute_wrappers.append(_medir_consulta)
+
+
+def _ao_criar_conexao(sender, connection, **kwargs):
+    # Nas views assíncronas o ORM roda em outras threads, cada uma com a própria conexão:
+    # o wrapper fica em todas, e a ContextVar (copiada para essas threads) decide o que medir
+    _instalar_medicao(connection)
+
+
+connection_created.connect(_ao_criar_conexao)
+
+
+@contextmanager
+def instrumentar(detectar=False):
+    """Mede consultas, cache e serialização executados dentro do bloco."""
+    pai = _metricas_atuais.get()
+    metricas = MetricasRequisicao(pai=pai, detectar=detectar)
+    token = _metricas_atuais.set(metricas)
+    try:
+        # Conexões abertas antes deste módulo ser importado não passaram pelo sinal
+        for conexao in connections.all(initialized_only=True):
+            _instalar_medicao(conexao)
+        yield metricas
+    finally:
+        metricas.finalizar()
+        _metricas_atuais.reset(token)
+
+
+@contextmanager
+def sem_medicao():
+    """Consultas do bloco fora das métricas (verificações periódicas que não são da requisição)."""
+    token = _metricas_atuais.set(None)
+    try:
+        yield
+    finally:
+        _metricas_atuais.reset(token)
+
+
+@contextmanager
+def orcamento_consultas(maximo, limite_repeticoes=None):
+    """
+    Para testes: falha se o bloco executar mais de `maximo` consultas, mostrando as
+    formas repetidas (N+1) e de onde vieram.
+    """
+    limite_repeticoes = limite_repeticoes or _configuracao('INSTRUMENTACAO_LIMITE_REPETICOES')
+    with instrumentar(detectar=True) as metricas:
+        yield metricas
+    if metricas.consultas > maximo:
+        raise OrcamentoConsultasExcedido(
+            f"{metricas.consultas} consultas executadas (orçamento: {maximo}).\n"
+            + '\n'.join(metricas.problemas(limite_repeticoes))
+        )
+
+
+@contextmanager
+def medir_serializacao():
+    """Soma o tempo do bloco ao tempo de serialização da requisição atual."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        duracao = time.perf_counter() - inicio
+        metricas = _metricas_atuais.get()
+        while metricas is not None:
+            metricas.tempo_serializacao += duracao
+            metricas = metricas.pai
+
+
+class CodificadorJSON(DjangoJSONEncoder):
+    """
+    Decimal como número (o `DjangoJSONEncoder` o escreve como texto). As views entregam
+    preços já convertidos de centavos (`apps.core.centavos`); um Decimal que chegue aqui
+    escapou dessa conversão e é registrado no log com DEBUG.
+    """
+
+    def default(self, o):
+        if isinstance(o, Decimal):
+            if settings.DEBUG:
+                logger.warning("Decimal serializado no JSON: %r", o)
+            return float(o)
+        return super().default(o)
+
+
+class JsonResponse(DjangoJsonResponse):
+    """
+    `JsonResponse` do Django com o tempo de serialização do JSON medido, o `CodificadorJSON`
+    e separadores compactos.
+    """
+
+    def __init__(self, data, encoder=CodificadorJSON, safe=True, json_dumps_params=None, **kwargs):
+        json_dumps_params = {'separators': (',', ':'), **(json_dumps_params or {})}
+        with medir_serializacao():
+            super().__init__(data, encoder=encoder, safe=safe, json_dumps_params=json_dumps_params, **kwargs)
+
+
+# ==========================
+# Cache
+# ==========================
+
+_AUSENTE = object()
+
+
+def _registrar_cache(acertos, falhas):
+    metricas = _metricas_atuais.get()
+    while metricas is not None:
+        metricas.cache_acertos += acertos
+        metricas.cache_falhas += falhas
+        metricas = metricas.pai
+
+
+class CacheInstrumentadoMixin:
+    """Contabiliza os acertos e falhas do backend de cache na requisição atual."""
+
+    def get(self, key, default=None, version=None):
+        valor = super().get(key, _AUSENTE, version)
+        if valor is _AUSENTE:
+            _registrar_cache(0, 1)
+            return default
+        _registrar_cache(1, 0)
+        return valor
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        encontrados = super().get_many(keys, version)
+        _registrar_cache(len(encontrados), len(keys) - len(encontrados))
+        return encontrados
+
+
+class LocMemCacheInstrumentado(CacheInstrumentadoMixin, LocMemCache):
+    """Memória local: cada processo tem o seu cache."""
+
+
+class RedisCacheInstrumentado(CacheInstrumentadoMixin, RedisCache):
+    """Redis, compartilhado por todos os workers (requer o pacote `redis`)."""
+
+
+class MemcachedCacheInstrumentado(CacheInstrumentadoMixin, PyMemcacheCache):
+    """Memcached, compartilhado por todos os workers (requer o pacote `pymemcache`)."""
+
+
+# ==========================
+# Agregados por view (Prometheus)
+# ==========================
+
+class AgregadorMetricas:
+    """Acumula as métricas por view para exposição no formato texto do Prometheus."""
+
+    def __init__(self):
+        self._trava = threading.Lock()
+        self._por_view = {}
+
+    def registrar(self, view, metricas, acima_orcamento):
+        with self._trava:
+            valores = self._por_view.get(view)
+            if valores is None:
+                valores = self._por_view[view] = {
+                    'requisicoes': 0, 'duracao': 0.0, 'baldes': [0] * len(BALDES_LATENCIA),
+                    'consultas': 0, 'consultas_replica': 0, 'tempo_banco': 0.0, 'cache_acertos': 0, 'cache_falhas': 0,
+                    'tempo_serializacao': 0.0, 'bytes': 0, 'acima_orcamento': 0,
+                }
+            valores['requisicoes'] += 1
+            valores['duracao'] += metricas.duracao
+            for indice, limite in enumerate(BALDES_LATENCIA):
+                if metricas.duracao <= limite:
+                    valores['baldes'][indice] += 1
+            valores['consultas'] += metricas.consultas
+            valores['consultas_replica'] += metricas.consultas_replica
+            valores['tempo_banco'] += metricas.tempo_banco
+            valores['cache_acertos'] += metricas.cache_acertos
+            valores['cache_falhas'] += metricas.cache_falhas
+            valores['tempo_serializacao'] += metricas.tempo_serializacao
+            valores['bytes'] += metricas.tamanho_resposta
+            valores['acima_orcamento'] += int(acima_orcamento)
+
+    def limpar(self):
+        with self._trava:
+            self._por_view.clear()
+
+    def texto_prometheus(self):
+        with self._trava:
+            por_view = {view: dict(valores, baldes=list(valores['baldes']))
+                        for view, valores in self._por_view.items()}
+
+        contadores = (
+            ('planejador_requisicoes_total', 'requisicoes', 'Requisições atendidas.'),
+            ('planejador_consultas_sql_total', 'consultas', 'Consultas SQL executadas.'),
+            ('planejador_consultas_sql_replica_total', 'consultas_replica', 'Consultas SQL executadas em réplicas.'),
+            ('planejador_tempo_banco_segundos_total', 'tempo_banco', 'Tempo total gasto no banco.'),
+            ('planejador_cache_acertos_total', 'cache_acertos', 'Acertos do cache.'),
+            ('planejador_cache_falhas_total', 'cache_falhas', 'Falhas do cache.'),
+            ('planejador_serializacao_segundos_total', 'tempo_serializacao', 'Tempo de serialização.'),
+            ('planejador_resposta_bytes_total', 'bytes', 'Bytes enviados nas respostas.'),
+            ('planejador_requisicoes_acima_orcamento_total', 'acima_orcamento',
+             'Requisições que passaram do orçamento de consultas ou de tempo.'),
+        )
+        linhas = []
+        for nome, chave, descricao in contadores:
+            linhas += [f'# HELP {nome} {descricao}', f'# TYPE {nome} counter']
+            linhas += [f'{nome}{{view="{view}"}} {valores[chave]}' for view, valores in sorted(por_view.items())]
+
+        nome = 'planejador_requisicao_segundos'
+        linhas += [f'# HELP {nome} Latência das requisições.', f'# TYPE {nome} histogram']
+        for view, valores in sorted(por_view.items()):
+            for limite, quantidade in zip(BALDES_LATENCIA, valores['baldes']):
+                linhas.append(f'{nome}_bucket{{view="{view}",le="{limite}"}} {quantidade}')
+            linhas.append(f'{nome}_bucket{{view="{view}",le="+Inf"}} {valores["requisicoes"]}')
+            linhas.append(f'{nome}_sum{{view="{view}"}} {valores["duracao"]}')
+            linhas.append(f'{nome}_count{{view="{view}"}} {valores["requisicoes"]}')
+        return '\n'.join(linhas) + '\n'
+
+
+agregador = AgregadorMetricas()
+
+
+def _nome_view(request):
+    resolver_match = getattr(request, 'resolver_match', None)
+    if resolver_match is None:
+        return 'nao_resolvida'
+    return resolver_match.view_name or resolver_match._func_path
+
+
+def atributo_da_view(request, nome, padrao=None):
+    """
+    Atributo declarado na classe da view resolvida (ex.: `orcamento_consultas`), ou na função.
+    Lido depois da resposta, o que dispensa `process_view` e a troca de thread que ele exigiria
+    nos middlewares assíncronos.
+    """
+    resolver_match = getattr(request, 'resolver_match', None)
+    if resolver_match is None:
+        return padrao
+    view = getattr(resolver_match.func, 'view_class', resolver_match.func)
+    return getattr(view, nome, padrao)
+
+
+# ==========================
+# Middleware e endpoint
+# ==========================
+
+class InstrumentacaoMiddleware:
+    """
+    Instrumenta cada requisição e adiciona o cabeçalho `Server-Timing` à resposta.
+    Deve ser o primeiro middleware, para incluir as consultas de sessão e autenticação.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.limite_consultas = _configuracao('INSTRUMENTACAO_LIMITE_CONSULTAS')
+        self.limite_ms = _configuracao('INSTRUMENTACAO_LIMITE_MS')
+        self.detectar = getattr(settings, 'INSTRUMENTACAO_DETECTAR_PADROES', settings.DEBUG)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with instrumentar(detectar=self.detectar) as metricas:
+            response = self.get_response(request)
+        self._finalizar(request, response, metricas)
+        return response
+
+    async def __acall__(self, request):
+        with instrumentar(detectar=self.detectar) as metricas:
+            response = await self.get_response(request)
+        self._finalizar(request, response, metricas)
+        return response
+
+    def process_template_response(self, request, response):
+        # A renderização do template acontece depois da view; o callback fecha a medição
+        inicio = time.perf_counter()
+        metricas = _metricas_atuais.get()
+
+        def _fim_renderizacao(resposta):
+            if metricas is not None:
+                metricas.tempo_serializacao += time.perf_counter() - inicio
+
+        response.add_post_render_callback(_fim_renderizacao)
+        return response
+
+    def _finalizar(self, request, response, metricas):
+        if not response.streaming:
+            metricas.tamanho_resposta = len(response.content)
+        response['Server-Timing'] = metricas.server_timing()
+
+        view = _nome_view(request)
+        # Orçamento declarado na view: atributo `orcamento_consultas` da classe (ou da função)
+        metricas.orcamento = atributo_da_view(request, 'orcamento_consultas')
+        acima_orcamento = (metricas.consultas > self.limite_consultas
+                           or metricas.duracao * 1000 > self.limite_ms)
+        if view != 'core:metricas':
+            agregador.registrar(view, metricas, acima_orcamento)
+        self._verificar_padroes(request, view, metricas)
+        if acima_orcamento:
+            logger.warning(
+                "Requisição acima do orçamento: %s %s (view %s) | %d consultas, banco %.1f ms, "
+                "total %.1f ms, cache %d/%d, serialização %.1f ms, %d bytes",
+                request.method, request.get_full_path(), view, metricas.consultas,
+                metricas.tempo_banco * 1000, metricas.duracao * 1000, metricas.cache_acertos,
+                metricas.cache_acertos + metricas.cache_falhas, metricas.tempo_serializacao * 1000,
+                metricas.tamanho_resposta,
+            )
+
+
+    def _verificar_padroes(self, request, view, metricas):
+        problemas = metricas.problemas(_configuracao('INSTRUMENTACAO_LIMITE_REPETICOES'))
+        if problemas:
+            logger.warning("Padrões de consulta suspeitos em %s %s (view %s):\n%s",
+                           request.method, request.path, view, '\n'.join(problemas))
+
+        if metricas.orcamento is not None and metricas.consultas > metricas.orcamento:
+            mensagem = (f"A view {view} executou {metricas.consultas} consultas "
+                        f"(orçamento declarado: {metricas.orcamento}).")
+            if _configuracao('INSTRUMENTACAO_FALHAR_ORCAMENTO'):
+                raise OrcamentoConsultasExcedido(mensagem + '\n' + '\n'.join(problemas))
+            logger.warning(mensagem)
+
+
+def metricas_prometheus(request):
+    """
+    Endpoint com os agregados no formato texto do Prometheus. Exige o cabeçalho
+    `Authorization: Bearer <token>` com o setting `INSTRUMENTACAO_TOKEN_METRICAS`; sem o
+    setting, só responde se `INSTRUMENTACAO_METRICAS_SEM_TOKEN` for verdadeiro (desenvolvimento).
+    """
+    token = getattr(settings, 'INSTRUMENTACAO_TOKEN_METRICAS', None)
+    if token:
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return HttpResponseForbidden()
+    elif not _configuracao('INSTRUMENTACAO_METRICAS_SEM_TOKEN'):
+        return HttpResponseForbidden()
+    texto = agregador.texto_prometheus() + estatisticas_cache.texto_prometheus()
+    return HttpResponse(texto, content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,114 @@
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+
+from apps.core.registro_buscas import (
+    CABECALHO_AQUECIMENTO, buscas_frequentes, remover_registros_antigos,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Reexecuta as buscas, comparações e consultas ao planejador mais frequentes do registro de buscas "
+        "(apps/core/registro_buscas.py) para deixar o cache pronto depois de um deploy ou de uma importação. "
+        "As requisições rodam em paralelo e param ao fim do tempo máximo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--horas', type=float, default=24, help="Janela do registro considerada.")
+        parser.add_argument('--limite', type=int, default=100, help="Quantidade de combinações aquecidas.")
+        parser.add_argument('--minimo', type=int, default=2,
+                            help="Ocorrências mínimas para uma combinação ser aquecida.")
+        parser.add_argument('--workers', type=int, default=4, help="Requisições simultâneas.")
+        parser.add_argument('--tempo-maximo', type=float, default=120,
+                            help="Segundos disponíveis; o que não couber no tempo é descartado.")
+        parser.add_argument('--url-base', default=getattr(settings, 'AQUECIMENTO_URL_BASE', None),
+                            help="Servidor a aquecer (ex.: http://127.0.0.1:8000). Sem ela, as views rodam "
+                                 "neste processo, o que só adianta com um cache compartilhado.")
+        parser.add_argument('--aguardar', type=float, default=0,
+                            help="Segundos de espera antes de começar (tempo para o servidor ler a nova "
+                                 "versão dos dados).")
+
+    def handle(self, *args, **options):
+        url_base = (options['url_base'] or '').rstrip('/')
+        if not url_base and isinstance(caches['default'], LocMemCache):
+            raise CommandError(
+                "O cache em memória local é de cada processo: informe --url-base (ou AQUECIMENTO_URL_BASE) "
+                "para aquecer o servidor."
+            )
+
+        removidos = remover_registros_antigos(getattr(settings, 'REGISTRO_BUSCAS_RETENCAO_DIAS', 7))
+        buscas = buscas_frequentes(options['horas'], options['limite'], options['minimo'])
+        if not buscas:
+            self.stdout.write("Nenhuma busca registrada na janela; nada a aquecer.")
+            return
+
+        if options['aguardar']:
+            time.sleep(options['aguardar'])
+
+        inicio = time.monotonic()
+        limite = inicio + options['tempo_maximo']
+        requisitar = self._requisitar_http if url_base else self._requisitar_local
+        aquecidas, falhas, descartadas = 0, 0, 0
+
+        with ThreadPoolExecutor(max_workers=options['workers'], thread_name_prefix='aquecimento') as pool:
+            futuros = {
+                pool.submit(self._executar, requisitar, url_base, caminho, params, limite): caminho
+                for caminho, params, _ in buscas
+            }
+            for futuro in as_completed(futuros):
+                resultado = futuro.result()
+                if resultado is None:
+                    descartadas += 1
+                elif resultado == 200:
+                    aquecidas += 1
+                else:
+                    falhas += 1
+                    self.stderr.write(f"{futuros[futuro]} respondeu {resultado}.")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{aquecidas} de {len(buscas)} combinações aquecidas em {time.monotonic() - inicio:.1f} s "
+            f"({falhas} falhas, {descartadas} fora do tempo máximo, {removidos} arquivos de registro antigos removidos)."
+        ))
+
+    def _executar(self, requisitar, url_base, caminho, params, limite):
+        restante = limite - time.monotonic()
+        if restante <= 0:
+            return None
+        return requisitar(url_base, caminho, params, restante)
+
+    @staticmethod
+    def _requisitar_http(url_base, caminho, params, restante):
+        # X-Forwarded-Proto evita o redirecionamento para HTTPS quando o servidor fica atrás do nginx
+        requisicao = urllib.request.Request(
+            f'{url_base}{caminho}?{urlencode(params)}',
+            headers={'X-Forwarded-Proto': 'https', CABECALHO_AQUECIMENTO: '1'},
+        )
+        try:
+            with urllib.request.urlopen(requisicao, timeout=min(restante, 60)) as resposta:
+                resposta.read()
+                return resposta.status
+        except urllib.error.HTTPError as erro:
+            return erro.code
+        except (urllib.error.URLError, TimeoutError):
+            return 0
+
+    @staticmethod
+    def _requisitar_local(url_base, caminho, params, restante):
+        cliente = Client(HTTP_HOST='localhost', headers={CABECALHO_AQUECIMENTO: '1'})
+        try:
+            return cliente.get(caminho, params, secure=True).status_code
+        except Exception:
+            return 500
+        finally:
+            # Cada thread do pool abre a própria conexão com o banco
+            connections.close_all()
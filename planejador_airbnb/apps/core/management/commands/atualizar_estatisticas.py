@@ -0,0 +1,64 @@
+import time
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.estatisticas import atualizar_estatisticas
+from apps.core.resumo_imovel import sincronizar_resumo_imovel
+from apps.core.versao_dados import incrementar_versao
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula as estatísticas e os histogramas de preço por cidade, bairro, data de check-in, duração "
+        "e hóspedes (tabelas estatistica_local e histograma_preco_local) usados na busca, na comparação e "
+        "no planejador, e incrementa a versão dos dados que invalida o cache. "
+        "Execute após cada importação de dados; ao final, reaquece o cache com as buscas mais frequentes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', default=None,
+                            help="Recalcula apenas os check-ins a partir desta data (AAAA-MM-DD). Padrão: hoje.")
+        parser.add_argument('--cidade', type=int, action='append', dest='cidades',
+                            help="Importação parcial: invalida o cache apenas desta cidade (pode ser repetido).")
+        parser.add_argument('--sem-aquecimento', action='store_true',
+                            help="Não executa o aquecer_cache ao final.")
+
+    def handle(self, *args, **options):
+        try:
+            desde = date.fromisoformat(options['desde']) if options['desde'] else None
+        except ValueError:
+            raise CommandError("--desde deve estar no formato AAAA-MM-DD.")
+
+        # Partições dos próximos meses (e as das linhas que caíram na padrão) e retenção
+        call_command('manter_particoes', stdout=self.stdout, stderr=self.stderr)
+
+        # Cópias de imóvel/avaliação em agendamento que tenham chegado por fora do scraper
+        corrigidos = sincronizar_resumo_imovel()
+        if corrigidos:
+            self.stdout.write(f"{corrigidos} agendamentos com cópias de imóvel/avaliação atualizadas.")
+
+        inicio = time.perf_counter()
+        linhas_estatisticas, linhas_histograma = atualizar_estatisticas(desde)
+        # Nova versão dos dados: as chaves de cache anteriores deixam de ser usadas
+        incrementar_versao(options['cidades'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{linhas_estatisticas} linhas de estatísticas e {linhas_histograma} faixas de histograma gravadas "
+            f"em {time.perf_counter() - inicio:.1f} s."
+        ))
+
+        if not options['sem_aquecimento']:
+            self._aquecer_cache()
+
+    def _aquecer_cache(self):
+        url_base = getattr(settings, 'AQUECIMENTO_URL_BASE', None)
+        if not url_base and isinstance(caches['default'], LocMemCache):
+            self.stdout.write("Aquecimento do cache ignorado: defina AQUECIMENTO_URL_BASE para aquecer o servidor.")
+            return
+        # O servidor só percebe a nova versão dos dados na próxima verificação
+        aguardar = getattr(settings, 'VERSAO_DADOS_INTERVALO_VERIFICACAO', 5) if url_base else 0
+        call_command('aquecer_cache', url_base=url_base, aguardar=aguardar, stdout=self.stdout, stderr=self.stderr)
@@ -0,0 +1,475 @@
+import http.client
+import json
+import os
+import resource
+import statistics
+import subprocess
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection, connections
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from apps.agendamento.models import Agendamento
+from apps.core.cache_protegido import estatisticas_cache
+from apps.core.indices import uso_indices
+from apps.core.instrumentacao import instrumentar
+from apps.core.registro_buscas import CABECALHO_AQUECIMENTO
+from apps.localizacoes.models import Bairro, Cidade
+
+
+DIRETORIO_RESULTADOS = os.path.join(settings.BASE_DIR, 'benchmarks', 'resultados')
+
+
+def _percentil(valores_ordenados, percentil):
+    """Percentil pelo método do posto mais próximo."""
+    indice = max(0, min(len(valores_ordenados) - 1, round(percentil / 100 * len(valores_ordenados)) - 1))
+    return valores_ordenados[indice]
+
+
+class Command(BaseCommand):
+    help = (
+        "Reproduz um conjunto fixo de requisições contra as páginas e APIs de busca, comparação e "
+        "planejador, reportando latência p50/p95/p99, consultas SQL e memória. Os resultados são "
+        "gravados em JSON para comparação entre commits."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticoes', type=int, default=20, help="Requisições medidas por endpoint.")
+        parser.add_argument('--aquecimento', type=int, default=2, help="Requisições descartadas por endpoint.")
+        parser.add_argument('--manter-cache', action='store_true',
+                            help="Não limpa o cache entre as requisições (mede o caminho com cache quente).")
+        parser.add_argument('--endpoint', action='append', dest='endpoints',
+                            help="Executa apenas o endpoint informado (pode ser repetido).")
+        parser.add_argument('--rotulo', default='', help="Identificação livre gravada no resultado.")
+        parser.add_argument('--saida', default=DIRETORIO_RESULTADOS, help="Diretório dos arquivos de resultado.")
+        parser.add_argument('--comparar', metavar='ARQUIVO',
+                            help="Arquivo de resultado anterior para comparar com a execução atual.")
+        parser.add_argument('--rajada', type=int, default=0, metavar='N',
+                            help="Em vez da latência, dispara N requisições simultâneas por endpoint com o "
+                                 "cache vazio e compara os cálculos executados com os de uma requisição isolada.")
+        parser.add_argument('--carga', type=int, default=0, metavar='CLIENTES',
+                            help="Teste de carga contra um servidor em execução (--url-base): CLIENTES "
+                                 "conexões simultâneas por endpoint, reportando requisições/s e latência.")
+        parser.add_argument('--url-base', default='http://127.0.0.1:8000', help="Servidor usado por --carga.")
+        parser.add_argument('--duracao', type=float, default=15, help="Segundos de carga por endpoint.")
+        parser.add_argument('--planos', action='store_true',
+                            help="PostgreSQL: executa EXPLAIN ANALYZE das consultas em agendamento de cada "
+                                 "endpoint e mostra partições lidas, buffers e tempo no banco.")
+        parser.add_argument('--por-linha', action='store_true',
+                            help="PostgreSQL: separa o tempo de cada endpoint em banco, serialização e Python e "
+                                 "divide o tempo em Python pelas linhas lidas do banco (custo por linha).")
+        parser.add_argument('--conexoes', type=int, default=0, metavar='N',
+                            help="Mede N ciclos de requisição (início, SELECT 1, fim) com a configuração de "
+                                 "conexões atual (CONN_MAX_AGE ou pool) e quantas conexões distintas foram usadas.")
+
+    def handle(self, *args, **options):
+        if options['conexoes']:
+            self._conexoes(options['conexoes'])
+            return
+
+        parametros = self._parametros_base()
+        endpoints = self._endpoints(parametros)
+        if options['endpoints']:
+            endpoints = [e for e in endpoints if e[0] in options['endpoints']]
+            if not endpoints:
+                raise CommandError("Nenhum endpoint corresponde aos nomes informados.")
+
+        # 'localhost' está em ALLOWED_HOSTS nos dois ambientes; 'secure' evita o redirecionamento SSL de produção.
+        # O cabeçalho de aquecimento impede que as requisições repetidas entrem no registro de buscas
+        self.cliente = Client(HTTP_HOST='localhost', headers={CABECALHO_AQUECIMENTO: '1'})
+        if options['rajada']:
+            self._rajada(endpoints, options['rajada'])
+            return
+        if options['carga']:
+            self._carga(endpoints, options)
+            return
+        if options['planos']:
+            self._planos(endpoints)
+            return
+        if options['por_linha']:
+            self._por_linha(endpoints, options['repeticoes'])
+            return
+
+        total_agendamentos = Agendamento.objects.count()
+        self.stdout.write(f"Banco: {connection.vendor} | {total_agendamentos} agendamentos | parâmetros: {parametros}\n")
+        self.stdout.write(f"{'Endpoint':<28} | {'status':>6} | {'p50 ms':>8} | {'p95 ms':>8} | {'p99 ms':>8} | "
+                          f"{'consultas':>9} | {'memória KB':>10}")
+        self.stdout.write('-' * 96)
+
+        resultados = {}
+        for nome, url, params in endpoints:
+            resultados[nome] = self._medir(url, params, options)
+            r = resultados[nome]
+            self.stdout.write(f"{nome:<28} | {r['status']:>6} | {r['p50_ms']:>8.1f} | {r['p95_ms']:>8.1f} | "
+                              f"{r['p99_ms']:>8.1f} | {r['consultas']:>9} | {r['pico_memoria_kb']:>10.0f}")
+
+        # Tamanho dos índices de agendamento: o ganho de tempo de um índice novo vem com este custo
+        # em disco e em cada escrita da importação
+        indices = {}
+        if connection.vendor == 'postgresql':
+            indices = {i['indice']: i['bytes'] for i in uso_indices(['agendamento'])}
+            self.stdout.write(f"\nÍndices de agendamento ({sum(indices.values()) / 1024 ** 2:.1f} MB):")
+            for nome, tamanho in indices.items():
+                self.stdout.write(f"  {nome:<45} {tamanho / 1024 ** 2:>8.1f} MB")
+
+        relatorio = {
+            'rotulo': options['rotulo'],
+            'commit': self._commit_atual(),
+            'data': datetime.now().isoformat(timespec='seconds'),
+            'banco': connection.vendor,
+            'total_agendamentos': total_agendamentos,
+            'repeticoes': options['repeticoes'],
+            'cache_limpo': not options['manter_cache'],
+            'parametros': parametros,
+            'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            'resultados': resultados,
+            'indices_agendamento_bytes': indices,
+        }
+        os.makedirs(options['saida'], exist_ok=True)
+        arquivo = os.path.join(
+            options['saida'], f"benchmark_{datetime.now():%Y%m%d_%H%M%S}_{relatorio['commit'] or 'sem_commit'}.json"
+        )
+        with open(arquivo, 'w', encoding='utf-8') as f:
+            json.dump(relatorio, f, ensure_ascii=False, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"\nResultados gravados em {arquivo}"))
+
+        if options['comparar']:
+            self._comparar(options['comparar'], relatorio)
+
+    # --- Cenário ---
+
+    def _parametros_base(self):
+        """Escolhe, de forma determinística, localizações e datas que existem no banco."""
+        hoje = date.today()
+        cidades = list(
+            Cidade.objects.filter(imoveis_cidade__agendamentos__data_checkin__gte=hoje)
+            .annotate(total=Count('imoveis_cidade__agendamentos')).order_by('-total', 'id')[:2]
+        )
+        if not cidades:
+            raise CommandError("Sem agendamentos futuros. Gere dados com 'manage.py gerar_dados_sinteticos'.")
+        cidade_1 = cidades[0]
+        cidade_2 = cidades[-1]
+        bairros = list(Bairro.objects.filter(cidade=cidade_1).order_by('id').values_list('id', flat=True)[:2])
+
+        # Combinação (check-in, hóspedes, noites) mais frequente na cidade principal
+        referencia = (
+            Agendamento.objects.filter(imovel__cidade=cidade_1, data_checkin__gt=hoje)
+            .values('data_checkin', 'hospedes', 'data_checkout')
+            .annotate(total=Count('id')).order_by('-total', 'data_checkin').first()
+        )
+        return {
+            'cidade_1': cidade_1.id,
+            'cidade_2': cidade_2.id,
+            'bairro_1': bairros[0] if bairros else None,
+            'bairro_2': bairros[-1] if len(bairros) > 1 else None,
+            'data_checkin': referencia['data_checkin'].isoformat(),
+            'hospedes': referencia['hospedes'],
+            'noites': (referencia['data_checkout'] - referencia['data_checkin']).days,
+        }
+
+    def _endpoints(self, p):
+        busca = {'cidade': p['cidade_1'], 'data_checkin': p['data_checkin'],
+                 'hospedes': p['hospedes'], 'quantidade_noites': p['noites']}
+        comparacao = {'cidade_1': p['cidade_1'], 'cidade_2': p['cidade_2'], 'data_checkin': p['data_checkin'],
+                      'hospedes': p['hospedes'], 'quantidade_noites': p['noites']}
+        if p['cidade_1'] == p['cidade_2']:
+            comparacao.update(bairro_1=p['bairro_1'], bairro_2=p['bairro_2'])
+        return [
+            ('home', '/', {}),
+            ('resultados_busca', '/resultados/', busca),
+            ('api_datas_disponiveis', '/api/datas-disponiveis/', {'cidade_id': p['cidade_1']}),
+            ('api_datas_bairro', '/api/datas-disponiveis/', {'cidade_id': p['cidade_1'], 'bairro_id': p['bairro_1']}),
+            ('api_hospedes_disponiveis', '/api/hospedes-disponiveis/',
+             {'cidade_id': p['cidade_1'], 'data_checkin': p['data_checkin']}),
+            ('api_noites_disponiveis', '/api/noites-disponiveis/',
+             {'cidade_id': p['cidade_1'], 'data_checkin': p['data_checkin'], 'hospedes': p['hospedes']}),
+            ('comparacao', '/comparacao/', {}),
+            ('api_bairros_comparacao', '/api/bairros-comparacao/', {'cidade_id': p['cidade_1']}),
+            ('api_comparacao_data', '/api/comparacao-data/', comparacao),
+            ('planejador_ferias', '/planejador-ferias/', {}),
+            ('api_planejador_ferias', '/api/planejador-ferias/',
+             {'orcamento_total': 3000, 'quantidade_noites': 4, 'hospedes': 2, 'periodo_busca': 90}),
+        ]
+
+    # --- Medição ---
+
+    def _requisicao(self, url, params, options):
+        if not options['manter_cache']:
+            cache.clear()
+        return self.cliente.get(url, params, secure=True)
+
+    def _medir(self, url, params, options):
+        for _ in range(options['aquecimento']):
+            self._requisicao(url, params, options)
+
+        tempos = []
+        for _ in range(options['repeticoes']):
+            inicio = time.perf_counter()
+            resposta = self._requisicao(url, params, options)
+            tempos.append((time.perf_counter() - inicio) * 1000)
+        tempos.sort()
+
+        # Consultas e memória em uma passada separada, para não distorcer a latência
+        tracemalloc.start()
+        with CaptureQueriesContext(connection) as consultas:
+            self._requisicao(url, params, options)
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        return {
+            'status': resposta.status_code,
+            'p50_ms': _percentil(tempos, 50),
+            'p95_ms': _percentil(tempos, 95),
+            'p99_ms': _percentil(tempos, 99),
+            'media_ms': statistics.fmean(tempos),
+            'consultas': len(consultas),
+            'pico_memoria_kb': pico / 1024,
+            'tamanho_resposta': len(resposta.content),
+        }
+
+    # --- Rajada de requisições simultâneas (proteção contra estouro do cache) ---
+
+    def _calculos_executados(self):
+        return sum(valores['calculos'] for valores in estatisticas_cache.valores().values())
+
+    def _rajada(self, endpoints, quantidade):
+        self.stdout.write(f"Rajada de {quantidade} requisições simultâneas por endpoint, com o cache vazio\n")
+        self.stdout.write(f"{'Endpoint':<28} | {'status':>8} | {'tempo ms':>8} | {'cálculos isolada':>16} | "
+                          f"{'cálculos rajada':>15} | {'duplicados':>10} | {'coalescidos':>11}")
+        self.stdout.write('-' * 114)
+
+        for nome, url, params in endpoints:
+            # Referência: quantos cálculos uma única requisição com o cache vazio executa
+            cache.clear()
+            estatisticas_cache.limpar()
+            self.cliente.get(url, params, secure=True)
+            calculos_isolada = self._calculos_executados()
+
+            cache.clear()
+            estatisticas_cache.limpar()
+            barreira = threading.Barrier(quantidade)
+
+            def _disparar(_):
+                cliente = Client(HTTP_HOST='localhost', headers={CABECALHO_AQUECIMENTO: '1'})
+                barreira.wait()
+                try:
+                    return cliente.get(url, params, secure=True).status_code
+                finally:
+                    connections.close_all()
+
+            inicio = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=quantidade) as pool:
+                status = sorted(set(pool.map(_disparar, range(quantidade))))
+            decorrido = (time.perf_counter() - inicio) * 1000
+
+            calculos_rajada = self._calculos_executados()
+            coalescidos = sum(valores['coalescidos'] for valores in estatisticas_cache.valores().values())
+            self.stdout.write(
+                f"{nome:<28} | {','.join(map(str, status)):>8} | {decorrido:>8.0f} | {calculos_isolada:>16} | "
+                f"{calculos_rajada:>15} | {calculos_rajada - calculos_isolada:>10} | {coalescidos:>11}"
+            )
+
+    # --- Planos de execução (particionamento de agendamento) ---
+
+    def _planos(self, endpoints):
+        if connection.vendor != 'postgresql':
+            raise CommandError("--planos exige PostgreSQL.")
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT count(*) FROM pg_inherits WHERE inhparent = 'agendamento'::regclass")
+            total_particoes = cursor.fetchone()[0]
+        self.stdout.write(f"Partições de agendamento: {total_particoes or 'tabela não particionada'}\n")
+        self.stdout.write(f"{'Endpoint':<28} | {'consultas':>9} | {'partições lidas':>15} | {'buffers':>9} | "
+                          f"{'banco ms':>9}")
+        self.stdout.write('-' * 84)
+
+        for nome, url, params in endpoints:
+            cache.clear()
+            with CaptureQueriesContext(connection) as capturadas:
+                self.cliente.get(url, params, secure=True)
+            consultas = [
+                c['sql'] for c in capturadas.captured_queries
+                if c['sql'].startswith('SELECT') and '"agendamento"' in c['sql']
+            ]
+            lidas, buffers, tempo = [], 0, 0.0
+            for sql in consultas:
+                with connection.cursor() as cursor:
+                    cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}")
+                    plano = cursor.fetchone()[0]
+                plano = json.loads(plano) if isinstance(plano, str) else plano
+                raiz = plano[0]['Plan']
+                lidas.append(len(self._relacoes_lidas(raiz)))
+                buffers += raiz.get('Shared Hit Blocks', 0) + raiz.get('Shared Read Blocks', 0)
+                tempo += plano[0]['Execution Time']
+            if not consultas:
+                continue
+            self.stdout.write(
+                f"{nome:<28} | {len(consultas):>9} | {max(lidas):>15} | {buffers:>9} | {tempo:>9.1f}"
+            )
+
+    def _relacoes_lidas(self, no):
+        """Tabelas de agendamento (ou partições) efetivamente varridas pelo nó e seus filhos."""
+        relacoes = set()
+        # Partições descartadas na execução aparecem no plano com zero loops
+        if no.get('Relation Name', '').startswith('agendamento') and no.get('Actual Loops', 1) > 0:
+            relacoes.add(no['Relation Name'])
+        for filho in no.get('Plans', []):
+            relacoes |= self._relacoes_lidas(filho)
+        return relacoes
+
+    # --- Custo por linha em Python (conversão de tipos, laços das views) ---
+
+    def _por_linha(self, endpoints, repeticoes):
+        if connection.vendor != 'postgresql':
+            raise CommandError("--por-linha exige PostgreSQL (a contagem de linhas usa o rowcount do psycopg).")
+        linhas = [0]
+
+        def _contar_linhas(execute, sql, params, many, context):
+            resultado = execute(sql, params, many, context)
+            if context['cursor'].rowcount > 0 and sql.lstrip().upper().startswith('SELECT'):
+                linhas[0] += context['cursor'].rowcount
+            return resultado
+
+        self.stdout.write(f"Mediana de {repeticoes} requisições com o cache vazio; "
+                          f"'Python' = total - banco - serialização (inclui a leitura das linhas)\n")
+        self.stdout.write(f"{'Endpoint':<28} | {'linhas':>7} | {'total ms':>8} | {'banco ms':>8} | "
+                          f"{'serial. ms':>10} | {'Python ms':>9} | {'µs/linha':>8}")
+        self.stdout.write('-' * 98)
+        for nome, url, params in endpoints:
+            medidas = []
+            for _ in range(repeticoes):
+                cache.clear()
+                linhas[0] = 0
+                with connection.execute_wrapper(_contar_linhas), instrumentar() as metricas:
+                    self.cliente.get(url, params, secure=True)
+                python = metricas.duracao - metricas.tempo_banco - metricas.tempo_serializacao
+                medidas.append((python, metricas.duracao, metricas.tempo_banco, metricas.tempo_serializacao, linhas[0]))
+            python, total, banco, serializacao, quantidade = sorted(medidas)[len(medidas) // 2]
+            por_linha = f"{python * 1e6 / quantidade:>8.1f}" if quantidade else f"{'-':>8}"
+            self.stdout.write(
+                f"{nome:<28} | {quantidade:>7} | {total * 1000:>8.1f} | {banco * 1000:>8.1f} | "
+                f"{serializacao * 1000:>10.2f} | {python * 1000:>9.1f} | {por_linha}"
+            )
+
+    # --- Carga contra um servidor real (WSGI x ASGI) ---
+
+    def _carga(self, endpoints, options):
+        clientes, duracao = options['carga'], options['duracao']
+        alvo = urlsplit(options['url_base'])
+        self.stdout.write(f"Carga: {clientes} clientes por {duracao:.0f} s em {options['url_base']}\n")
+        self.stdout.write(f"{'Endpoint':<28} | {'req/s':>8} | {'p50 ms':>8} | {'p95 ms':>8} | {'p99 ms':>8} | "
+                          f"{'erros':>6}")
+        self.stdout.write('-' * 82)
+
+        for nome, url, params in endpoints:
+            caminho = f"{url}?{urlencode(params)}" if params else url
+            limite = time.monotonic() + duracao
+            barreira = threading.Barrier(clientes)
+
+            def _cliente(_):
+                # Uma conexão keep-alive por cliente, como um navegador
+                conexao = http.client.HTTPConnection(alvo.hostname, alvo.port or 80, timeout=60)
+                tempos, erros = [], 0
+                barreira.wait()
+                while time.monotonic() < limite:
+                    inicio = time.perf_counter()
+                    try:
+                        conexao.request('GET', caminho, headers={
+                            'X-Forwarded-Proto': 'https', 'Host': 'localhost', CABECALHO_AQUECIMENTO: '1',
+                        })
+                        resposta = conexao.getresponse()
+                        resposta.read()
+                        if resposta.status != 200:
+                            erros += 1
+                    except (OSError, http.client.HTTPException):
+                        erros += 1
+                        conexao.close()
+                        continue
+                    tempos.append((time.perf_counter() - inicio) * 1000)
+                conexao.close()
+                return tempos, erros
+
+            inicio = time.monotonic()
+            with ThreadPoolExecutor(max_workers=clientes) as pool:
+                resultados = list(pool.map(_cliente, range(clientes)))
+            decorrido = time.monotonic() - inicio
+
+            tempos = sorted(t for parcial, _ in resultados for t in parcial)
+            erros = sum(e for _, e in resultados)
+            if not tempos:
+                self.stdout.write(f"{nome:<28} | {'-':>8} | {'-':>8} | {'-':>8} | {'-':>8} | {erros:>6}")
+                continue
+            self.stdout.write(
+                f"{nome:<28} | {len(tempos) / decorrido:>8.1f} | {_percentil(tempos, 50):>8.1f} | "
+                f"{_percentil(tempos, 95):>8.1f} | {_percentil(tempos, 99):>8.1f} | {erros:>6}"
+            )
+
+    def _conexoes(self, ciclos):
+        """Custo de obter a conexão em cada requisição: abrir uma nova, reusar a persistente ou pegar do pool."""
+        configuracao = connection.settings_dict
+        if configuracao['OPTIONS'].get('pool'):
+            modo = f"pool psycopg ({configuracao['OPTIONS']['pool']})"
+        else:
+            modo = f"CONN_MAX_AGE={configuracao['CONN_MAX_AGE']}"
+        consulta = 'SELECT pg_backend_pid()' if connection.vendor == 'postgresql' else 'SELECT 1'
+
+        tempos, identificadores = [], set()
+        for _ in range(ciclos):
+            inicio = time.perf_counter()
+            # O mesmo que o Django faz nos sinais request_started/request_finished
+            close_old_connections()
+            with connection.cursor() as cursor:
+                cursor.execute(consulta)
+                resultado = cursor.fetchone()[0]
+            close_old_connections()
+            tempos.append((time.perf_counter() - inicio) * 1000)
+            identificadores.add(resultado if connection.vendor == 'postgresql' else id(connection.connection))
+        connection.close()
+
+        tempos.sort()
+        self.stdout.write(f"Banco: {connection.vendor} | {modo} | {ciclos} ciclos")
+        self.stdout.write(
+            f"média {statistics.mean(tempos):.2f} ms | p50 {_percentil(tempos, 50):.2f} ms | "
+            f"p95 {_percentil(tempos, 95):.2f} ms | {len(identificadores)} conexão(ões) distinta(s)"
+        )
+
+    # --- Comparação entre execuções ---
+
+    def _comparar(self, arquivo_anterior, atual):
+        with open(arquivo_anterior, encoding='utf-8') as f:
+            anterior = json.load(f)
+
+        self.stdout.write(f"\nComparação com {anterior.get('commit')} ({anterior.get('data')}):")
+        self.stdout.write(f"{'Endpoint':<28} | {'p95 antes':>9} | {'p95 agora':>9} | {'variação':>8} | "
+                          f"{'consultas':>11}")
+        self.stdout.write('-' * 80)
+        for nome, agora in atual['resultados'].items():
+            antes = anterior['resultados'].get(nome)
+            if not antes:
+                continue
+            variacao = (agora['p95_ms'] / antes['p95_ms'] - 1) if antes['p95_ms'] else 0.0
+            self.stdout.write(f"{nome:<28} | {antes['p95_ms']:>9.1f} | {agora['p95_ms']:>9.1f} | "
+                              f"{variacao:>+8.0%} | {antes['consultas']:>4} -> {agora['consultas']:<4}")
+
+        if anterior.get('indices_agendamento_bytes') and atual['indices_agendamento_bytes']:
+            antes, agora = (sum(r['indices_agendamento_bytes'].values()) / 1024 ** 2 for r in (anterior, atual))
+            self.stdout.write(f"\nÍndices de agendamento: {antes:.1f} MB -> {agora:.1f} MB")
+
+    @staticmethod
+    def _commit_atual():
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+                cwd=settings.BASE_DIR,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
@@ -0,0 +1,265 @@
+import random
+from datetime import date, timedelta
+from io import StringIO
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max
+
+from apps.agendamento.models import Agendamento, ObservacaoPreco
+from apps.anuncios.models import Anuncio
+from apps.avaliacoes.models import Avaliacao
+from apps.core.estatisticas import atualizar_estatisticas
+from apps.core.models import EstatisticaLocal, HistogramaPrecoLocal
+from apps.core.particoes import garantir_particoes, particionado
+from apps.core.versao_dados import incrementar_versao
+from apps.imovel.models import Imovel
+from apps.localizacoes.models import Bairro, Cidade
+
+
+CIDADES = [
+    ('Rio de Janeiro', 'RJ'), ('São Paulo', 'SP'), ('Salvador', 'BA'), ('Florianópolis', 'SC'),
+    ('Belo Horizonte', 'MG'), ('Recife', 'PE'), ('Fortaleza', 'CE'), ('Natal', 'RN'),
+    ('Porto Alegre', 'RS'), ('Curitiba', 'PR'), ('Búzios', 'RJ'), ('Paraty', 'RJ'),
+]
+
+BAIRROS = [
+    'Centro', 'Praia Grande', 'Jardim Botânico', 'Vila Nova', 'Boa Vista', 'Santa Teresa',
+    'Barra', 'Lagoa', 'Alto da Boa Vista', 'Ponta Negra', 'Porto', 'Campeche', 'Pinheiros',
+    'Savassi', 'Boa Viagem', 'Meireles', 'Moinhos de Vento', 'Batel', 'Geribá', 'Pelourinho',
+]
+
+# (tipo de acomodação, preço base da diária em R$, peso na amostragem)
+TIPOS_ACOMODACAO = [
+    ('Apartamento', 260, 50), ('Casa', 420, 15), ('Quarto', 120, 20), ('Loft', 230, 8), ('Estúdio', 180, 7),
+]
+
+# Multiplicador de preço por mês: alta temporada no verão, férias de julho e fim de ano
+FATOR_SAZONAL = {
+    1: 1.35, 2: 1.30, 3: 1.00, 4: 0.95, 5: 0.90, 6: 0.95,
+    7: 1.15, 8: 0.95, 9: 0.90, 10: 0.95, 11: 1.00, 12: 1.40,
+}
+
+# Distribuição das durações de estadia (noites, peso)
+DURACOES = [(1, 8), (2, 18), (3, 22), (4, 16), (5, 12), (6, 6), (7, 10), (10, 4), (14, 4)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Gera cidades, bairros, imóveis, avaliações, agendamentos e anúncios sintéticos "
+        "(preços com curva sazonal) para testes de carga e benchmarks."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--agendamentos', type=int, default=10_000,
+                            help="Quantidade de agendamentos (de 10 mil a 10 milhões).")
+        parser.add_argument('--imoveis', type=int, default=None,
+                            help="Quantidade de imóveis (padrão: 1 para cada 20 agendamentos).")
+        parser.add_argument('--cidades', type=int, default=4, help=f"Quantidade de cidades (máx. {len(CIDADES)}).")
+        parser.add_argument('--bairros-por-cidade', type=int, default=6,
+                            help=f"Bairros por cidade (máx. {len(BAIRROS)}).")
+        parser.add_argument('--dias-futuros', type=int, default=365,
+                            help="Janela de datas de check-in a partir de hoje.")
+        parser.add_argument('--sem-anuncios', action='store_true', help="Não gera um anúncio por agendamento.")
+        parser.add_argument('--coletas', type=int, default=0,
+                            help="Dias de histórico de preços por agendamento, terminando hoje (PostgreSQL).")
+        parser.add_argument('--lote', type=int, default=20_000, help="Agendamentos gravados por lote.")
+        parser.add_argument('--seed', type=int, default=42, help="Semente do gerador aleatório (reprodutível).")
+        parser.add_argument('--limpar', action='store_true',
+                            help="Apaga TODOS os dados das tabelas antes de gerar.")
+
+    def handle(self, *args, **options):
+        if not 1 <= options['cidades'] <= len(CIDADES):
+            raise CommandError(f"--cidades deve estar entre 1 e {len(CIDADES)}.")
+        if not 1 <= options['bairros_por_cidade'] <= len(BAIRROS):
+            raise CommandError(f"--bairros-por-cidade deve estar entre 1 e {len(BAIRROS)}.")
+
+        self.rng = random.Random(options['seed'])
+        total_agendamentos = options['agendamentos']
+        total_imoveis = options['imoveis'] or max(50, total_agendamentos // 20)
+
+        if options['limpar']:
+            self.stdout.write("Apagando dados existentes...")
+            with transaction.atomic():
+                for modelo in (EstatisticaLocal, HistogramaPrecoLocal, ObservacaoPreco, Anuncio, Agendamento, Avaliacao, Imovel,
+                               Bairro, Cidade):
+                    modelo.objects.all().delete()
+
+        bairros = self._gerar_localizacoes(options['cidades'], options['bairros_por_cidade'])
+        imoveis = self._gerar_imoveis(bairros, total_imoveis)
+        self.stdout.write(f"{len(bairros)} bairros e {len(imoveis)} imóveis criados.")
+
+        if particionado():
+            hoje = date.today()
+            garantir_particoes(hoje - timedelta(days=30), hoje + timedelta(days=options['dias_futuros']))
+
+        id_anterior = Agendamento.objects.aggregate(maximo=Max('id'))['maximo'] or 0
+        gerados = 0
+        while gerados < total_agendamentos:
+            tamanho = min(options['lote'], total_agendamentos - gerados)
+            with transaction.atomic():
+                self._gravar_agendamentos(self._linhas_agendamento(imoveis, tamanho, options['dias_futuros']))
+            gerados += tamanho
+            self.stdout.write(f"  {gerados}/{total_agendamentos} agendamentos gravados.")
+
+        if not options['sem_anuncios']:
+            self._gerar_anuncios(id_anterior)
+        if options['coletas'] > 0:
+            self._gerar_historico_precos(id_anterior, options['coletas'])
+
+        linhas_estatisticas, linhas_histograma = atualizar_estatisticas()
+        self.stdout.write(
+            f"{linhas_estatisticas} linhas de estatísticas e {linhas_histograma} faixas de histograma recalculadas."
+        )
+        incrementar_versao()
+        self.stdout.write(self.style.SUCCESS(
+            f"Dados sintéticos gerados: {total_imoveis} imóveis e {total_agendamentos} agendamentos."
+        ))
+
+    # --- Localizações, imóveis e avaliações ---
+
+    def _gerar_localizacoes(self, quantidade_cidades, bairros_por_cidade):
+        """Retorna [(bairro, nome da cidade, fator de preço do bairro)]."""
+        bairros = []
+        for nome_cidade, estado in CIDADES[:quantidade_cidades]:
+            cidade, _ = Cidade.objects.get_or_create(nome=nome_cidade, defaults={'estado': estado})
+            for nome_bairro in self.rng.sample(BAIRROS, bairros_por_cidade):
+                bairro, _ = Bairro.objects.get_or_create(nome=nome_bairro, cidade=cidade)
+                bairros.append((bairro, nome_cidade, self.rng.uniform(0.7, 1.8)))
+        return bairros
+
+    def _gerar_imoveis(self, bairros, quantidade):
+        """Cria os imóveis e uma avaliação para cada. Retorna [(imóvel, diária base, avaliação)]."""
+        tipos = [tipo for tipo, _, _ in TIPOS_ACOMODACAO]
+        pesos = [peso for _, _, peso in TIPOS_ACOMODACAO]
+        precos_base = {tipo: preco for tipo, preco, _ in TIPOS_ACOMODACAO}
+        proximo_id = (Imovel.objects.aggregate(maximo=Max('id_imovel'))['maximo'] or 10_000_000) + 1
+
+        novos, diarias = [], []
+        for indice in range(quantidade):
+            bairro, nome_cidade, fator_bairro = self.rng.choice(bairros)
+            tipo = self.rng.choices(tipos, pesos)[0]
+            quartos = 0 if tipo == 'Estúdio' else 1 if tipo == 'Quarto' else self.rng.choice([1, 1, 2, 2, 2, 3, 3, 4, 5])
+            camas = max(1, quartos + self.rng.choice([0, 0, 1, 2]))
+            novos.append(Imovel(
+                id_imovel=proximo_id + indice,
+                tipo_acomodacao=f"{tipo} em {nome_cidade}",
+                cidade_id=bairro.cidade_id,
+                bairro=bairro,
+                quartos=quartos,
+                camas=camas,
+                banheiros=max(1, (quartos + 1) // 2),
+            ))
+            diarias.append(precos_base[tipo] * fator_bairro * (1 + 0.25 * max(quartos - 1, 0)))
+
+        imoveis = Imovel.objects.bulk_create(novos, batch_size=5000)
+        avaliacoes = Avaliacao.objects.bulk_create([
+            Avaliacao(
+                imovel=imovel,
+                nota=round(self.rng.triangular(3.5, 5.0, 4.8), 1),
+                qtd_avaliacoes=int(self.rng.expovariate(1 / 60)),
+            )
+            for imovel in imoveis
+        ], batch_size=5000)
+        return list(zip(imoveis, diarias, avaliacoes))
+
+    # --- Agendamentos ---
+
+    def _linhas_agendamento(self, imoveis, quantidade, dias_futuros):
+        hoje = date.today()
+        noites_possiveis = [noites for noites, _ in DURACOES]
+        pesos_noites = [peso for _, peso in DURACOES]
+        for _ in range(quantidade):
+            imovel, diaria_base, avaliacao = self.rng.choice(imoveis)
+            noites = self.rng.choices(noites_possiveis, pesos_noites)[0]
+            checkin = hoje + timedelta(days=self.rng.randint(-30, dias_futuros))
+            checkout = checkin + timedelta(days=noites)
+
+            noites_fim_de_semana = sum(
+                1 for dia in range(noites) if (checkin + timedelta(days=dia)).weekday() >= 4
+            )
+            fator = FATOR_SAZONAL[checkin.month] * (1 + 0.15 * noites_fim_de_semana / noites)
+            preco_por_dia = round(diaria_base * fator * self.rng.lognormvariate(0, 0.12), 2)
+            hospedes = self.rng.randint(1, max(1, (imovel.camas or 1) * 2))
+            yield (
+                imovel.id, checkin, checkout, round(preco_por_dia * noites, 2), preco_por_dia, hospedes,
+                f"https://www.airbnb.com.br/rooms/{imovel.id_imovel}?check_in={checkin.isoformat()}"
+                f"&check_out={checkout.isoformat()}&adults={hospedes}",
+                # Cópias do imóvel e da avaliação (apps.core.resumo_imovel)
+                imovel.cidade_id, imovel.bairro_id, imovel.quartos, imovel.camas, imovel.banheiros,
+                avaliacao.nota, avaliacao.qtd_avaliacoes,
+            )
+
+    def _gravar_agendamentos(self, linhas):
+        if connection.vendor == 'postgresql':
+            # COPY é ordens de grandeza mais rápido que INSERTs para milhões de linhas
+            buffer = StringIO()
+            for linha in linhas:
+                buffer.write('\t'.join('\\N' if valor is None else str(valor) for valor in linha) + '\n')
+            sql = (
+                "COPY agendamento (imovel_id, data_checkin, data_checkout, preco_total, preco_por_dia, "
+                "hospedes, link, cidade_id, bairro_id, quartos, camas, banheiros, nota, qtd_avaliacoes) FROM STDIN"
+            )
+            with connection.cursor() as cursor:
+                if hasattr(cursor, 'copy_expert'):  # psycopg2
+                    buffer.seek(0)
+                    cursor.copy_expert(sql, buffer)
+                else:  # psycopg 3
+                    with cursor.copy(sql) as copia:
+                        copia.write(buffer.getvalue())
+            return
+
+        Agendamento.objects.bulk_create([
+            Agendamento(imovel_id=imovel_id, data_checkin=checkin, data_checkout=checkout, preco_total=total,
+                        preco_por_dia=diaria, hospedes=hospedes, link=link, cidade_id=cidade_id,
+                        bairro_id=bairro_id, quartos=quartos, camas=camas, banheiros=banheiros, nota=nota,
+                        qtd_avaliacoes=qtd_avaliacoes)
+            for (imovel_id, checkin, checkout, total, diaria, hospedes, link,
+                 cidade_id, bairro_id, quartos, camas, banheiros, nota, qtd_avaliacoes) in linhas
+        ], batch_size=5000)
+
+    def _gerar_anuncios(self, id_anterior):
+        """Um anúncio por agendamento novo, gerado no próprio banco (INSERT ... SELECT)."""
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO anuncio (agendamento_id, titulo, link)
+                SELECT a.id, i.tipo_acomodacao || ' - ' || b.nome, a.link
+                FROM agendamento a
+                JOIN imovel i ON i.id = a.imovel_id
+                JOIN bairro b ON b.id = i.bairro_id
+                WHERE a.id > %s
+                """,
+                [id_anterior],
+            )
+            self.stdout.write(f"{cursor.rowcount} anúncios criados.")
+
+    def _gerar_historico_precos(self, id_anterior, coletas):
+        """
+        Observações de preço dos agendamentos novos nos últimos `coletas` dias, gravadas um dia
+        por vez (na ordem em que o scraper as gravaria, que é o que o índice BRIN pressupõe). O
+        preço oscila mais quanto mais antiga a coleta; a de hoje é o preço atual do agendamento.
+        """
+        if connection.vendor != 'postgresql':
+            self.stdout.write("Histórico de preços sintético requer PostgreSQL; ignorado.")
+            return
+        hoje = date.today()
+        total = 0
+        with connection.cursor() as cursor:
+            for dias_atras in range(coletas - 1, -1, -1):
+                observado_em = hoje - timedelta(days=dias_atras)
+                with transaction.atomic():
+                    cursor.execute(
+                        """
+                        INSERT INTO observacao_preco (agendamento_id, imovel_id, observado_em, preco_total_centavos,
+                                                      antecedencia_dias, noites, hospedes)
+                        SELECT a.id, a.imovel_id, %(dia)s,
+                               round(a.preco_total * 100 * (1 + %(variacao)s * (random() - 0.5)))::integer,
+                               a.data_checkin - %(dia)s, a.data_checkout - a.data_checkin, a.hospedes
+                        FROM agendamento a
+                        WHERE a.id > %(id_anterior)s AND a.data_checkin >= %(dia)s AND a.preco_total IS NOT NULL
+                        """,
+                        {'dia': observado_em, 'variacao': min(0.4, 0.01 * dias_atras), 'id_anterior': id_anterior},
+                    )
+                    total += cursor.rowcount
+        self.stdout.write(f"{total} observações de preço criadas ({coletas} dias).")
@@ -0,0 +1,63 @@
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.indices import INDICES_FUTUROS, indices_futuros_existentes, rolar_indices_futuros
+from apps.core.particoes import (
+    arquivar_particoes, garantir_particoes, linhas_na_padrao, particionado, particoes, somar_meses,
+)
+from apps.core.versao_dados import incrementar_versao
+
+
+class Command(BaseCommand):
+    help = (
+        "Cria com antecedência as partições mensais de agendamento, arquiva (ou apaga) as dos meses "
+        "mais antigos que o período de retenção e avança o corte dos índices parciais de estadias "
+        "futuras para o mês atual. Executado pelo atualizar_estatisticas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--meses-a-frente', type=int,
+                            default=getattr(settings, 'AGENDAMENTO_PARTICOES_MESES_A_FRENTE', 18),
+                            help="Meses futuros que devem ter partição.")
+        parser.add_argument('--reter-meses', type=int,
+                            default=getattr(settings, 'AGENDAMENTO_RETENCAO_MESES', 24),
+                            help="Meses passados mantidos em agendamento (0 mantém todos).")
+        parser.add_argument('--apagar', action='store_true',
+                            help="Apaga as partições antigas em vez de movê-las para o schema 'arquivo'.")
+        parser.add_argument('--listar', action='store_true', help="Apenas lista as partições.")
+
+    def handle(self, *args, **options):
+        if not particionado():
+            self.stdout.write("agendamento não é particionado (requer PostgreSQL e a migração agendamento 0003).")
+            return
+        if options['meses_a_frente'] < 0 or options['reter_meses'] < 0:
+            raise CommandError("--meses-a-frente e --reter-meses não podem ser negativos.")
+
+        if options['listar']:
+            for nome, _, linhas in particoes():
+                self.stdout.write(f"{nome}  ~{linhas} linhas")
+            self.stdout.write(f"agendamento_padrao  {linhas_na_padrao()} linhas")
+            for nome_base in INDICES_FUTUROS:
+                self.stdout.write(f"{nome_base}: {', '.join(indices_futuros_existentes(nome_base)) or 'nenhum'}")
+            return
+
+        mes_atual = date.today().replace(day=1)
+        criadas = garantir_particoes(mes_atual, somar_meses(mes_atual, options['meses_a_frente']))
+
+        retiradas = []
+        if options['reter_meses']:
+            retiradas = arquivar_particoes(somar_meses(mes_atual, -options['reter_meses']), options['apagar'])
+            if retiradas:
+                incrementar_versao()
+
+        # Depois do arquivamento: as partições retiradas não precisam do índice novo
+        indices = rolar_indices_futuros(mes_atual)
+
+        destino = 'apagadas' if options['apagar'] else "movidas para o schema 'arquivo'"
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(criadas)} partições criadas; {len(retiradas)} partições antigas {destino} "
+            f"({sum(linhas for _, linhas in retiradas)} agendamentos); "
+            f"índices parciais criados: {', '.join(indices) or 'nenhum'}."
+        ))
@@ -0,0 +1,64 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from apps.core.indices import uso_indices
+
+TABELAS_PADRAO = (
+    'agendamento', 'observacao_preco', 'imovel', 'avaliacao', 'anuncio', 'bairro', 'cidade',
+    'estatistica_local', 'histograma_preco_local',
+)
+
+
+def _tamanho(bytes_):
+    for unidade in ('B', 'kB', 'MB'):
+        if bytes_ < 1024:
+            return f"{bytes_:.0f} {unidade}"
+        bytes_ /= 1024
+    return f"{bytes_:.1f} GB"
+
+
+class Command(BaseCommand):
+    help = (
+        "Lista os índices das tabelas do site com tamanho (somado entre as partições), varreduras e "
+        "tuplas lidas desde o último reset das estatísticas do PostgreSQL, para achar índices sem uso."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tabela', action='append', dest='tabelas',
+                            help="Tabela a listar (pode repetir). Padrão: as tabelas do site.")
+        parser.add_argument('--sem-uso', action='store_true',
+                            help="Só os índices nunca varridos que não garantem unicidade.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            self.stdout.write("O relatório de índices requer PostgreSQL.")
+            return
+
+        indices = uso_indices(options['tabelas'] or TABELAS_PADRAO)
+        if options['sem_uso']:
+            indices = [i for i in indices if not i['varreduras'] and not i['unico']]
+
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT stats_reset FROM pg_stat_database WHERE datname = current_database()")
+            reset = cursor.fetchone()[0]
+        self.stdout.write(f"Estatísticas desde: {reset or 'a criação do banco'}\n")
+
+        tabela_atual = None
+        for indice in indices:
+            if indice['tabela'] != tabela_atual:
+                tabela_atual = indice['tabela']
+                self.stdout.write(self.style.MIGRATE_HEADING(tabela_atual))
+            marcas = ', '.join(m for m, ativa in (
+                (indice['tipo'], indice['tipo'] != 'btree'), ('único', indice['unico']), ('parcial', indice['parcial'])
+            ) if ativa)
+            ultima = f"{indice['ultima_varredura']:%Y-%m-%d %H:%M}" if indice['ultima_varredura'] else '-'
+            linha = (
+                f"  {indice['indice']:<45} {_tamanho(indice['bytes']):>9}  {indice['varreduras']:>9} varreduras  "
+                f"{indice['tuplas_lidas']:>11} tuplas  última: {ultima}" + (f"  ({marcas})" if marcas else '')
+            )
+            if not indice['varreduras'] and not indice['unico']:
+                linha = self.style.WARNING(linha + '  sem uso')
+            self.stdout.write(linha)
+
+        total = sum(i['bytes'] for i in indices)
+        self.stdout.write(f"\n{len(indices)} índices, {_tamanho(total)}.")
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.test import Client
+
+from apps.core.instrumentacao import instrumentar
+from apps.core.registro_buscas import CABECALHO_AQUECIMENTO
+from apps.core.replicas import aliases_replica, situacao_replica
+
+
+class Command(BaseCommand):
+    help = (
+        "Mostra o atraso e as versões de dados pendentes de cada réplica de leitura e se ela está "
+        "recebendo leituras. Com --url, faz a requisição e conta as consultas feitas nas réplicas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', action='append', dest='urls', default=[],
+                            help="Caminho a requisitar, ex.: '/api/datas-disponiveis/?cidade=1' (pode repetir).")
+
+    def handle(self, *args, **options):
+        aliases = aliases_replica()
+        if not aliases:
+            self.stdout.write("Nenhuma réplica configurada (DB_REPLICAS ou DB_REPLICA_SIMULADA=1).")
+        for alias in aliases:
+            situacao = situacao_replica(alias)
+            if situacao['erro']:
+                self.stdout.write(self.style.ERROR(f"{alias}: fora do ar ({situacao['erro']})"))
+                continue
+            linha = f"{alias}: atraso {situacao['atraso']:.1f} s"
+            if situacao['versoes_pendentes']:
+                linha += f", sem a última importação de {', '.join(situacao['versoes_pendentes'])}"
+            if situacao['disponivel']:
+                self.stdout.write(self.style.SUCCESS(linha + " - recebendo leituras"))
+            else:
+                self.stdout.write(self.style.WARNING(linha + " - leituras no primário"))
+
+        # 'localhost' está em ALLOWED_HOSTS nos dois ambientes; a verificação não conta como busca
+        cliente = Client(HTTP_HOST='localhost', headers={CABECALHO_AQUECIMENTO: '1'})
+        for url in options['urls']:
+            with instrumentar() as metricas:
+                resposta = cliente.get(url)
+            self.stdout.write(
+                f"{url}: status {resposta.status_code}, {metricas.consultas} consultas, "
+                f"{metricas.consultas_replica} na réplica"
+            )
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.3 on 2026-10-19 13:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('localizacoes', '__first__'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstatisticaLocal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data_checkin', models.DateField()),
+                ('noites', models.PositiveIntegerField()),
+                ('hospedes_minimo', models.PositiveIntegerField()),
+                ('total_agendamentos', models.PositiveIntegerField()),
+                ('total_imoveis', models.PositiveIntegerField()),
+                ('total_precos', models.PositiveIntegerField()),
+                ('preco_soma', models.DecimalField(blank=True, decimal_places=2, max_digits=16, null=True)),
+                ('preco_minimo', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('preco_maximo', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('bairro', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='estatisticas', to='localizacoes.bairro')),
+                ('cidade', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='estatisticas', to='localizacoes.cidade')),
+            ],
+            options={
+                'verbose_name': 'Estatística por Local',
+                'verbose_name_plural': 'Estatísticas por Local',
+                'db_table': 'estatistica_local',
+                'indexes': [models.Index(fields=['cidade', 'bairro', 'data_checkin', 'noites', 'hospedes_minimo'], name='estatistica_cidade__c7a5c4_idx'), models.Index(fields=['data_checkin', 'hospedes_minimo'], name='estatistica_data_ch_675483_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.3 on 2026-10-19 13:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_estatisticalocal'),
+        ('localizacoes', '__first__'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HistogramaPrecoLocal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data_checkin', models.DateField()),
+                ('noites', models.PositiveIntegerField()),
+                ('hospedes_minimo', models.PositiveIntegerField()),
+                ('faixa', models.PositiveSmallIntegerField()),
+                ('total', models.PositiveIntegerField()),
+                ('bairro', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='histogramas_preco', to='localizacoes.bairro')),
+                ('cidade', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='histogramas_preco', to='localizacoes.cidade')),
+            ],
+            options={
+                'verbose_name': 'Histograma de Preços por Local',
+                'verbose_name_plural': 'Histogramas de Preços por Local',
+                'db_table': 'histograma_preco_local',
+                'indexes': [models.Index(fields=['cidade', 'bairro', 'hospedes_minimo', 'data_checkin'], name='histograma__cidade__312c8c_idx'), models.Index(fields=['bairro', 'hospedes_minimo', 'data_checkin'], name='histograma__bairro__dbf240_idx'), models.Index(fields=['data_checkin', 'hospedes_minimo'], name='histograma__data_ch_c30d66_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.3 on 2026-10-19 13:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_histogramaprecolocal'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersaoDados',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('escopo', models.CharField(max_length=50, unique=True)),
+                ('versao', models.PositiveBigIntegerField(default=0)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Versão dos Dados',
+                'verbose_name_plural': 'Versões dos Dados',
+                'db_table': 'versao_dados',
+            },
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.3 on 2026-10-19 14:26
+
+from django.db import migrations, models
+
+# Diárias das estatísticas em centavos inteiros; as linhas existentes são convertidas (o
+# atualizar_estatisticas as regrava a partir de agendamento.preco_por_dia_centavos)
+SQL_PARA_CENTAVOS = """
+UPDATE estatistica_local SET
+    preco_soma_centavos = ROUND(preco_soma * 100),
+    preco_minimo_centavos = ROUND(preco_minimo * 100),
+    preco_maximo_centavos = ROUND(preco_maximo * 100)
+"""
+
+SQL_PARA_REAIS = """
+UPDATE estatistica_local SET
+    preco_soma = preco_soma_centavos / 100.0,
+    preco_minimo = preco_minimo_centavos / 100.0,
+    preco_maximo = preco_maximo_centavos / 100.0
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_versaodados'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='estatisticalocal',
+            name='preco_soma_centavos',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='estatisticalocal',
+            name='preco_minimo_centavos',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='estatisticalocal',
+            name='preco_maximo_centavos',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.RunSQL(SQL_PARA_CENTAVOS, SQL_PARA_REAIS),
+        migrations.RemoveField(
+            model_name='estatisticalocal',
+            name='preco_soma',
+        ),
+        migrations.RemoveField(
+            model_name='estatisticalocal',
+            name='preco_minimo',
+        ),
+        migrations.RemoveField(
+            model_name='estatisticalocal',
+            name='preco_maximo',
+        ),
+    ]
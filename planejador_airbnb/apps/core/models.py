@@ -0,0 +1,90 @@
+from django.db import models
+
+from apps.localizacoes.models import Bairro, Cidade
+
+
+class EstatisticaLocal(models.Model):
+    """
+    Estatísticas de preço pré-calculadas por localização, data de check-in, duração da
+    estadia e quantidade mínima de hóspedes (ver `apps/core/estatisticas.py`).
+
+    Linhas com `bairro` nulo agregam a cidade inteira. `hospedes_minimo` é cumulativo:
+    a linha com nível N resume os agendamentos com `hospedes >= N` (nível 0 = todos).
+    """
+    cidade = models.ForeignKey(Cidade, on_delete=models.CASCADE, related_name='estatisticas')
+    bairro = models.ForeignKey(Bairro, on_delete=models.CASCADE, null=True, blank=True, related_name='estatisticas')
+    data_checkin = models.DateField()
+    noites = models.PositiveIntegerField()
+    hospedes_minimo = models.PositiveIntegerField()
+
+    total_agendamentos = models.PositiveIntegerField()
+    total_imoveis = models.PositiveIntegerField()
+    total_precos = models.PositiveIntegerField()  # Agendamentos com preço por dia informado
+    # Diárias em centavos (soma, mínima e máxima)
+    preco_soma_centavos = models.BigIntegerField(null=True, blank=True)
+    preco_minimo_centavos = models.IntegerField(null=True, blank=True)
+    preco_maximo_centavos = models.IntegerField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'estatistica_local'
+        verbose_name = "Estatística por Local"
+        verbose_name_plural = "Estatísticas por Local"
+        indexes = [
+            models.Index(fields=['cidade', 'bairro', 'data_checkin', 'noites', 'hospedes_minimo']),
+            models.Index(fields=['data_checkin', 'hospedes_minimo']),
+        ]
+
+    def __str__(self):
+        return f"Estatísticas {self.cidade_id}/{self.bairro_id} em {self.data_checkin} ({self.noites} noites)"
+
+    @property
+    def preco_medio_centavos(self):
+        return self.preco_soma_centavos / self.total_precos if self.total_precos else None
+
+
+class HistogramaPrecoLocal(models.Model):
+    """
+    Quantidade de agendamentos por faixa de diária (`estatisticas.FAIXAS_PRECO`), com as mesmas
+    chaves de `EstatisticaLocal`. Somando as faixas de várias combinações obtém-se a distribuição
+    de preços de qualquer período, da qual saem mediana e quartis.
+    """
+    cidade = models.ForeignKey(Cidade, on_delete=models.CASCADE, related_name='histogramas_preco')
+    bairro = models.ForeignKey(
+        Bairro, on_delete=models.CASCADE, null=True, blank=True, related_name='histogramas_preco'
+    )
+    data_checkin = models.DateField()
+    noites = models.PositiveIntegerField()
+    hospedes_minimo = models.PositiveIntegerField()
+    faixa = models.PositiveSmallIntegerField()
+    total = models.PositiveIntegerField()
+
+    class Meta:
+        db_table = 'histograma_preco_local'
+        verbose_name = "Histograma de Preços por Local"
+        verbose_name_plural = "Histogramas de Preços por Local"
+        indexes = [
+            models.Index(fields=['cidade', 'bairro', 'hospedes_minimo', 'data_checkin']),
+            models.Index(fields=['bairro', 'hospedes_minimo', 'data_checkin']),
+            models.Index(fields=['data_checkin', 'hospedes_minimo']),
+        ]
+
+    def __str__(self):
+        return f"Faixa {self.faixa} de {self.cidade_id}/{self.bairro_id} em {self.data_checkin}: {self.total}"
+
+
+class VersaoDados(models.Model):
+    """
+    Contador incrementado a cada importação, usado nas chaves de cache (ver
+    `apps/core/versao_dados.py`). Escopo 'global' ou 'cidade:<id>' para importações parciais.
+    """
+    escopo = models.CharField(max_length=50, unique=True)
+    versao = models.PositiveBigIntegerField(default=0)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'versao_dados'
+        verbose_name = "Versão dos Dados"
+        verbose_name_plural = "Versões dos Dados"
+
+    def __str__(self):
+        return f"{self.escopo}: {self.versao}"
@@ -0,0 +1,113 @@
+"""
+Manutenção das partições mensais de `agendamento` (migração agendamento/0003).
+
+`agendamento` é particionado por mês de check-in. As consultas da busca, da comparação e
+do planejador filtram por `data_checkin`, então o PostgreSQL só lê as partições do período
+pedido. A partição padrão (`agendamento_padrao`) recebe as datas que ainda não têm partição,
+para que nenhuma importação falhe; `garantir_particoes` cria as dos meses seguintes e move
+para elas o que tiver caído na padrão.
+
+Meses antigos saem da tabela inteiros: `arquivar_particoes` desanexa a partição (sem
+DELETE linha a linha nem VACUUM depois) e a move, com os anúncios e o histórico de preços
+(`observacao_preco`) dos seus agendamentos, para o schema `arquivo`, ou apaga tudo.
+"""
+from datetime import date
+
+from django.db import connection, transaction
+
+SCHEMA_ARQUIVO = 'arquivo'
+
+
+def somar_meses(mes, quantidade):
+    indice = mes.year * 12 + mes.month - 1 + quantidade
+    return date(indice // 12, indice % 12 + 1, 1)
+
+
+def particionado():
+    """True se `agendamento` é uma tabela particionada (PostgreSQL com a migração aplicada)."""
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass('agendamento')")
+        linha = cursor.fetchone()
+    return bool(linha) and linha[0] == 'p'
+
+
+def particoes():
+    """Partições mensais anexadas, como [(nome, primeiro dia do mês, linhas estimadas)], em ordem."""
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT c.relname, c.reltuples::bigint
+            FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'agendamento'::regclass AND c.relname ~ '^agendamento_[0-9]{6}$'
+            ORDER BY c.relname
+        """)
+        return [
+            (nome, date(int(nome[-6:-2]), int(nome[-2:]), 1), max(linhas, 0))
+            for nome, linhas in cursor.fetchall()
+        ]
+
+
+def garantir_particoes(inicio, fim):
+    """
+    Cria as partições dos meses de `inicio` a `fim` que ainda não existem, e as dos meses
+    que tiverem linhas na partição padrão. Retorna os nomes das partições criadas.
+    """
+    existentes = {nome for nome, _, _ in particoes()}
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT DISTINCT date_trunc('month', data_checkin)::date FROM agendamento_padrao")
+        meses = {mes for mes, in cursor.fetchall()}
+        mes = inicio.replace(day=1)
+        while mes <= fim:
+            meses.add(mes)
+            mes = somar_meses(mes, 1)
+
+        criadas = []
+        for mes in sorted(meses):
+            if f'agendamento_{mes:%Y%m}' in existentes:
+                continue
+            with transaction.atomic():
+                cursor.execute("SELECT criar_particao_agendamento(%s)", [mes])
+                criadas.append(cursor.fetchone()[0])
+    return criadas
+
+
+def arquivar_particoes(antes_de, apagar=False):
+    """
+    Retira de `agendamento` as partições dos meses anteriores a `antes_de`. Os anúncios e as
+    observações de preço dos agendamentos retirados vão junto, na mesma transação, para
+    `arquivo.anuncio_AAAAMM` e `arquivo.observacao_preco_AAAAMM`. Retorna [(nome, linhas)].
+    """
+    q = connection.ops.quote_name
+    retiradas = []
+    with connection.cursor() as cursor:
+        if not apagar:
+            cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {q(SCHEMA_ARQUIVO)}")
+        for nome, mes, _ in particoes():
+            if mes >= antes_de.replace(day=1):
+                break
+            with transaction.atomic():
+                cursor.execute(f"SELECT count(*) FROM {q(nome)}")
+                linhas = cursor.fetchone()[0]
+                # Tabelas sem chave estrangeira no banco: sem isso ficariam linhas órfãs
+                for tabela in ('anuncio', 'observacao_preco'):
+                    if not apagar:
+                        cursor.execute(
+                            f"CREATE TABLE {q(SCHEMA_ARQUIVO)}.{q(f'{tabela}_{mes:%Y%m}')} AS "
+                            f"SELECT t.* FROM {q(tabela)} t JOIN {q(nome)} a ON a.id = t.agendamento_id"
+                        )
+                    cursor.execute(f"DELETE FROM {q(tabela)} t USING {q(nome)} a WHERE a.id = t.agendamento_id")
+                # DETACH bloqueia a tabela só até o fim desta transação, que termina logo em seguida
+                cursor.execute(f"ALTER TABLE agendamento DETACH PARTITION {q(nome)}")
+                if apagar:
+                    cursor.execute(f"DROP TABLE {q(nome)}")
+                else:
+                    cursor.execute(f"ALTER TABLE {q(nome)} SET SCHEMA {q(SCHEMA_ARQUIVO)}")
+            retiradas.append((nome, linhas))
+    return retiradas
+
+
+def linhas_na_padrao():
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT count(*) FROM agendamento_padrao")
+        return cursor.fetchone()[0]
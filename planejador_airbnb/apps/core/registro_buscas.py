@@ -0,0 +1,130 @@
+"""
+Registro leve das buscas feitas no site, usado pelo comando `aquecer_cache`.
+
+As views que marcam `registrar_buscas = True` (busca, comparação e planejador) têm os
+parâmetros GET de cada resposta 200 anexados a um arquivo JSON Lines por dia em
+`REGISTRO_BUSCAS_DIRETORIO`. Cada linha é curta e gravada com um único `write` em modo
+append, então vários workers podem escrever no mesmo arquivo sem trava e sem consultas
+ao banco. `REGISTRO_BUSCAS_AMOSTRAGEM` (0 a 1) limita o volume em sites muito acessados.
+Atrás do microcache do nginx só as requisições que chegam ao Django são registradas, o que
+reduz a contagem das buscas mais repetidas sem mudar muito a ordem de popularidade.
+"""
+import json
+import logging
+import os
+import random
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .instrumentacao import atributo_da_view
+
+logger = logging.getLogger(__name__)
+
+# Parâmetros que não mudam o conteúdo calculado (a paginação reaproveita o mesmo cache)
+PARAMETROS_IGNORADOS = {'page'}
+# Enviado pelo próprio aquecimento, para não contar as requisições dele como buscas
+CABECALHO_AQUECIMENTO = 'X-Aquecimento-Cache'
+
+
+def _diretorio():
+    return getattr(settings, 'REGISTRO_BUSCAS_DIRETORIO', os.path.join(settings.BASE_DIR, 'logs', 'buscas'))
+
+
+def _arquivo_do_dia(dia):
+    return os.path.join(_diretorio(), f'buscas_{dia:%Y%m%d}.jsonl')
+
+
+def registrar_busca(rota, caminho, parametros):
+    """Anexa uma busca ao arquivo do dia. Falhas de gravação só geram log."""
+    linha = json.dumps({
+        't': int(time.time()),
+        'rota': rota,
+        'caminho': caminho,
+        'params': {chave: valor for chave, valor in sorted(parametros.items()) if chave not in PARAMETROS_IGNORADOS},
+    }, ensure_ascii=False, separators=(',', ':'))
+    try:
+        os.makedirs(_diretorio(), exist_ok=True)
+        with open(_arquivo_do_dia(datetime.now()), 'a', encoding='utf-8') as arquivo:
+            arquivo.write(linha + '\n')
+    except OSError:
+        logger.warning("Não foi possível gravar o registro de buscas em %s.", _diretorio(), exc_info=True)
+
+
+def buscas_frequentes(horas=24, limite=100, minimo=1):
+    """
+    Lê os arquivos das últimas `horas` e retorna as `limite` combinações (caminho, parâmetros)
+    mais frequentes, como lista de (caminho, params, ocorrências).
+    """
+    desde = time.time() - horas * 3600
+    hoje = datetime.now()
+    contagem = Counter()
+    dia = datetime.fromtimestamp(desde)
+    while dia.date() <= hoje.date():
+        try:
+            with open(_arquivo_do_dia(dia), encoding='utf-8') as arquivo:
+                for linha in arquivo:
+                    try:
+                        registro = json.loads(linha)
+                    except ValueError:
+                        continue  # Linha truncada por uma gravação interrompida
+                    if registro['t'] >= desde:
+                        contagem[(registro['caminho'], json.dumps(registro['params'], sort_keys=True))] += 1
+        except FileNotFoundError:
+            pass
+        dia += timedelta(days=1)
+
+    return [
+        (caminho, json.loads(params), ocorrencias)
+        for (caminho, params), ocorrencias in contagem.most_common(limite)
+        if ocorrencias >= minimo
+    ]
+
+
+def remover_registros_antigos(dias):
+    """Apaga os arquivos diários com mais de `dias` dias. Retorna quantos foram removidos."""
+    limite = f'buscas_{datetime.now() - timedelta(days=dias):%Y%m%d}.jsonl'
+    removidos = 0
+    if not os.path.isdir(_diretorio()):
+        return removidos
+    for nome in os.listdir(_diretorio()):
+        if nome.startswith('buscas_') and nome.endswith('.jsonl') and nome < limite:
+            os.remove(os.path.join(_diretorio(), nome))
+            removidos += 1
+    return removidos
+
+
+class RegistroBuscasMiddleware:
+    """Registra as respostas 200 das views com o atributo `registrar_buscas = True`."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.amostragem = getattr(settings, 'REGISTRO_BUSCAS_AMOSTRAGEM', 1.0)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        self._registrar(request, response)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        # Uma linha curta em modo append: não vale a troca de thread de um sync_to_async
+        self._registrar(request, response)
+        return response
+
+    def _registrar(self, request, response):
+        if (request.method == 'GET' and response.status_code == 200
+                and atributo_da_view(request, 'registrar_buscas', False)
+                and CABECALHO_AQUECIMENTO not in request.headers
+                and random.random() < self.amostragem):
+            registrar_busca(request.resolver_match.view_name, request.path, request.GET.dict())
@@ -0,0 +1,247 @@
+"""
+Leituras das páginas e APIs públicas em réplicas do PostgreSQL.
+
+As buscas, gráficos, comparações e o planejador só leem, mas disputavam o mesmo servidor
+com as importações (COPY e upserts do scraper, `atualizar_estatisticas`). Toda entrada de
+`DATABASES` espelho do primário (`'TEST': {'MIRROR': 'default'}`) é uma réplica; os
+settings criam `replica_1`, `replica_2`... a partir de `DB_REPLICAS`.
+
+`LeituraReplicaMiddleware` escolhe, no início de cada GET/HEAD para uma view com
+`usar_replica = True`, uma réplica disponível, e `RoteadorReplicas` manda para ela as
+leituras dos modelos do site durante a requisição. A mesma réplica atende a requisição
+inteira. Vão sempre para o primário: escritas, leituras dentro de transações, o admin, os
+comandos de gerenciamento, os modelos do Django (sessão, usuários) e `VersaoDados`, que
+define as chaves de cache.
+
+Uma réplica está disponível quando responde, está no máximo `REPLICAS_ATRASO_MAXIMO`
+segundos atrás do primário e já aplicou a última importação (versões de `versao_dados`
+iguais ou maiores que as do primário). Sem isso, uma resposta calculada com dados antigos
+seria guardada no cache com a chave da versão nova. Cada processo verifica as réplicas no
+máximo a cada `REPLICAS_INTERVALO_VERIFICACAO` segundos. Sem réplica disponível, as
+leituras ficam no primário. Se uma réplica cair no meio de uma requisição, essa requisição
+falha e a réplica sai da lista até a próxima verificação.
+
+Fora das requisições, `leitura_em_replica()` aplica o mesmo roteamento a um bloco.
+"""
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, InterfaceError, OperationalError, connections
+from django.urls import Resolver404, resolve
+
+from .instrumentacao import sem_medicao
+from .models import VersaoDados
+
+logger = logging.getLogger(__name__)
+
+# Apps cujas tabelas são lidas nas réplicas; as do Django (sessão, auth, admin) ficam no primário
+APPS_REPLICADAS = {'agendamento', 'anuncios', 'avaliacoes', 'core', 'imovel', 'localizacoes'}
+MODELOS_SO_PRIMARIO = {'core.versaodados'}
+
+# Atraso de replay da réplica em segundos. É 0 se tudo o que ela recebeu já foi aplicado (com o
+# primário parado, pg_last_xact_replay_timestamp envelhece sem haver atraso) ou se o servidor
+# não está em recuperação (réplica simulada no próprio primário). Com WAL pendente e nenhuma
+# transação aplicada desde que a réplica subiu, o atraso é desconhecido: infinito
+SQL_ATRASO = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())::float8, 'Infinity')
+    END
+"""
+
+_alias_leitura = ContextVar('alias_leitura_replica', default=None)
+_estado = {'verificado_em': None, 'disponiveis': []}
+_trava = threading.Lock()
+
+
+def aliases_replica():
+    return [
+        alias for alias, configuracao in settings.DATABASES.items()
+        if alias != DEFAULT_DB_ALIAS and configuracao.get('TEST', {}).get('MIRROR') == DEFAULT_DB_ALIAS
+    ]
+
+
+def _versoes(alias):
+    return dict(VersaoDados.objects.using(alias).values_list('escopo', 'versao'))
+
+
+def situacao_replica(alias, versoes_primario=None):
+    """
+    {alias, atraso, versoes_pendentes, erro, disponivel} de uma réplica. `versoes_pendentes`
+    lista os escopos de `versao_dados` em que ela está atrás do primário.
+    """
+    situacao = {'alias': alias, 'atraso': None, 'versoes_pendentes': [], 'erro': None, 'disponivel': False}
+    try:
+        if versoes_primario is None:
+            versoes_primario = _versoes(DEFAULT_DB_ALIAS)
+        conexao = connections[alias]
+        with conexao.cursor() as cursor:
+            if conexao.vendor == 'postgresql':
+                cursor.execute(SQL_ATRASO)
+                situacao['atraso'] = float(cursor.fetchone()[0])
+            else:
+                situacao['atraso'] = 0.0
+        versoes = _versoes(alias)
+    except DatabaseError as erro:
+        situacao['erro'] = str(erro).strip().splitlines()[0]
+        return situacao
+    situacao['versoes_pendentes'] = sorted(
+        escopo for escopo, versao in versoes_primario.items() if versoes.get(escopo, 0) < versao
+    )
+    situacao['disponivel'] = (
+        situacao['atraso'] <= getattr(settings, 'REPLICAS_ATRASO_MAXIMO', 30)
+        and not situacao['versoes_pendentes']
+    )
+    return situacao
+
+
+def _estado_valido():
+    verificado_em = _estado['verificado_em']
+    intervalo = getattr(settings, 'REPLICAS_INTERVALO_VERIFICACAO', 5)
+    return verificado_em is not None and time.monotonic() - verificado_em < intervalo
+
+
+def _verificar():
+    with _trava, sem_medicao():
+        if not _estado_valido():
+            try:
+                versoes_primario = _versoes(DEFAULT_DB_ALIAS)
+            except DatabaseError:
+                # Sem o primário não há como comparar; a requisição falha no primário mesmo
+                versoes_primario = {}
+            disponiveis = []
+            for alias in aliases_replica():
+                situacao = situacao_replica(alias, versoes_primario)
+                if situacao['disponivel']:
+                    disponiveis.append(alias)
+                elif alias in _estado['disponiveis']:
+                    logger.warning(
+                        "Réplica %s fora do roteamento (atraso %s s, versões pendentes %s, erro %s)",
+                        alias, situacao['atraso'], situacao['versoes_pendentes'] or '-', situacao['erro'] or '-'
+                    )
+            _estado['disponiveis'] = disponiveis
+            _estado['verificado_em'] = time.monotonic()
+        return _estado['disponiveis']
+
+
+def replicas_disponiveis():
+    """Réplicas em condições de atender leituras, verificadas no máximo a cada intervalo."""
+    if not aliases_replica():
+        return []
+    return _estado['disponiveis'] if _estado_valido() else _verificar()
+
+
+async def areplicas_disponiveis():
+    # Só a verificação periódica precisa sair do loop de eventos
+    if not aliases_replica():
+        return []
+    return _estado['disponiveis'] if _estado_valido() else await sync_to_async(_verificar)()
+
+
+def descartar_replica(alias):
+    """Tira `alias` das réplicas disponíveis neste processo até a próxima verificação."""
+    with _trava:
+        _estado['disponiveis'] = [disponivel for disponivel in _estado['disponiveis'] if disponivel != alias]
+
+
+def alias_leitura():
+    """Réplica usada pelas leituras no contexto atual, ou None (primário)."""
+    return _alias_leitura.get()
+
+
+@contextmanager
+def leitura_em_replica(alias=None):
+    """
+    Leituras dos modelos do site dentro do bloco em `alias` ou, sem ele, numa réplica
+    disponível (no primário se não houver nenhuma).
+    """
+    if alias is None:
+        disponiveis = replicas_disponiveis()
+        alias = random.choice(disponiveis) if disponiveis else None
+    token = _alias_leitura.set(alias)
+    try:
+        yield alias
+    finally:
+        _alias_leitura.reset(token)
+
+
+class RoteadorReplicas:
+    """Roteador do Django: leituras no alias do contexto atual, escritas e migrações no primário."""
+
+    def db_for_read(self, model, **hints):
+        alias = _alias_leitura.get()
+        if (alias is None or model._meta.app_label not in APPS_REPLICADAS
+                or model._meta.label_lower in MODELOS_SO_PRIMARIO
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        # Inclusive para objetos lidos numa réplica (o padrão do Django gravaria nela)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # As réplicas recebem o esquema pela replicação
+        return False if db in aliases_replica() else None
+
+
+class LeituraReplicaMiddleware:
+    """
+    Roteia para uma réplica as leituras dos GET/HEAD das views com `usar_replica = True`.
+    A view é resolvida aqui, antes de `process_view`, para não trocar de thread nos
+    middlewares assíncronos; sem réplicas configuradas, nada é feito.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self._elegivel(request):
+            return self.get_response(request)
+        with leitura_em_replica():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        if not self._elegivel(request):
+            return await self.get_response(request)
+        disponiveis = await areplicas_disponiveis()
+        if not disponiveis:
+            return await self.get_response(request)
+        with leitura_em_replica(random.choice(disponiveis)):
+            return await self.get_response(request)
+
+    @staticmethod
+    def _elegivel(request):
+        if request.method not in ('GET', 'HEAD') or not aliases_replica():
+            return False
+        try:
+            correspondencia = resolve(request.path_info, getattr(request, 'urlconf', None))
+        except Resolver404:
+            return False
+        view = getattr(correspondencia.func, 'view_class', correspondencia.func)
+        return getattr(view, 'usar_replica', False)
+
+    def process_exception(self, request, exception):
+        # Réplica fora do ar ou conexão perdida: as próximas requisições usam as outras ou o primário
+        alias = _alias_leitura.get()
+        if alias is not None and isinstance(exception, (OperationalError, InterfaceError)):
+            logger.warning("Réplica %s descartada após erro: %s", alias, exception)
+            descartar_replica(alias)
+        return None
@@ -0,0 +1,128 @@
+"""
+Requisições condicionais (ETag / If-None-Match) e Cache-Control para as APIs JSON.
+
+O conteúdo das APIs só muda quando os dados mudam, então o validador é calculado antes
+da view, a partir da versão dos dados (`versao_dados.versao_atual`), do caminho e dos
+parâmetros da requisição. Se o navegador (ou o nginx) enviar um `If-None-Match` igual, a
+resposta é um 304 sem executar a view. As respostas 200 saem com `Cache-Control: public`
+e `max-age=API_CACHE_MAX_AGE`: nesse intervalo o navegador reaproveita a própria cópia
+ao repetir um filtro, e depois revalida com o ETag.
+
+O código da aplicação também entra no ETag: depois de um deploy que mude o formato das
+respostas, as cópias antigas deixam de valer mesmo sem importação nova.
+
+As APIs são somente leitura e não usam sessão: ficam isentas de CSRF, e nada nelas carrega
+a sessão, mesmo quando o navegador envia o cookie do admin.
+
+`MicrocacheMiddleware` controla o microcache do nginx (`nginx/conf/default.conf`): as views
+com `microcache = True` (páginas públicas e APIs, todas anônimas) saem com
+`X-Accel-Expires`, que o nginx usa como TTL no lugar do `Cache-Control` e não repassa ao
+navegador. Respostas sem esse cabeçalho, como as do admin, não entram no cache.
+"""
+import hashlib
+import json
+from functools import lru_cache
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views.decorators.csrf import csrf_exempt
+
+from .instrumentacao import atributo_da_view
+from .versao_dados import aversao_atual, cidades_dos_parametros, versao_atual
+
+
+@lru_cache(maxsize=1)
+def _versao_codigo():
+    resumo = hashlib.sha1()
+    for arquivo in sorted(Path(__file__).resolve().parent.glob('*.py')):
+        resumo.update(arquivo.read_bytes())
+    return resumo.hexdigest()[:8]
+
+
+def _cidades(request, campos_cidade):
+    return cidades_dos_parametros(request.GET, *campos_cidade) if campos_cidade else None
+
+
+def _etag(request, versao):
+    parametros = json.dumps(sorted(request.GET.lists()))
+    resumo = hashlib.sha1(f'{request.path}|{parametros}'.encode()).hexdigest()[:16]
+    return f'W/"{versao}-{_versao_codigo()}-{resumo}"'
+
+
+def etag_dados(request, campos_cidade=()):
+    """ETag fraco da resposta de `request`; `campos_cidade` restringe a versão às cidades consultadas."""
+    return _etag(request, versao_atual(_cidades(request, campos_cidade)))
+
+
+async def aetag_dados(request, campos_cidade=()):
+    return _etag(request, await aversao_atual(_cidades(request, campos_cidade)))
+
+
+class RespostaCondicionalMixin:
+    """
+    Para views JSON somente leitura. `campos_cidade` lista os parâmetros com IDs de cidade;
+    sem eles, vale a versão de todas as cidades.
+    """
+    campos_cidade = ()
+    microcache = True
+    usar_replica = True  # Leituras numa réplica, se houver (apps.core.replicas)
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return super().dispatch(request, *args, **kwargs)
+        if self.view_is_async:
+            return self._adispatch(request, *args, **kwargs)
+
+        etag = etag_dados(request, self.campos_cidade)
+        resposta = get_conditional_response(request, etag=etag)
+        if resposta is None:
+            resposta = super().dispatch(request, *args, **kwargs)
+        return self._marcar(resposta, etag)
+
+    async def _adispatch(self, request, *args, **kwargs):
+        etag = await aetag_dados(request, self.campos_cidade)
+        resposta = get_conditional_response(request, etag=etag)
+        if resposta is None:
+            resposta = await super().dispatch(request, *args, **kwargs)
+        return self._marcar(resposta, etag)
+
+    @staticmethod
+    def _marcar(resposta, etag):
+        if resposta.status_code in (200, 304):
+            resposta['ETag'] = etag
+            patch_cache_control(resposta, public=True, max_age=getattr(settings, 'API_CACHE_MAX_AGE', 300))
+        return resposta
+
+
+class MicrocacheMiddleware:
+    """Marca as respostas 200 e 304 das views com `microcache = True` para o cache do nginx."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.segundos = getattr(settings, 'MICROCACHE_SEGUNDOS', 5)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self._marcar(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self._marcar(request, await self.get_response(request))
+
+    def _marcar(self, request, response):
+        if (request.method in ('GET', 'HEAD') and response.status_code in (200, 304)
+                and not response.cookies and self.segundos > 0
+                and atributo_da_view(request, 'microcache', False)):
+            response['X-Accel-Expires'] = str(self.segundos)
+        return response
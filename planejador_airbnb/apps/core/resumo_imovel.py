@@ -0,0 +1,46 @@
+"""
+Campos do imóvel e da sua avaliação copiados em `agendamento` (migração agendamento 0005):
+cidade_id, bairro_id, quartos, camas, banheiros, nota e qtd_avaliacoes.
+
+A busca, a comparação, o planejador e as APIs de filtros filtram e ordenam por esses campos
+sem juntar `imovel` e `avaliacao`. A importação do scraper já grava as cópias ao inserir
+agendamentos e as atualiza quando o imóvel ou a avaliação mudam. `sincronizar_resumo_imovel`
+corrige o que tiver chegado por outro caminho (notebooks de ETL, admin) e roda no
+`atualizar_estatisticas`.
+"""
+from django.db import connection, transaction
+
+CAMPOS = ('cidade_id', 'bairro_id', 'quartos', 'camas', 'banheiros', 'nota', 'qtd_avaliacoes')
+
+SQL_RESUMO = """
+    SELECT i.id AS imovel_id, i.cidade_id, i.bairro_id, i.quartos, i.camas, i.banheiros,
+           v.nota, v.qtd_avaliacoes
+    FROM imovel i
+    LEFT JOIN avaliacao v ON v.imovel_id = i.id
+"""
+
+# Só regrava os agendamentos com alguma cópia diferente (no PostgreSQL cada UPDATE gera uma
+# nova versão da linha, mesmo sem mudança)
+SQL_SINCRONIZA = """
+    UPDATE agendamento SET {atribuicoes}
+    FROM ({resumo}) r
+    WHERE agendamento.imovel_id = r.imovel_id AND ({diferencas})
+"""
+
+OPERADOR_DIFERENTE = {
+    'postgresql': 'IS DISTINCT FROM',
+    'sqlite': 'IS NOT',
+}
+
+
+def sincronizar_resumo_imovel():
+    """Atualiza as cópias desatualizadas. Retorna a quantidade de agendamentos alterados."""
+    diferente = OPERADOR_DIFERENTE[connection.vendor]
+    sql = SQL_SINCRONIZA.format(
+        atribuicoes=', '.join(f'{campo} = r.{campo}' for campo in CAMPOS),
+        resumo=SQL_RESUMO,
+        diferencas=' OR '.join(f'agendamento.{campo} {diferente} r.{campo}' for campo in CAMPOS),
+    )
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(sql)
+        return cursor.rowcount
@@ -1,3 +1,353 @@
-from django.test import TestCase
+import math
+import statistics
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connection, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import resolve
+
+from apps.agendamento.models import Agendamento, ObservacaoPreco
+from apps.anuncios.models import Anuncio
+from apps.core.cache_protegido import estatisticas_cache, obter_ou_calcular
+from apps.core.estatisticas import (
+    FAIXAS_PRECO, PRECO_BASE_HISTOGRAMA, RAZAO_FAIXAS, TOTAL_FAIXAS, _quantil, distribuicao_precos,
+    estatisticas_local, limitar_aos_extremos,
+)
+from apps.core.instrumentacao import orcamento_consultas
+from apps.core.management.commands.benchmark_views import Command as BenchmarkViews
+from apps.core.models import EstatisticaLocal, VersaoDados
+from apps.core.particoes import SCHEMA_ARQUIVO, arquivar_particoes, particionado, particoes, somar_meses
+from apps.core.registro_buscas import CABECALHO_AQUECIMENTO
+from apps.core.replicas import RoteadorReplicas, leitura_em_replica
+from apps.core.versao_dados import incrementar_versao
+
+
+class DadosSinteticosTestCase(TestCase):
+    """Base dos testes das views: poucos dados sintéticos em duas cidades e cache vazio por teste."""
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command('gerar_dados_sinteticos', agendamentos=400, cidades=2, bairros_por_cidade=2,
+                     dias_futuros=60, seed=7, stdout=StringIO())
+        referencia = Agendamento.objects.filter(data_checkin__gt=date.today()).order_by('data_checkin', 'id').first()
+        cls.busca = {
+            'cidade': referencia.cidade_id,
+            'data_checkin': referencia.data_checkin.isoformat(),
+            'hospedes': referencia.hospedes,
+            'quantidade_noites': (referencia.data_checkout - referencia.data_checkin).days,
+        }
+
+    def setUp(self):
+        cache.clear()
+        # Sem o cabeçalho as requisições iriam para o registro de buscas em logs/buscas/
+        self.client = self.client_class(headers={CABECALHO_AQUECIMENTO: '1'})
+
+
+class ResultadosBuscaTests(DadosSinteticosTestCase):
+
+    def test_busca_repetida_usa_queryset_do_cache(self):
+        primeira = self.client.get('/resultados/', self.busca)
+        segunda = self.client.get('/resultados/', self.busca)
+
+        self.assertEqual(primeira.status_code, 200)
+        self.assertEqual(segunda.status_code, 200)
+        self.assertEqual(segunda.context['form'].cleaned_data['hospedes'], self.busca['hospedes'])
+        self.assertEqual(list(primeira.context['page_obj']), list(segunda.context['page_obj']))
+
+
+class OrcamentoViewsTests(DadosSinteticosTestCase):
+    """
+    Cada URL de apps/core/urls.py, com o cache vazio e depois com ele preenchido, dentro do
+    orçamento de consultas declarado na view. Os endpoints do `benchmark_views` entram aqui
+    com os mesmos parâmetros, para que o benchmark não meça respostas de erro.
+    """
+
+    def _endpoints(self):
+        benchmark = BenchmarkViews()
+        p = benchmark._parametros_base()
+        localizacoes = {'cidade_1': p['cidade_1'], 'cidade_2': p['cidade_2']}
+        return benchmark._endpoints(p) + [
+            ('api_bairros', '/api/bairros/', {'cidade_id': p['cidade_1']}),
+            ('api_datas_comparacao', '/api/datas-disponiveis-comparacao/', localizacoes),
+            ('api_hospedes_comparacao', '/api/hospedes-disponiveis-comparacao/',
+             {**localizacoes, 'data_checkin': p['data_checkin']}),
+            ('api_noites_comparacao', '/api/noites-disponiveis-comparacao/',
+             {**localizacoes, 'data_checkin': p['data_checkin'], 'hospedes': p['hospedes']}),
+            ('api_historico_precos', '/api/historico-precos/', {'cidade_id': p['cidade_1']}),
+            ('metricas', '/metricas/', {}),
+        ]
+
+    @staticmethod
+    def _orcamento(caminho):
+        view = resolve(caminho).func
+        return getattr(getattr(view, 'view_class', view), 'orcamento_consultas', 0)
+
+    def test_todas_as_urls_sao_cobertas(self):
+        from apps.core.urls import urlpatterns
+        caminhos = {caminho for _, caminho, _ in self._endpoints()}
+        self.assertEqual(caminhos, {f'/{padrao.pattern}' for padrao in urlpatterns})
+
+    def test_urls_com_cache_frio_e_quente(self):
+        for nome, caminho, params in self._endpoints():
+            orcamento = self._orcamento(caminho)
+            respostas = []
+            for estado in ('frio', 'quente'):
+                with self.subTest(endpoint=nome, cache=estado), orcamento_consultas(orcamento):
+                    resposta = self.client.get(caminho, params)
+                    self.assertEqual(resposta.status_code, 200, resposta.content[:300])
+                respostas.append(resposta)
+            if respostas[0]['Content-Type'].startswith('application/json'):
+                self.assertEqual(respostas[0].content, respostas[1].content, nome)
+            cache.clear()
+
+
+class RespostaCondicionalTests(DadosSinteticosTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.params = {'cidade_id': self.busca['cidade']}
+
+    def test_if_none_match_igual_responde_304_sem_executar_a_view(self):
+        primeira = self.client.get('/api/datas-disponiveis/', self.params)
+        self.assertEqual(primeira.status_code, 200)
+        self.assertIn('max-age', primeira['Cache-Control'])
+
+        with orcamento_consultas(1) as metricas:
+            segunda = self.client.get('/api/datas-disponiveis/', self.params, HTTP_IF_NONE_MATCH=primeira['ETag'])
+        self.assertEqual(segunda.status_code, 304)
+        self.assertEqual(segunda['ETag'], primeira['ETag'])
+        self.assertEqual(segunda.content, b'')
+        self.assertLessEqual(metricas.consultas, 1)
+
+    def test_etag_muda_com_os_parametros_e_com_a_versao_dos_dados(self):
+        etag = self.client.get('/api/datas-disponiveis/', self.params)['ETag']
+        outra_cidade = self.client.get('/api/datas-disponiveis/', {'cidade_id': self.busca['cidade'] + 1})
+        self.assertNotEqual(outra_cidade['ETag'], etag)
+
+        incrementar_versao([self.busca['cidade']])
+        resposta = self.client.get('/api/datas-disponiveis/', self.params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertNotEqual(resposta['ETag'], etag)
+
+
+def _contagens(precos):
+    """Histograma de uma lista de diárias com a mesma regra de faixas do SQL (`EXPRESSAO_FAIXA`)."""
+    contagens = Counter()
+    for preco in precos:
+        if preco < PRECO_BASE_HISTOGRAMA:
+            faixa = 0
+        elif preco >= FAIXAS_PRECO[-1][0]:
+            faixa = TOTAL_FAIXAS - 1
+        else:
+            faixa = math.floor(math.log(preco / PRECO_BASE_HISTOGRAMA) / math.log(RAZAO_FAIXAS)) + 1
+        contagens[faixa] += 1
+    return sorted(contagens.items())
+
+
+class QuantilTests(SimpleTestCase):
+    PRECOS = [8.5, 62, 75, 88, 95, 110, 120, 135, 150, 160, 180, 210, 240, 290, 350, 480, 900, 1500, 2400]
+
+    def test_quantis_proximos_dos_exatos(self):
+        contagens = _contagens(self.PRECOS)
+        exatos = statistics.quantiles(self.PRECOS, n=4, method='inclusive')
+        for fracao, exato in zip((0.25, 0.5, 0.75), exatos):
+            estimado = _quantil(contagens, len(self.PRECOS), fracao)
+            self.assertAlmostEqual(estimado / exato, 1, delta=RAZAO_FAIXAS - 1)
+
+    def test_quantis_limitados_aos_extremos(self):
+        # Todos os preços na mesma faixa: a interpolação passa do máximo real
+        precos = [280.0, 290.0, 294.86]
+        p75 = _quantil(_contagens(precos), len(precos), 0.75)
+        self.assertGreater(p75, max(precos))
+        self.assertEqual(limitar_aos_extremos(p75, min(precos), max(precos)), 294.86)
+        self.assertEqual(limitar_aos_extremos(p75, None, None), p75)
+
+
+class EstatisticasLocalTests(DadosSinteticosTestCase):
+
+    def test_distribuicao_contra_os_precos_da_cidade(self):
+        cidade_id = self.busca['cidade']
+        precos = [float(preco) for preco in Agendamento.objects.filter(
+            cidade_id=cidade_id, preco_por_dia__isnull=False, data_checkin__gte=date.today(),
+        ).values_list('preco_por_dia', flat=True)]
+        distribuicao = distribuicao_precos(cidade_id=cidade_id, bairro__isnull=True, hospedes_minimo=0)
+        self.assertEqual(distribuicao['total'], len(precos))
+        self.assertAlmostEqual(distribuicao['mediana'] / statistics.median(precos), 1, delta=RAZAO_FAIXAS - 1)
+
+    def test_quantis_entre_minimo_e_maximo(self):
+        linhas = EstatisticaLocal.objects.filter(bairro__isnull=True, total_precos__gt=0)
+        self.assertTrue(linhas.exists())
+        for linha in linhas:
+            estatisticas = estatisticas_local(
+                {'tipo': 'cidade', 'cidade_id': linha.cidade_id}, linha.data_checkin,
+                linha.hospedes_minimo, linha.noites,
+            )
+            self.assertLessEqual(estatisticas['preco_minimo'], estatisticas['preco_p25'])
+            self.assertLessEqual(estatisticas['preco_p25'], estatisticas['preco_mediano'])
+            self.assertLessEqual(estatisticas['preco_mediano'], estatisticas['preco_p75'])
+            self.assertLessEqual(estatisticas['preco_p75'], estatisticas['preco_maximo'])
+
+
+class RoteadorReplicasTests(TransactionTestCase):
+    """O roteador não conecta na réplica: basta um alias qualquer no contexto."""
+
+    def setUp(self):
+        self.roteador = RoteadorReplicas()
+
+    def test_leituras_no_contexto_vao_para_a_replica(self):
+        self.assertEqual(self.roteador.db_for_read(Agendamento), DEFAULT_DB_ALIAS)
+        with leitura_em_replica('replica_1'):
+            self.assertEqual(self.roteador.db_for_read(Agendamento), 'replica_1')
+            self.assertEqual(self.roteador.db_for_read(Anuncio), 'replica_1')
+        self.assertEqual(self.roteador.db_for_read(Agendamento), DEFAULT_DB_ALIAS)
+
+    def test_escritas_e_modelos_fora_do_site_ficam_no_primario(self):
+        with leitura_em_replica('replica_1'):
+            self.assertEqual(self.roteador.db_for_write(Agendamento), DEFAULT_DB_ALIAS)
+            self.assertEqual(self.roteador.db_for_read(VersaoDados), DEFAULT_DB_ALIAS)
+            self.assertEqual(self.roteador.db_for_read(User), DEFAULT_DB_ALIAS)
+
+    def test_leituras_em_transacao_ficam_no_primario(self):
+        with leitura_em_replica('replica_1'):
+            with transaction.atomic():
+                self.assertEqual(self.roteador.db_for_read(Agendamento), DEFAULT_DB_ALIAS)
+            self.assertEqual(self.roteador.db_for_read(Agendamento), 'replica_1')
+
+    def test_migracoes_nao_rodam_nas_replicas(self):
+        with mock.patch('apps.core.replicas.aliases_replica', return_value=['replica_1']):
+            self.assertIs(self.roteador.allow_migrate('replica_1', 'agendamento'), False)
+            self.assertIsNone(self.roteador.allow_migrate(DEFAULT_DB_ALIAS, 'agendamento'))
+
+
+class ObterOuCalcularTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        estatisticas_cache.limpar()
+
+    def test_chamadas_simultaneas_calculam_uma_vez(self):
+        liberar = threading.Event()
+        chamadas = []
+
+        def calcular():
+            chamadas.append(threading.get_ident())
+            liberar.wait(5)
+            return {'total': 42}
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            futuros = [
+                pool.submit(obter_ou_calcular, 'teste:coalescencia', calcular, 60, nome='teste')
+                for _ in range(8)
+            ]
+            # Só libera o cálculo quando as outras sete chamadas estiverem esperando por ele
+            limite = time.monotonic() + 5
+            while estatisticas_cache.valores().get('teste', {}).get('coalescidos', 0) < 7:
+                self.assertLess(time.monotonic(), limite, "as chamadas não foram coalescidas")
+                time.sleep(0.01)
+            liberar.set()
+            resultados = [futuro.result(timeout=5) for futuro in futuros]
+
+        self.assertEqual(len(chamadas), 1)
+        self.assertEqual(resultados, [{'total': 42}] * 8)
+        self.assertEqual(estatisticas_cache.valores()['teste']['calculos'], 1)
+        self.assertEqual(obter_ou_calcular('teste:coalescencia', calcular, 60, nome='teste'), {'total': 42})
+        self.assertEqual(estatisticas_cache.valores()['teste']['acertos'], 1)
+
+    def test_erro_no_calculo_chega_a_quem_esperava(self):
+        liberar = threading.Event()
+
+        def falhar():
+            liberar.wait(5)
+            raise ValueError('falhou')
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            futuros = [pool.submit(obter_ou_calcular, 'teste:erro', falhar, 60, nome='teste') for _ in range(2)]
+            limite = time.monotonic() + 5
+            while estatisticas_cache.valores().get('teste', {}).get('coalescidos', 0) < 1:
+                self.assertLess(time.monotonic(), limite, "as chamadas não foram coalescidas")
+                time.sleep(0.01)
+            liberar.set()
+            for futuro in futuros:
+                with self.assertRaises(ValueError):
+                    futuro.result(timeout=5)
+        self.assertIsNone(cache.get('teste:erro'))
+
+
+@skipUnless(connection.vendor == 'postgresql', "Partições de agendamento requerem PostgreSQL")
+class ArquivarParticoesTests(DadosSinteticosTestCase):
+
+    def setUp(self):
+        super().setUp()
+        if not particionado():
+            self.skipTest("agendamento não é particionado")
+        # As chaves estrangeiras adiadas dos dados de teste impediriam o DETACH PARTITION
+        with connection.cursor() as cursor:
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        self.mes_atual = date.today().replace(day=1)
+        # Uma coleta por agendamento, uma semana antes do check-in
+        ObservacaoPreco.objects.bulk_create([
+            ObservacaoPreco(agendamento_id=agendamento_id, imovel_id=imovel_id,
+                            observado_em=checkin - timedelta(days=7), preco_total_centavos=10_000,
+                            antecedencia_dias=7, noites=2, hospedes=2)
+            for agendamento_id, imovel_id, checkin in Agendamento.objects.values_list('id', 'imovel_id', 'data_checkin')
+        ])
+
+    def _antigos(self):
+        return Agendamento.objects.filter(data_checkin__lt=self.mes_atual)
+
+    def _contar(self, tabela):
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT count(*) FROM {tabela}")
+            return cursor.fetchone()[0]
+
+    def test_arquiva_meses_antigos_com_os_anuncios(self):
+        ids = list(self._antigos().values_list('id', flat=True))
+        self.assertTrue(ids)
+
+        retiradas = arquivar_particoes(self.mes_atual)
+
+        self.assertEqual(sum(linhas for _, linhas in retiradas), len(ids))
+        self.assertFalse(self._antigos().exists())
+        self.assertFalse(Anuncio.objects.filter(agendamento_id__in=ids).exists())
+        self.assertFalse(ObservacaoPreco.objects.filter(agendamento_id__in=ids).exists())
+        self.assertTrue(ObservacaoPreco.objects.exists())
+        self.assertTrue(all(mes >= self.mes_atual for _, mes, _ in particoes()))
+        mes_anterior = somar_meses(self.mes_atual, -1)
+        linhas = dict(retiradas)[f'agendamento_{mes_anterior:%Y%m}']
+        self.assertEqual(self._contar(f'{SCHEMA_ARQUIVO}.anuncio_{mes_anterior:%Y%m}'), linhas)
+        self.assertEqual(self._contar(f'{SCHEMA_ARQUIVO}.observacao_preco_{mes_anterior:%Y%m}'), linhas)
+
+    def test_apagar_remove_as_particoes(self):
+        ids = list(self._antigos().values_list('id', flat=True))
+        retiradas = arquivar_particoes(self.mes_atual, apagar=True)
+        self.assertTrue(retiradas)
+        self.assertFalse(self._antigos().exists())
+        self.assertFalse(ObservacaoPreco.objects.filter(agendamento_id__in=ids).exists())
+        with connection.cursor() as cursor:
+            for nome, _ in retiradas:
+                cursor.execute("SELECT to_regclass(%s), to_regclass(%s)", [nome, f'{SCHEMA_ARQUIVO}.{nome}'])
+                self.assertEqual(cursor.fetchone(), (None, None))
+
+
+class MetricasTests(SimpleTestCase):
+
+    @override_settings(INSTRUMENTACAO_TOKEN_METRICAS=None, INSTRUMENTACAO_METRICAS_SEM_TOKEN=False)
+    def test_sem_token_configurado_responde_403(self):
+        self.assertEqual(self.client.get('/metricas/').status_code, 403)
+
+    @override_settings(INSTRUMENTACAO_TOKEN_METRICAS='segredo')
+    def test_exige_o_token_configurado(self):
+        self.assertEqual(self.client.get('/metricas/').status_code, 403)
+        self.assertEqual(self.client.get('/metricas/', HTTP_AUTHORIZATION='Bearer outro').status_code, 403)
+        resposta = self.client.get('/metricas/', HTTP_AUTHORIZATION='Bearer segredo')
+        self.assertEqual(resposta.status_code, 200)
+        self.assertIn(b'planejador_requisicoes_total', resposta.content)
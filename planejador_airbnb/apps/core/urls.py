@@ -18,8 +18,10 @@ from .views import (
     NoitesDisponiveisComparacaoView,
     # NOVAS: Views para planejador de férias
     PlanejadorFeriasView,
-    PlanejadorFeriasResultadosView
+    PlanejadorFeriasResultadosView,
+    HistoricoPrecosView,
 )
+from .instrumentacao import metricas_prometheus
 
 app_name = 'core'
 
@@ -56,4 +58,10 @@ urlpatterns = [
 
     # API para o planejador de férias
     path('api/planejador-ferias/', PlanejadorFeriasResultadosView.as_view(), name='api_planejador_ferias'),
+
+    # API da evolução de preços (agendamento, imóvel ou localização)
+    path('api/historico-precos/', HistoricoPrecosView.as_view(), name='api_historico_precos'),
+
+    # Métricas de desempenho (formato texto do Prometheus)
+    path('metricas/', metricas_prometheus, name='metricas'),
 ]
\ No newline at end of file
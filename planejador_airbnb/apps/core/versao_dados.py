@@ -0,0 +1,127 @@
+"""
+Versão dos dados, usada nas chaves de cache.
+
+Os caches das views expiravam por TTL fixo (10 minutos a 1 hora): depois de uma importação
+os usuários viam preços antigos por até uma hora, e entre importações, quando os dados não
+mudam, os valores expiravam à toa. Agora cada importação incrementa um contador na tabela
+`versao_dados` ('global', ou 'cidade:<id>' nas importações parciais) e esse contador faz
+parte das chaves de cache (`chave_cache`). Os valores ficam guardados por até
+`CACHE_TTL_VERSIONADO` segundos e deixam de ser usados assim que a versão muda; as chaves
+antigas não são mais lidas e saem do cache pelo descarte do próprio backend.
+
+Quem incrementa:
+- `manage.py atualizar_estatisticas` (executado após cada importação), global ou por cidade;
+- o `SinkIngestao` do scrappling, para as cidades de cada lote gravado;
+- `manage.py gerar_dados_sinteticos`.
+
+Cada processo web relê a tabela (uma linha por escopo) no máximo a cada
+`VERSAO_DADOS_INTERVALO_VERIFICACAO` segundos. A data de hoje também entra na chave, pois
+parte dos cálculos (planejador, próximos 12 meses) é relativa ao dia atual.
+"""
+import hashlib
+import json
+import threading
+import time
+from datetime import date
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .models import VersaoDados
+
+ESCOPO_GLOBAL = 'global'
+
+_instantaneo = {'lido_em': None, 'versoes': {}}
+_trava = threading.Lock()
+
+
+def escopo_cidade(cidade_id):
+    return f'cidade:{int(cidade_id)}'
+
+
+def incrementar_versao(cidade_ids=None):
+    """Incrementa a versão global ou, se informadas, apenas a das cidades importadas."""
+    escopos = [escopo_cidade(cidade_id) for cidade_id in cidade_ids] if cidade_ids else [ESCOPO_GLOBAL]
+    for escopo in escopos:
+        if not VersaoDados.objects.filter(escopo=escopo).update(versao=F('versao') + 1, atualizado_em=timezone.now()):
+            VersaoDados.objects.get_or_create(escopo=escopo, defaults={'versao': 1})
+    # Neste processo a mudança vale imediatamente; nos demais, na próxima releitura
+    _instantaneo['lido_em'] = None
+
+
+def _instantaneo_valido():
+    lido_em = _instantaneo['lido_em']
+    intervalo = getattr(settings, 'VERSAO_DADOS_INTERVALO_VERIFICACAO', 5)
+    return lido_em is not None and time.monotonic() - lido_em < intervalo
+
+
+def _versoes():
+    with _trava:
+        if not _instantaneo_valido():
+            _instantaneo['versoes'] = dict(VersaoDados.objects.values_list('escopo', 'versao'))
+            _instantaneo['lido_em'] = time.monotonic()
+        return _instantaneo['versoes']
+
+
+async def _aversoes():
+    # Só a releitura periódica precisa sair do loop de eventos
+    if _instantaneo_valido():
+        return _instantaneo['versoes']
+    return await sync_to_async(_versoes)()
+
+
+def versao_atual(cidade_ids=None):
+    """
+    Token da versão dos dados: versão global, versões das cidades informadas e a data de hoje.
+    Sem cidades (cálculos que abrangem todas), qualquer importação parcial também muda o token.
+    """
+    return _token(_versoes(), cidade_ids)
+
+
+async def aversao_atual(cidade_ids=None):
+    """Versão assíncrona de `versao_atual`, para as views assíncronas."""
+    return _token(await _aversoes(), cidade_ids)
+
+
+def _token(versoes, cidade_ids):
+    partes = [f"g{versoes.get(ESCOPO_GLOBAL, 0)}"]
+    if cidade_ids is None:
+        partes.append(f"c{sum(versao for escopo, versao in versoes.items() if escopo != ESCOPO_GLOBAL)}")
+    else:
+        partes += [f"c{cidade_id}.{versoes.get(escopo_cidade(cidade_id), 0)}" for cidade_id in sorted(set(cidade_ids))]
+    partes.append(f"{date.today():%Y%m%d}")
+    return '-'.join(partes)
+
+
+def cidades_dos_parametros(parametros, *campos):
+    """IDs de cidade presentes nos parâmetros, ou None (todas) se algum estiver ausente ou inválido."""
+    cidade_ids = []
+    for campo in campos:
+        valor = str(parametros.get(campo) or '')
+        if not valor.isdigit():
+            return None
+        cidade_ids.append(int(valor))
+    return cidade_ids
+
+
+def chave_cache(prefixo, parametros, cidade_ids=None):
+    """
+    Chave de cache versionada. O resumo dos parâmetros é estável entre processos (ao
+    contrário de `hash()`): com um cache compartilhado, todos os workers leem as mesmas
+    entradas; com o cache em memória local, cada worker guarda as suas.
+    """
+    return f"{prefixo}:{versao_atual(cidade_ids)}:{_resumo(parametros)}"
+
+
+async def achave_cache(prefixo, parametros, cidade_ids=None):
+    return f"{prefixo}:{await aversao_atual(cidade_ids)}:{_resumo(parametros)}"
+
+
+def _resumo(parametros):
+    return hashlib.sha1(json.dumps(parametros, sort_keys=True, default=str).encode()).hexdigest()[:20]
+
+
+def ttl_versionado():
+    return getattr(settings, 'CACHE_TTL_VERSIONADO', 24 * 3600)
@@ -2,66 +2,86 @@ import json
 from django.core.cache import cache
 from collections import defaultdict
 from datetime import datetime, timedelta
-from django.db.models import Avg, Count, F, Max, Min, Q, Case, When, IntegerField, Exists, OuterRef
-from django.core.serializers.json import DjangoJSONEncoder
-from django.db.models.functions import Extract
-from django.http import JsonResponse
+from django.db.models import Avg, Count, F, Q, Case, When, FloatField, IntegerField, Exists, OuterRef, Subquery
+from django.db.models.functions import Cast, Extract
 from django.views.generic import ListView, TemplateView, View
 from datetime import datetime, timedelta, date
 from apps.agendamento.models import Agendamento
 from apps.imovel.models import Imovel
 from apps.localizacoes.models import Bairro, Cidade
+from .cache_protegido import aobter_ou_calcular, obter_ou_calcular
+from .centavos import media_reais, para_centavos, reais, soma_e_contagem
+from .estatisticas import distribuicao_precos, estatisticas_local, estatisticas_periodo, filtro_local
 from .forms import AgendamentoForm, ComparacaoForm, PlanejadorFeriasForm
+from .historico_precos import evolucao_precos, intervalo_coletas
+from .instrumentacao import JsonResponse  # JsonResponse com o tempo de serialização medido
+from .respostas_condicionais import RespostaCondicionalMixin
+from .versao_dados import achave_cache, chave_cache, cidades_dos_parametros, ttl_versionado
 
 
 class ComparacaoView(TemplateView):
     """
     View para a página de comparação entre cidades/bairros.
     """
+    orcamento_consultas = 3
+    microcache = True
+    usar_replica = True
     template_name = "core/comparacao.html"
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
-        # Buscar apenas cidades que têm agendamentos com dados
-        cidades_com_dados = Cidade.objects.filter(
-            imoveis_cidade__agendamentos__isnull=False,
-            imoveis_cidade__agendamentos__data_checkin__gte=datetime.today()
-        ).distinct().order_by('nome')
+        # Buscar apenas cidades que têm agendamentos futuros com preço. A subconsulta com LIMIT 1
+        # (em vez de Exists, que o PostgreSQL transforma em junção com todos os agendamentos
+        # futuros) lê só a próxima data de check-in de cada cidade no índice
+        proxima_estadia = Agendamento.objects.filter(
+            cidade_id=OuterRef('pk'), data_checkin__gte=datetime.today(), preco_por_dia__isnull=False
+        ).values('data_checkin')[:1]
+        cidades_com_dados = (
+            Cidade.objects.alias(proxima_estadia=Subquery(proxima_estadia))
+            .filter(proxima_estadia__isnull=False).order_by('nome')
+        )
 
         context['cidades'] = cidades_com_dados
         return context
 
 
-class BairrosPorCidadeComparacaoView(View):
+class BairrosPorCidadeComparacaoView(RespostaCondicionalMixin, View):
     """
     API View para comparação que retorna apenas bairros que têm dados.
     """
+    orcamento_consultas = 3
+    campos_cidade = ('cidade_id',)
 
-    def get(self, request, *args, **kwargs):
+    async def get(self, request, *args, **kwargs):
         cidade_id = request.GET.get('cidade_id')
         if not cidade_id:
             return JsonResponse({'error': 'Cidade não especificada'}, status=400)
 
         try:
             # Buscar apenas bairros que têm agendamentos futuros
+            futuros = Agendamento.objects.filter(
+                cidade_id=cidade_id, bairro_id=OuterRef('pk'),
+                data_checkin__gte=datetime.today(), preco_por_dia__isnull=False
+            )
             bairros_com_dados = Bairro.objects.filter(
-                cidade_id=cidade_id,
-                imoveis_bairro__agendamentos__data_checkin__gte=datetime.today()
-            ).distinct().order_by('nome').values('id', 'nome')
+                Exists(futuros), cidade_id=cidade_id
+            ).order_by('nome').values('id', 'nome')
 
-            return JsonResponse(list(bairros_com_dados), safe=False)
+            return JsonResponse([bairro async for bairro in bairros_com_dados], safe=False)
 
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
 
 
-class DatasDisponiveisComparacaoView(View):
+class DatasDisponiveisComparacaoView(RespostaCondicionalMixin, View):
     """
     API View para retornar datas disponíveis para comparação.
     """
+    orcamento_consultas = 3
+    campos_cidade = ('cidade_1', 'cidade_2')
 
-    def get(self, request, *args, **kwargs):
+    async def get(self, request, *args, **kwargs):
         cidade_1 = request.GET.get('cidade_1')
         bairro_1 = request.GET.get('bairro_1')
         cidade_2 = request.GET.get('cidade_2')
@@ -72,26 +92,26 @@ class DatasDisponiveisComparacaoView(View):
 
         try:
             # Construir filtros para ambas as localizações
-            filtro_1 = Q(imovel__cidade_id=cidade_1, data_checkin__gte=datetime.today())
+            filtro_1 = Q(cidade_id=cidade_1, data_checkin__gte=datetime.today(), preco_por_dia__isnull=False)
             if bairro_1:
-                filtro_1 &= Q(imovel__bairro_id=bairro_1)
+                filtro_1 &= Q(bairro_id=bairro_1)
 
-            filtro_2 = Q(imovel__cidade_id=cidade_2, data_checkin__gte=datetime.today())
+            filtro_2 = Q(cidade_id=cidade_2, data_checkin__gte=datetime.today(), preco_por_dia__isnull=False)
             if bairro_2:
-                filtro_2 &= Q(imovel__bairro_id=bairro_2)
+                filtro_2 &= Q(bairro_id=bairro_2)
 
             # Buscar datas que existem em AMBAS as localizações
-            datas_local_1 = set(
-                Agendamento.objects.filter(filtro_1)
+            datas_local_1 = {
+                data async for data in Agendamento.objects.filter(filtro_1)
                 .values_list('data_checkin', flat=True)
                 .distinct()
-            )
+            }
 
-            datas_local_2 = set(
-                Agendamento.objects.filter(filtro_2)
+            datas_local_2 = {
+                data async for data in Agendamento.objects.filter(filtro_2)
                 .values_list('data_checkin', flat=True)
                 .distinct()
-            )
+            }
 
             # Interseção - datas disponíveis em ambos os locais
             datas_comuns = datas_local_1.intersection(datas_local_2)
@@ -107,12 +127,14 @@ class DatasDisponiveisComparacaoView(View):
             return JsonResponse({'error': str(e)}, status=500)
 
 
-class HospedesDisponiveisComparacaoView(View):
+class HospedesDisponiveisComparacaoView(RespostaCondicionalMixin, View):
     """
     API View para retornar quantidade de hóspedes disponível para comparação.
     """
+    orcamento_consultas = 3
+    campos_cidade = ('cidade_1', 'cidade_2')
 
-    def get(self, request, *args, **kwargs):
+    async def get(self, request, *args, **kwargs):
         cidade_1 = request.GET.get('cidade_1')
         bairro_1 = request.GET.get('bairro_1')
         cidade_2 = request.GET.get('cidade_2')
@@ -126,26 +148,26 @@ class HospedesDisponiveisComparacaoView(View):
             data_checkin = datetime.strptime(data_checkin_str, '%Y-%m-%d').date()
 
             # Construir filtros para ambas as localizações
-            filtro_1 = Q(imovel__cidade_id=cidade_1, data_checkin=data_checkin)
+            filtro_1 = Q(cidade_id=cidade_1, data_checkin=data_checkin, preco_por_dia__isnull=False)
             if bairro_1:
-                filtro_1 &= Q(imovel__bairro_id=bairro_1)
+                filtro_1 &= Q(bairro_id=bairro_1)
 
-            filtro_2 = Q(imovel__cidade_id=cidade_2, data_checkin=data_checkin)
+            filtro_2 = Q(cidade_id=cidade_2, data_checkin=data_checkin, preco_por_dia__isnull=False)
             if bairro_2:
-                filtro_2 &= Q(imovel__bairro_id=bairro_2)
+                filtro_2 &= Q(bairro_id=bairro_2)
 
             # Buscar hospedes que existem em AMBAS as localizações
-            hospedes_local_1 = set(
-                Agendamento.objects.filter(filtro_1)
+            hospedes_local_1 = {
+                hospedes async for hospedes in Agendamento.objects.filter(filtro_1)
                 .values_list('hospedes', flat=True)
                 .distinct()
-            )
+            }
 
-            hospedes_local_2 = set(
-                Agendamento.objects.filter(filtro_2)
+            hospedes_local_2 = {
+                hospedes async for hospedes in Agendamento.objects.filter(filtro_2)
                 .values_list('hospedes', flat=True)
                 .distinct()
-            )
+            }
 
             # Interseção - hospedes disponíveis em ambos os locais
             hospedes_comuns = sorted(hospedes_local_1.intersection(hospedes_local_2))
@@ -156,12 +178,14 @@ class HospedesDisponiveisComparacaoView(View):
             return JsonResponse({'error': str(e)}, status=500)
 
 
-class NoitesDisponiveisComparacaoView(View):
+class NoitesDisponiveisComparacaoView(RespostaCondicionalMixin, View):
     """
     API View para retornar quantidade de noites disponível para comparação.
     """
+    orcamento_consultas = 3
+    campos_cidade = ('cidade_1', 'cidade_2')
 
-    def get(self, request, *args, **kwargs):
+    async def get(self, request, *args, **kwargs):
         cidade_1 = request.GET.get('cidade_1')
         bairro_1 = request.GET.get('bairro_1')
         cidade_2 = request.GET.get('cidade_2')
@@ -178,33 +202,35 @@ class NoitesDisponiveisComparacaoView(View):
 
             # Construir filtros para ambas as localizações
             filtro_1 = Q(
-                imovel__cidade_id=cidade_1,
+                cidade_id=cidade_1,
                 data_checkin=data_checkin,
-                hospedes__gte=hospedes
+                hospedes__gte=hospedes,
+                preco_por_dia__isnull=False
             )
             if bairro_1:
-                filtro_1 &= Q(imovel__bairro_id=bairro_1)
+                filtro_1 &= Q(bairro_id=bairro_1)
 
             filtro_2 = Q(
-                imovel__cidade_id=cidade_2,
+                cidade_id=cidade_2,
                 data_checkin=data_checkin,
-                hospedes__gte=hospedes
+                hospedes__gte=hospedes,
+                preco_por_dia__isnull=False
             )
             if bairro_2:
-                filtro_2 &= Q(imovel__bairro_id=bairro_2)
+                filtro_2 &= Q(bairro_id=bairro_2)
 
             # Calcular durações disponíveis em ambas as localizações
-            duracoes_1 = set(
-                Agendamento.objects.filter(filtro_1)
+            duracoes_1 = {
+                duracao async for duracao in Agendamento.objects.filter(filtro_1)
                 .annotate(duracao_em_dias=F('data_checkout') - F('data_checkin'))
                 .values_list('duracao_em_dias', flat=True)
-            )
+            }
 
-            duracoes_2 = set(
-                Agendamento.objects.filter(filtro_2)
+            duracoes_2 = {
+                duracao async for duracao in Agendamento.objects.filter(filtro_2)
                 .annotate(duracao_em_dias=F('data_checkout') - F('data_checkin'))
                 .values_list('duracao_em_dias', flat=True)
-            )
+            }
 
             # Converter para dias e encontrar interseção
             noites_1 = set([d.days for d in duracoes_1 if d and d.days > 0])
@@ -224,6 +250,9 @@ class HomePageView(TemplateView):
     Prepara os dados para popular os filtros do formulário de busca,
     consultando os modelos apropriados de forma otimizada.
     """
+    orcamento_consultas = 3
+    microcache = True
+    usar_replica = True
     template_name = "core/index.html"
 
     def get_context_data(self, **kwargs):
@@ -235,29 +264,33 @@ class HomePageView(TemplateView):
         return context
 
 
-class BairrosPorCidadeView(View):
+class BairrosPorCidadeView(RespostaCondicionalMixin, View):
     """
     API View para retornar uma lista de bairros em formato JSON
     para uma determinada cidade, usada para popular o dropdown de bairros
     dinamicamente via AJAX.
     """
+    orcamento_consultas = 3
+    campos_cidade = ('cidade_id',)
 
-    def get(self, request, *args, **kwargs):
+    async def get(self, request, *args, **kwargs):
         cidade_id = request.GET.get('cidade_id')
         if not cidade_id:
             return JsonResponse({'error': 'Cidade não especificada'}, status=400)
 
         bairros = Bairro.objects.filter(cidade_id=cidade_id).order_by('nome').values('id', 'nome')
-        return JsonResponse(list(bairros), safe=False)
+        return JsonResponse([bairro async for bairro in bairros], safe=False)
 
 
-class DatasDisponiveisView(View):
+class DatasDisponiveisView(RespostaCondicionalMixin, View):
     """
     API View que retorna as datas de check-in disponíveis para uma cidade
     e opcionalmente para um bairro específico.
     """
+    orcamento_consultas = 3
+    campos_cidade = ('cidade_id',)
 
-    def get(self, request, *args, **kwargs):
+    async def get(self, request, *args, **kwargs):
         cidade_id = request.GET.get('cidade_id')
         bairro_id = request.GET.get('bairro_id')
 
@@ -265,25 +298,28 @@ class DatasDisponiveisView(View):
             return JsonResponse({'error': 'Cidade não especificada'}, status=400)
 
         # Constrói o filtro baseado nos parâmetros fornecidos
-        filtro = Q(imovel__cidade_id=cidade_id, data_checkin__gte=datetime.today())
+        filtro = Q(cidade_id=cidade_id, data_checkin__gte=datetime.today(), preco_por_dia__isnull=False)
 
         if bairro_id:
-            filtro &= Q(imovel__bairro_id=bairro_id)
+            filtro &= Q(bairro_id=bairro_id)
 
-        # Busca apenas as datas de check-in distintas e futuras
+        # Busca apenas as datas de check-in distintas e futuras, com preço (índice parcial
+        # agendamento_futuro_local_*, ver apps.core.indices)
         datas = Agendamento.objects.filter(filtro).values('data_checkin').distinct().order_by('data_checkin')
 
         # Formata as datas para o frontend (YYYY-MM-DD)
-        datas_formatadas = [d['data_checkin'].strftime('%Y-%m-%d') for d in datas]
+        datas_formatadas = [d['data_checkin'].strftime('%Y-%m-%d') async for d in datas]
         return JsonResponse(datas_formatadas, safe=False)
 
 
-class HospedesDisponiveisView(View):
+class HospedesDisponiveisView(RespostaCondicionalMixin, View):
     """
     API View que retorna a quantidade de hóspedes disponíveis para uma cidade/bairro e data.
     """
+    orcamento_consultas = 3
+    campos_cidade = ('cidade_id',)
 
-    def get(self, request, *args, **kwargs):
+    async def get(self, request, *args, **kwargs):
         cidade_id = request.GET.get('cidade_id')
         bairro_id = request.GET.get('bairro_id')
         data_checkin_str = request.GET.get('data_checkin')
@@ -297,24 +333,26 @@ class HospedesDisponiveisView(View):
             return JsonResponse({'error': 'Formato de data inválido'}, status=400)
 
         # Constrói o filtro baseado nos parâmetros fornecidos
-        filtro = Q(imovel__cidade_id=cidade_id, data_checkin=data_checkin)
+        filtro = Q(cidade_id=cidade_id, data_checkin=data_checkin, preco_por_dia__isnull=False)
 
         if bairro_id:
-            filtro &= Q(imovel__bairro_id=bairro_id)
+            filtro &= Q(bairro_id=bairro_id)
 
         # Busca as quantidades de hóspedes distintas para os filtros selecionados
         hospedes = Agendamento.objects.filter(filtro).values_list('hospedes', flat=True).distinct().order_by('hospedes')
 
-        return JsonResponse(list(hospedes), safe=False)
+        return JsonResponse([h async for h in hospedes], safe=False)
 
 
-class NoitesDisponiveisView(View):
+class NoitesDisponiveisView(RespostaCondicionalMixin, View):
     """
     API View que retorna as durações de estadia (em noites) disponíveis
     baseado nos filtros anteriores.
     """
+    orcamento_consultas = 3
+    campos_cidade = ('cidade_id',)
 
-    def get(self, request, *args, **kwargs):
+    async def get(self, request, *args, **kwargs):
         cidade_id = request.GET.get('cidade_id')
         bairro_id = request.GET.get('bairro_id')
         data_checkin_str = request.GET.get('data_checkin')
@@ -329,10 +367,10 @@ class NoitesDisponiveisView(View):
             return JsonResponse({'error': 'Formato de data inválido'}, status=400)
 
         # Constrói o filtro baseado nos parâmetros fornecidos
-        filtro = Q(imovel__cidade_id=cidade_id, data_checkin=data_checkin, hospedes__gte=hospedes)
+        filtro = Q(cidade_id=cidade_id, data_checkin=data_checkin, hospedes__gte=hospedes, preco_por_dia__isnull=False)
 
         if bairro_id:
-            filtro &= Q(imovel__bairro_id=bairro_id)
+            filtro &= Q(bairro_id=bairro_id)
 
         # Filtra agendamentos com base nos parâmetros e calcula a duração da estadia
         duracoes = Agendamento.objects.filter(filtro).annotate(
@@ -340,7 +378,7 @@ class NoitesDisponiveisView(View):
         ).values_list('duracao_em_dias', flat=True).distinct()
 
         # Converte os objetos timedelta para inteiros (dias)
-        noites = sorted([d.days for d in duracoes if d and d.days > 0])
+        noites = sorted([d.days async for d in duracoes if d and d.days > 0])
         return JsonResponse(noites, safe=False)
 
 
@@ -349,38 +387,45 @@ class ResultadosBuscaView(ListView):
     template_name = 'core/resultados.html'
     context_object_name = 'resultados'
     paginate_by = 12
+    orcamento_consultas = 9
+    microcache = True
+    usar_replica = True
+    registrar_buscas = True  # Parâmetros reaproveitados pelo comando aquecer_cache
 
     def get_queryset(self):
-        # Cache key baseado nos parâmetros GET
-        cache_key = f"results_{hash(frozenset(self.request.GET.items()))}"
+        # Validar formulário antes do cache: get_context_data usa self.form também quando
+        # o queryset vem do cache
+        self.form = AgendamentoForm(self.request.GET)
+        if not self.form.is_valid():
+            return Agendamento.objects.none()
+
+        # Cache key baseado nos parâmetros GET e na versão dos dados da cidade
+        cache_key = chave_cache(
+            'results', self.request.GET.dict(), cidades_dos_parametros(self.request.GET, 'cidade')
+        )
         cached_result = cache.get(cache_key)
         if cached_result is not None:
             return cached_result
 
-        # Query base com select_related para evitar queries excessivas
+        # Query base com select_related para evitar queries excessivas (o anúncio é um por
+        # agendamento e vem no mesmo JOIN). Filtros e ordenação usam as cópias do imóvel e da
+        # avaliação em agendamento (apps.core.resumo_imovel)
         queryset = Agendamento.objects.select_related(
             'imovel',
             'imovel__bairro',
-            'imovel__cidade'
-        ).prefetch_related(
-            'anuncios',
-            'imovel__avaliacoes'
+            'imovel__cidade',
+            'anuncio'
         )
 
-        # Validar formulário
-        self.form = AgendamentoForm(self.request.GET)
-        if not self.form.is_valid():
-            return Agendamento.objects.none()
-
         data = self.form.cleaned_data
 
         # 1. FILTROS BÁSICOS
 
         # Filtro de localização
         if data.get('bairro'):
-            queryset = queryset.filter(imovel__bairro_id=data['bairro'])
+            queryset = queryset.filter(bairro_id=data['bairro'])
         elif data.get('cidade'):
-            queryset = queryset.filter(imovel__cidade_id=data['cidade'])
+            queryset = queryset.filter(cidade_id=data['cidade'])
 
         # Filtro de data
         if data.get('data_checkin'):
@@ -406,70 +451,70 @@ class ResultadosBuscaView(ListView):
         if data.get('quartos'):
             quartos_filter = int(data['quartos'])
             if quartos_filter == 5:  # 5+ quartos
-                queryset = queryset.filter(imovel__quartos__gte=5)
+                queryset = queryset.filter(quartos__gte=5)
             else:
-                queryset = queryset.filter(imovel__quartos__gte=quartos_filter)
+                queryset = queryset.filter(quartos__gte=quartos_filter)
 
         # Camas (>=)
         if data.get('camas'):
             camas_filter = int(data['camas'])
             if camas_filter == 5:  # 5+ camas
-                queryset = queryset.filter(imovel__camas__gte=5)
+                queryset = queryset.filter(camas__gte=5)
             else:
-                queryset = queryset.filter(imovel__camas__gte=camas_filter)
+                queryset = queryset.filter(camas__gte=camas_filter)
 
         #  Banheiros (>=)
         if data.get('banheiros'):
             banheiros_filter = int(data['banheiros'])
             if banheiros_filter == 3:  # 3+ banheiros
-                queryset = queryset.filter(imovel__banheiros__gte=3)
+                queryset = queryset.filter(banheiros__gte=3)
             else:
-                queryset = queryset.filter(imovel__banheiros__gte=banheiros_filter)
+                queryset = queryset.filter(banheiros__gte=banheiros_filter)
 
         # 4. FILTRO DE PREÇO
         if data.get('preco_maximo'):
-            queryset = queryset.filter(preco_por_dia__lte=data['preco_maximo'])
+            queryset = queryset.filter(preco_por_dia_centavos__lte=para_centavos(data['preco_maximo']))
 
         # 5. ORDENAÇÃO OTIMIZADA
-        # Primeiro por preço, depois por avaliação
-        queryset = queryset.order_by('preco_por_dia', '-imovel__avaliacoes__nota')
-
-        # 6. APLICAR DISTINCT para evitar possíveis duplicatas
-        queryset = queryset.distinct()
+        # Primeiro por preço, depois pela avaliação mais recente (uma por agendamento: sem
+        # o join com avaliacao não há linhas duplicadas nem DISTINCT)
+        queryset = queryset.order_by('preco_por_dia_centavos', '-nota')
 
-        # Cache por 10 minutos se a query for complexa
+        # Cache até a próxima importação se a query for complexa
         if len(self.request.GET) > 3:  # Múltiplos filtros
-            cache.set(cache_key, queryset, 600)
+            cache.set(cache_key, queryset, ttl_versionado())
 
         return queryset
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
-        # Cache para dados dos gráficos
-        chart_cache_key = f"charts_{hash(frozenset(self.request.GET.items()))}"
-        chart_data = cache.get(chart_cache_key)
+        # Obter o queryset filtrado para os gráficos
+        filtered_queryset = self.get_queryset()
 
-        if chart_data is None:
-            # Obter o queryset filtrado para os gráficos
-            filtered_queryset = self.get_queryset()
+        # Passar formulário e estatísticas básicas
+        context['form'] = self.form
+        context['total_resultados'] = filtered_queryset.count()
+        context['query_params'] = self.request.GET.urlencode()
 
-            # Passar formulário e estatísticas básicas
-            context['form'] = self.form
-            context['total_resultados'] = filtered_queryset.count()
-            context['query_params'] = self.request.GET.urlencode()
-
-            # Gerar dados dos gráficos apenas se houver resultados
-            if filtered_queryset.exists() and self.form.is_valid():
-                chart_data = self._generate_chart_data_optimized(filtered_queryset)
-                cache.set(chart_cache_key, chart_data, 600)  # Cache por 10 minutos
-            else:
-                chart_data = {
-                    'chart_data_quartos_json': json.dumps([]),
-                    'chart_data_camas_json': json.dumps([]),
-                    'chart_data_tendencia_quartos_json': json.dumps([]),
-                    'chart_data_tendencia_camas_json': json.dumps([])
-                }
+        # Gerar dados dos gráficos apenas se houver resultados
+        if context['total_resultados'] and self.form.is_valid():
+            # Cache até a próxima importação, com proteção contra recálculos simultâneos
+            chart_cache_key = chave_cache(
+                'charts', self.request.GET.dict(), cidades_dos_parametros(self.request.GET, 'cidade')
+            )
+            chart_data = obter_ou_calcular(
+                chart_cache_key, lambda: self._generate_chart_data_optimized(filtered_queryset), ttl_versionado(),
+                nome='graficos_busca'
+            )
+        else:
+            chart_data = {
+                'chart_data_quartos_json': json.dumps([]),
+                'chart_data_camas_json': json.dumps([]),
+                'chart_data_tendencia_quartos_json': json.dumps([]),
+                'chart_data_tendencia_camas_json': json.dumps([]),
+                'distribuicao_precos': None,
+            }
 
         context.update(chart_data)
         return context
@@ -482,17 +527,17 @@ class ResultadosBuscaView(ListView):
 
         # 1. Dados para gráfico de preços por quartos
         chart_data_quartos = list(
-            queryset.filter(imovel__quartos__isnull=False)
+            queryset.filter(quartos__isnull=False)
             .annotate(
                 quartos_agrupados=Case(
-                    When(imovel__quartos__gte=4, then=4),
-                    default=F('imovel__quartos'),
+                    When(quartos__gte=4, then=4),
+                    default=F('quartos'),
                     output_field=IntegerField()
                 )
             )
             .values('quartos_agrupados')
             .annotate(
-                preco_medio=Avg('preco_por_dia'),
+                **soma_e_contagem(),
                 total_propriedades=Count('imovel', distinct=True)
             )
             .order_by('quartos_agrupados')
@@ -500,22 +545,26 @@ class ResultadosBuscaView(ListView):
 
         # 2. Dados para gráfico de preços por camas
         chart_data_camas = list(
-            queryset.filter(imovel__camas__isnull=False)
+            queryset.filter(camas__isnull=False)
             .annotate(
                 camas_agrupadas=Case(
-                    When(imovel__camas__gte=4, then=4),
-                    default=F('imovel__camas'),
+                    When(camas__gte=4, then=4),
+                    default=F('camas'),
                     output_field=IntegerField()
                 )
             )
             .values('camas_agrupadas')
             .annotate(
-                preco_medio=Avg('preco_por_dia'),
+                **soma_e_contagem(),
                 total_propriedades=Count('imovel', distinct=True)
             )
             .order_by('camas_agrupadas')
         )
 
+        for item in chart_data_quartos + chart_data_camas:
+            item['preco_medio'] = media_reais(item)
+            del item['preco_soma'], item['precos']
+
         # 3. Dados de tendência mensal
         form_data = self.form.cleaned_data
         chart_data_tendencia_quartos = self._obter_tendencia_mensal_otimizada(
@@ -525,13 +574,33 @@ class ResultadosBuscaView(ListView):
             form_data, 'imovel__camas'
         )
 
+        # 4. Distribuição das diárias no local/data da busca (histogramas pré-calculados)
+        distribuicao_precos_busca = self._obter_distribuicao_precos(form_data)
+
         return {
             'chart_data_quartos_json': json.dumps(chart_data_quartos, default=str),
             'chart_data_camas_json': json.dumps(chart_data_camas, default=str),
             'chart_data_tendencia_quartos_json': json.dumps(chart_data_tendencia_quartos, default=str),
-            'chart_data_tendencia_camas_json': json.dumps(chart_data_tendencia_camas, default=str)
+            'chart_data_tendencia_camas_json': json.dumps(chart_data_tendencia_camas, default=str),
+            'distribuicao_precos': distribuicao_precos_busca,
         }
 
+    def _obter_distribuicao_precos(self, form_data):
+        """
+        Mediana, quartis e histograma das diárias de todas as acomodações do local, data,
+        hóspedes e duração buscados (sem os filtros de imóvel e preço), para referência.
+        """
+        if form_data.get('bairro'):
+            local = {'bairro_id': form_data['bairro']}
+        else:
+            local = {'cidade_id': form_data['cidade'], 'bairro__isnull': True}
+        return distribuicao_precos(
+            data_checkin=form_data['data_checkin'],
+            noites=form_data['quantidade_noites'],
+            hospedes_minimo=form_data['hospedes'],
+            **local
+        )
+
     def _obter_tendencia_mensal_otimizada(self, form_data, categoria_field):
         """
          tendência mensal.
@@ -544,28 +613,38 @@ class ResultadosBuscaView(ListView):
         mes_busca = data_checkin_usuario.month
         ano_busca = data_checkin_usuario.year
 
-        # Cache para essa query específica
-        cache_key_trend = f"trend_{ano_busca}_{mes_busca}_{hash(str(form_data))}"
-        cached_trend = cache.get(cache_key_trend)
-        if cached_trend is not None:
-            return cached_trend
+        # Cache até a próxima importação para essa query específica (a categoria faz parte da chave)
+        cache_key_trend = chave_cache(f'trend_{categoria_field}', form_data, [form_data['cidade']])
+        return obter_ou_calcular(
+            cache_key_trend,
+            lambda: self._calcular_tendencia_mensal(form_data, categoria_field, ano_busca, mes_busca),
+            ttl_versionado(), nome='tendencia_mensal'
+        )
+
+    def _calcular_tendencia_mensal(self, form_data, categoria_field, ano_busca, mes_busca):
+        """Preço médio por dia do mês e categoria, mais a linha de média geral."""
+        # Filtra pela cópia em agendamento; a chave do resultado continua 'imovel__<campo>' (usada no gráfico)
+        campo = categoria_field.removeprefix('imovel__')
 
         # Filtro base otimizado
         filtro_base = Q()
         if form_data.get('bairro'):
-            filtro_base &= Q(imovel__bairro_id=form_data['bairro'])
+            filtro_base &= Q(bairro_id=form_data['bairro'])
         elif form_data.get('cidade'):
-            filtro_base &= Q(imovel__cidade_id=form_data['cidade'])
+            filtro_base &= Q(cidade_id=form_data['cidade'])
 
         # Adicionar outros filtros essenciais
         if form_data.get('hospedes'):
             filtro_base &= Q(hospedes__gte=form_data['hospedes'])
 
-        # Filtro de data para o mês
+        # Filtro de data para o mês, como intervalo: o PostgreSQL lê só a partição do mês
+        # (com __year/__month leria o ano inteiro)
+        inicio_mes = date(ano_busca, mes_busca, 1)
+        fim_mes = date(ano_busca + mes_busca // 12, mes_busca % 12 + 1, 1)
         filtro_mensal = filtro_base & Q(
-            data_checkin__year=ano_busca,
-            data_checkin__month=mes_busca,
-            **{f'{categoria_field}__isnull': False}
+            data_checkin__gte=inicio_mes,
+            data_checkin__lt=fim_mes,
+            **{f'{campo}__isnull': False}
         )
 
         dados_raw = list(
@@ -573,14 +652,14 @@ class ResultadosBuscaView(ListView):
             .annotate(
                 dia_mes=Extract('data_checkin', 'day'),
                 categoria_agrupada=Case(
-                    When(**{f'{categoria_field}__gte': 4}, then=4),
-                    default=F(categoria_field),
+                    When(**{f'{campo}__gte': 4}, then=4),
+                    default=F(campo),
                     output_field=IntegerField()
                 )
             )
             .values('dia_mes', 'categoria_agrupada')
             .annotate(
-                preco_medio=Avg('preco_por_dia'),
+                **soma_e_contagem(),
                 total_propriedades=Count('imovel', distinct=True)
             )
             .order_by('dia_mes', 'categoria_agrupada')
@@ -595,14 +674,14 @@ class ResultadosBuscaView(ListView):
             dia = item['dia_mes']
             if dia not in media_geral_por_dia:
                 media_geral_por_dia[dia] = []
-            media_geral_por_dia[dia].append(float(item['preco_medio'] or 0))
+            media_geral_por_dia[dia].append(media_reais(item))
 
         # Adicionar dados por categoria
         for item in dados_raw:
             resultado.append({
                 'dia_mes': item['dia_mes'],
                 categoria_field: item['categoria_agrupada'],
-                'preco_medio': float(item['preco_medio'] or 0),
+                'preco_medio': media_reais(item),
                 'total_opcoes': item['total_propriedades'],
                 'is_media_geral': False
             })
@@ -613,23 +692,24 @@ class ResultadosBuscaView(ListView):
                 resultado.append({
                     'dia_mes': dia,
                     categoria_field: 'media_geral',
-                    'preco_medio': sum(precos) / len(precos),
+                    'preco_medio': round(sum(precos) / len(precos), 2),
                     'total_opcoes': len(precos),
                     'is_media_geral': True
                 })
 
-        # Cache por 30 minutos
-        cache.set(cache_key_trend, resultado, 1800)
         return resultado
 
 
-class ComparacaoDataView(View):
+class ComparacaoDataView(RespostaCondicionalMixin, View):
     """
     API View que retorna dados comparativos entre duas localizações.
     Agora usa a mesma lógica de filtros da busca principal.
     """
+    orcamento_consultas = 19
+    campos_cidade = ('cidade_1', 'cidade_2')
+    registrar_buscas = True
 
-    def get(self, request, *args, **kwargs):
+    async def get(self, request, *args, **kwargs):
         # Validar dados usando o formulário
         form = ComparacaoForm(request.GET)
 
@@ -640,57 +720,71 @@ class ComparacaoDataView(View):
             # Obter informações das localizações
             location_info = form.get_location_info()
 
-            # Construir filtros para cada localização usando a lógica corrigida
-            agendamentos_1 = self._obter_agendamentos_filtrados(
-                location_info['local_1'],
-                location_info['data_checkin'],
-                location_info['hospedes'],
-                location_info['quantidade_noites']
+            # Cache até a próxima importação, com proteção contra recálculos simultâneos; o cálculo
+            # (ORM síncrono) roda numa thread, sem bloquear as demais requisições do processo
+            cache_key = await achave_cache(
+                'comparacao', request.GET.dict(), cidades_dos_parametros(request.GET, 'cidade_1', 'cidade_2')
             )
-
-            agendamentos_2 = self._obter_agendamentos_filtrados(
-                location_info['local_2'],
-                location_info['data_checkin'],
-                location_info['hospedes'],
-                location_info['quantidade_noites']
+            resposta = await aobter_ou_calcular(
+                cache_key, lambda: self._montar_resposta(location_info), ttl_versionado(), nome='comparacao'
             )
+            return JsonResponse(resposta, safe=False)
 
-            # Obter dados para cada localização
-            dados_local_1 = self._obter_dados_localizacao_comparacao(
-                agendamentos_1,
-                location_info['local_1'],
-                location_info['hospedes'],
-                location_info['quantidade_noites']
-            )
-            dados_local_2 = self._obter_dados_localizacao_comparacao(
-                agendamentos_2,
-                location_info['local_2'],
-                location_info['hospedes'],
-                location_info['quantidade_noites']
-            )
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
 
-            # Gerar gráfico de comparação de preços na data específica
-            grafico_comparacao_data = self._gerar_grafico_comparacao_data(
-                dados_local_1, dados_local_2, location_info['data_checkin']
-            )
+    def _montar_resposta(self, location_info):
+        """Dados completos da comparação entre as duas localizações."""
+        # Construir filtros para cada localização usando a lógica corrigida
+        agendamentos_1 = self._obter_agendamentos_filtrados(
+            location_info['local_1'],
+            location_info['data_checkin'],
+            location_info['hospedes'],
+            location_info['quantidade_noites']
+        )
 
-            # Estruturar resposta
-            resposta = {
-                'local_1': dados_local_1,
-                'local_2': dados_local_2,
-                'comparacao_geral': self._gerar_comparacao_geral(dados_local_1, dados_local_2),
-                'grafico_comparacao_data': grafico_comparacao_data,
-                'parametros_busca': {
-                    'data_checkin': location_info['data_checkin'].isoformat(),
-                    'hospedes': location_info['hospedes'],
-                    'quantidade_noites': location_info['quantidade_noites']
-                }
-            }
+        agendamentos_2 = self._obter_agendamentos_filtrados(
+            location_info['local_2'],
+            location_info['data_checkin'],
+            location_info['hospedes'],
+            location_info['quantidade_noites']
+        )
 
-            return JsonResponse(resposta, safe=False)
+        # Obter dados para cada localização
+        dados_local_1 = self._obter_dados_localizacao_comparacao(
+            agendamentos_1,
+            location_info['local_1'],
+            location_info['data_checkin'],
+            location_info['hospedes'],
+            location_info['quantidade_noites']
+        )
+        dados_local_2 = self._obter_dados_localizacao_comparacao(
+            agendamentos_2,
+            location_info['local_2'],
+            location_info['data_checkin'],
+            location_info['hospedes'],
+            location_info['quantidade_noites']
+        )
 
-        except Exception as e:
-            return JsonResponse({'error': str(e)}, status=500)
+        # Gerar gráfico de comparação de preços na data específica
+        grafico_comparacao_data = self._gerar_grafico_comparacao_data(
+            dados_local_1, dados_local_2, location_info['data_checkin']
+        )
+
+        # Estruturar resposta
+        resposta = {
+            'local_1': dados_local_1,
+            'local_2': dados_local_2,
+            'comparacao_geral': self._gerar_comparacao_geral(dados_local_1, dados_local_2),
+            'grafico_comparacao_data': grafico_comparacao_data,
+            'parametros_busca': {
+                'data_checkin': location_info['data_checkin'].isoformat(),
+                'hospedes': location_info['hospedes'],
+                'quantidade_noites': location_info['quantidade_noites']
+            }
+        }
+
+        return resposta
 
     def _obter_agendamentos_filtrados(self, location_info, data_checkin, hospedes, quantidade_noites):
         """
@@ -698,16 +792,14 @@ class ComparacaoDataView(View):
         """
         # Query base
         queryset = Agendamento.objects.select_related(
-            'imovel', 'imovel__bairro', 'imovel__cidade'
-        ).prefetch_related(
-            'anuncios', 'imovel__avaliacoes'
+            'imovel', 'imovel__bairro', 'imovel__cidade', 'anuncio'
         )
 
         # Filtro por localização
         if location_info['tipo'] == 'bairro':
-            queryset = queryset.filter(imovel__bairro_id=location_info['id'])
+            queryset = queryset.filter(bairro_id=location_info['id'])
         elif location_info['tipo'] == 'cidade':
-            queryset = queryset.filter(imovel__cidade_id=location_info['cidade_id'])
+            queryset = queryset.filter(cidade_id=location_info['cidade_id'])
 
         # Filtro por data de check-in
         queryset = queryset.filter(data_checkin=data_checkin)
@@ -724,7 +816,7 @@ class ComparacaoDataView(View):
 
         return queryset
 
-    def _obter_dados_localizacao_comparacao(self, queryset, location_info, hospedes, quantidade_noites):
+    def _obter_dados_localizacao_comparacao(self, queryset, location_info, data_checkin, hospedes, quantidade_noites):
         """
         Obtém todos os dados necessários para uma localização na comparação.
         """
@@ -733,125 +825,102 @@ class ComparacaoDataView(View):
             local_obj = Cidade.objects.get(id=location_info['cidade_id'])
             nome_local = f"{local_obj.nome}, {local_obj.estado}"
         else:
-            local_obj = Bairro.objects.get(id=location_info['id'])
+            local_obj = Bairro.objects.select_related('cidade').get(id=location_info['id'])
             nome_local = f"{local_obj.nome}, {local_obj.cidade.nome}"
 
         # 1. Preços por quartos ao longo do ano
         precos_quartos_ano = self._obter_precos_ano_por_categoria(
-            location_info, 'imovel__quartos', hospedes, quantidade_noites
+            location_info, 'quartos', hospedes, quantidade_noites
         )
 
         # 2. Preços por camas ao longo do ano
         precos_camas_ano = self._obter_precos_ano_por_categoria(
-            location_info, 'imovel__camas', hospedes, quantidade_noites
+            location_info, 'camas', hospedes, quantidade_noites
         )
 
         # 3. Preços para a data específica por quartos e camas
         precos_data_quartos_raw = list(
-            queryset.filter(imovel__quartos__isnull=False)
+            queryset.filter(quartos__isnull=False)
             .annotate(
                 quartos_agrupados=Case(
-                    When(imovel__quartos__gte=4, then=4),
-                    default=F('imovel__quartos'),
+                    When(quartos__gte=4, then=4),
+                    default=F('quartos'),
                     output_field=IntegerField()
                 )
             )
             .values('quartos_agrupados')
-            .annotate(preco_medio=Avg('preco_por_dia'))
+            .annotate(**soma_e_contagem())
             .order_by('quartos_agrupados')
         )
 
         precos_data_camas_raw = list(
-            queryset.filter(imovel__camas__isnull=False)
+            queryset.filter(camas__isnull=False)
             .annotate(
                 camas_agrupadas=Case(
-                    When(imovel__camas__gte=4, then=4),
-                    default=F('imovel__camas'),
+                    When(camas__gte=4, then=4),
+                    default=F('camas'),
                     output_field=IntegerField()
                 )
             )
             .values('camas_agrupadas')
-            .annotate(preco_medio=Avg('preco_por_dia'))
+            .annotate(**soma_e_contagem())
             .order_by('camas_agrupadas')
         )
 
-        # Converter para formato JSON-safe
-        precos_data_quartos = []
-        for item in precos_data_quartos_raw:
-            precos_data_quartos.append({
-                'quartos_agrupados': item['quartos_agrupados'],
-                'preco_medio': float(item['preco_medio'] or 0)
-            })
-
-        precos_data_camas = []
-        for item in precos_data_camas_raw:
-            precos_data_camas.append({
-                'camas_agrupadas': item['camas_agrupadas'],
-                'preco_medio': float(item['preco_medio'] or 0)
-            })
+        # Médias em reais a partir da soma e da contagem em centavos
+        precos_data_quartos = [
+            {'quartos_agrupados': item['quartos_agrupados'], 'preco_medio': media_reais(item)}
+            for item in precos_data_quartos_raw
+        ]
+        precos_data_camas = [
+            {'camas_agrupadas': item['camas_agrupadas'], 'preco_medio': media_reais(item)}
+            for item in precos_data_camas_raw
+        ]
 
         # 4. Top 10 acomodações mais baratas
         acomodacoes_raw = list(
             queryset.values(
                 'imovel__id',
                 'imovel__tipo_acomodacao',
-                'imovel__quartos',
-                'imovel__camas',
-                'imovel__banheiros',
-                'anuncios__titulo',
-                'anuncios__link'
+                'quartos',
+                'camas',
+                'banheiros',
+                'anuncio__titulo',
+                'anuncio__link'
             )
             .annotate(
-                preco_medio=Avg('preco_por_dia'),
-                avaliacao_media=Avg('imovel__avaliacoes__nota'),
-                total_avaliacoes=Avg('imovel__avaliacoes__qtd_avaliacoes')
+                **soma_e_contagem(),
+                avaliacao_media=Avg(Cast('nota', FloatField())),
+                total_avaliacoes=Avg(Cast('qtd_avaliacoes', FloatField()))
             )
-            .order_by('preco_medio')[:10]
+            .order_by(F('preco_soma') / F('precos'))[:10]
         )
 
-        # Converter valores para tipos seguros para JSON
+        # Dicionários no formato esperado pelo frontend
         acomodacoes_baratas = []
         for item in acomodacoes_raw:
             acomodacao = {
                 'imovel__id': item['imovel__id'],
                 'imovel__tipo_acomodacao': item['imovel__tipo_acomodacao'],
-                'imovel__quartos': item['imovel__quartos'] or 0,
-                'imovel__camas': item['imovel__camas'] or 0,
-                'imovel__banheiros': item['imovel__banheiros'] or 0,
-                'anuncios__titulo': item['anuncios__titulo'],
-                'anuncios__link': item['anuncios__link'],
-                'preco_medio': float(item['preco_medio'] or 0),
-                'avaliacao_media': float(item['avaliacao_media']) if item['avaliacao_media'] else None,
-                'total_avaliacoes': float(item['total_avaliacoes']) if item['total_avaliacoes'] else None
+                'imovel__quartos': item['quartos'] or 0,
+                'imovel__camas': item['camas'] or 0,
+                'imovel__banheiros': item['banheiros'] or 0,
+                'anuncios__titulo': item['anuncio__titulo'],
+                'anuncios__link': item['anuncio__link'],
+                'preco_medio': media_reais(item),
+                'avaliacao_media': item['avaliacao_media'] or None,
+                'total_avaliacoes': item['total_avaliacoes'] or None
             }
             acomodacoes_baratas.append(acomodacao)
 
-        # 5. Estatísticas gerais
-        if queryset.exists():
-            estatisticas_raw = queryset.aggregate(
-                preco_medio_geral=Avg('preco_por_dia'),
-                preco_minimo=Min('preco_por_dia'),
-                preco_maximo=Max('preco_por_dia'),
-                total_propriedades=Count('imovel', distinct=True),
-                total_agendamentos=Count('id')
-            )
+        # 5. Estatísticas gerais (pré-calculadas em estatistica_local)
+        estatisticas = estatisticas_local(location_info, data_checkin, hospedes, quantidade_noites)
 
-            # Garantir que todos os valores sejam convertidos para float ou int
-            estatisticas = {
-                'preco_medio_geral': float(estatisticas_raw['preco_medio_geral'] or 0),
-                'preco_minimo': float(estatisticas_raw['preco_minimo'] or 0),
-                'preco_maximo': float(estatisticas_raw['preco_maximo'] or 0),
-                'total_propriedades': int(estatisticas_raw['total_propriedades'] or 0),
-                'total_agendamentos': int(estatisticas_raw['total_agendamentos'] or 0)
-            }
-        else:
-            estatisticas = {
-                'preco_medio_geral': 0.0,
-                'preco_minimo': 0.0,
-                'preco_maximo': 0.0,
-                'total_propriedades': 0,
-                'total_agendamentos': 0
-            }
+        # 6. Distribuição das diárias nos próximos 12 meses (somada dos histogramas pré-calculados)
+        distribuicao_ano = distribuicao_precos(
+            data_checkin__range=(date.today(), date.today() + timedelta(days=365)),
+            noites=quantidade_noites, hospedes_minimo=hospedes, **filtro_local(location_info)
+        )
 
         return {
             'nome': nome_local,
@@ -862,7 +931,8 @@ class ComparacaoDataView(View):
             'precos_data_quartos': precos_data_quartos,
             'precos_data_camas': precos_data_camas,
             'acomodacoes_baratas': acomodacoes_baratas,
-            'estatisticas': estatisticas
+            'estatisticas': estatisticas,
+            'distribuicao_ano': distribuicao_ano
         }
 
     def _obter_precos_ano_por_categoria(self, location_info, categoria_field, hospedes, quantidade_noites):
@@ -877,9 +947,9 @@ class ComparacaoDataView(View):
 
         # Adicionar filtro de localização
         if location_info['tipo'] == 'cidade':
-            filtro_ano &= Q(imovel__cidade_id=location_info['cidade_id'])
+            filtro_ano &= Q(cidade_id=location_info['cidade_id'])
         else:
-            filtro_ano &= Q(imovel__bairro_id=location_info['id'])
+            filtro_ano &= Q(bairro_id=location_info['id'])
 
         # Filtrar valores nulos da categoria
         filtro_ano &= Q(**{f'{categoria_field}__isnull': False})
@@ -897,21 +967,19 @@ class ComparacaoDataView(View):
                 output_field=IntegerField()
             )
         ).values('mes', 'categoria_agrupada').annotate(
-            preco_medio=Avg('preco_por_dia'),
+            **soma_e_contagem(),
             total_propriedades=Count('imovel', distinct=True)
         ).order_by('mes', 'categoria_agrupada')
 
-        # Converter para formato JSON-safe
-        dados = []
-        for item in dados_raw:
-            dados.append({
+        return [
+            {
                 'mes': item['mes'],
                 'categoria_agrupada': item['categoria_agrupada'],
-                'preco_medio': float(item['preco_medio'] or 0),
-                'total_propriedades': int(item['total_propriedades'] or 0)
-            })
-
-        return dados
+                'preco_medio': media_reais(item),
+                'total_propriedades': item['total_propriedades'] or 0
+            }
+            for item in dados_raw
+        ]
 
     def _gerar_grafico_comparacao_data(self, dados_1, dados_2, data_checkin):
         """Gera dados para o gráfico de comparação de preços na data específica."""
@@ -980,6 +1048,10 @@ class ComparacaoDataView(View):
 
 class PlanejadorFeriasView(TemplateView):
     """View principal para o planejador de férias."""
+    orcamento_consultas = 4
+    microcache = True
+    usar_replica = True
+    registrar_buscas = True
     template_name = "core/planejador_ferias.html"
 
     def get_context_data(self, **kwargs):
@@ -989,53 +1061,46 @@ class PlanejadorFeriasView(TemplateView):
         return context
 
     def _obter_estatisticas_rapidas_cache(self):
-        """Obtém estatísticas com cache de 1 hora."""
-        cache_key = 'vacation_quick_stats'
-        stats = cache.get(cache_key)
-
-        if stats is None:
-            hoje = date.today()
-            proximos_30_dias = hoje + timedelta(days=30)
-
-            # Query com agregação direta
-            stats_raw = Agendamento.objects.filter(
-                data_checkin__gte=hoje,
-                data_checkin__lte=proximos_30_dias
-            ).aggregate(
-                preco_medio_dia=Avg('preco_por_dia'),
-                preco_minimo_dia=Min('preco_por_dia'),
-                preco_maximo_dia=Max('preco_por_dia'),
-                total_opcoes=Count('id'),
-                total_cidades=Count('imovel__cidade', distinct=True)
-            )
-
-            if stats_raw['preco_medio_dia']:
-                stats = {
-                    'preco_medio_dia': round(float(stats_raw['preco_medio_dia']), 2),
-                    'preco_minimo_dia': round(float(stats_raw['preco_minimo_dia']), 2),
-                    'preco_maximo_dia': round(float(stats_raw['preco_maximo_dia']), 2),
-                    'total_opcoes': stats_raw['total_opcoes'],
-                    'total_cidades': stats_raw['total_cidades'],
-                    'orcamento_sugerido_3_noites': round(float(stats_raw['preco_medio_dia']) * 3, 2),
-                    'orcamento_sugerido_7_noites': round(float(stats_raw['preco_medio_dia']) * 7, 2),
-                }
-            else:
-                stats = {
-                    'preco_medio_dia': 0, 'preco_minimo_dia': 0, 'preco_maximo_dia': 0,
-                    'total_opcoes': 0, 'total_cidades': 0,
-                    'orcamento_sugerido_3_noites': 0, 'orcamento_sugerido_7_noites': 0,
-                }
+        """Obtém estatísticas com cache até a próxima importação, com proteção contra recálculos simultâneos."""
+        return obter_ou_calcular(
+            chave_cache('vacation_quick_stats', {}), self._calcular_estatisticas_rapidas, ttl_versionado(),
+            nome='estatisticas_planejador'
+        )
 
-            # Cache por 1 hora
-            cache.set(cache_key, stats, 3600)
+    def _calcular_estatisticas_rapidas(self):
+        hoje = date.today()
+        proximos_30_dias = hoje + timedelta(days=30)
+
+        # Resumo das estatísticas pré-calculadas (não consulta agendamento)
+        stats_raw = estatisticas_periodo(hoje, proximos_30_dias)
+
+        if stats_raw['preco_medio_dia']:
+            stats = {
+                'preco_medio_dia': stats_raw['preco_medio_dia'],
+                'preco_mediano_dia': stats_raw['preco_mediano_dia'],
+                'preco_minimo_dia': stats_raw['preco_minimo_dia'],
+                'preco_maximo_dia': stats_raw['preco_maximo_dia'],
+                'total_opcoes': stats_raw['total_opcoes'],
+                'total_cidades': stats_raw['total_cidades'],
+                'orcamento_sugerido_3_noites': round(stats_raw['preco_medio_dia'] * 3, 2),
+                'orcamento_sugerido_7_noites': round(stats_raw['preco_medio_dia'] * 7, 2),
+            }
+        else:
+            stats = {
+                'preco_medio_dia': 0, 'preco_mediano_dia': 0, 'preco_minimo_dia': 0, 'preco_maximo_dia': 0,
+                'total_opcoes': 0, 'total_cidades': 0,
+                'orcamento_sugerido_3_noites': 0, 'orcamento_sugerido_7_noites': 0,
+            }
 
         return stats
 
 
-class PlanejadorFeriasResultadosView(View):
+class PlanejadorFeriasResultadosView(RespostaCondicionalMixin, View):
     """API View para busca de férias."""
+    orcamento_consultas = 6
+    registrar_buscas = True
 
-    def get(self, request, *args, **kwargs):
+    async def get(self, request, *args, **kwargs):
         form = PlanejadorFeriasForm(request.GET)
 
         if not form.is_valid():
@@ -1044,142 +1109,171 @@ class PlanejadorFeriasResultadosView(View):
         try:
             criterios = form.get_search_criteria()
 
-            # Busca em etapas para reduzir carga
-            opcoes_viagem = self._buscar_opcoes_otimizado(criterios)
-
-            if not opcoes_viagem:
-                return JsonResponse({
-                    'success': True,
-                    'total_opcoes': 0,
-                    'resultados_por_cidade': [],
-                    'estatisticas': self._stats_vazias(),
-                    'sugestoes': [{'tipo': 'sem_resultados', 'titulo': 'Nenhuma opção encontrada',
-                                   'descricao': 'Tente aumentar seu orçamento ou período.', 'acao': 'Ajustar'}]
-                })
+            # Cache até a próxima importação, com proteção contra recálculos simultâneos
+            cache_key = await achave_cache('planejador', request.GET.dict())
+            resposta = await aobter_ou_calcular(
+                cache_key, lambda: self._montar_resposta(criterios), ttl_versionado(), nome='planejador'
+            )
+            return JsonResponse(resposta, safe=False)
 
-            # Organizar e processar apenas o necessário
-            resultados_organizados = self._organizar_resultados_otimizado(opcoes_viagem)
-            estatisticas = self._gerar_estatisticas_rapidas(opcoes_viagem, criterios)
-            sugestoes = self._gerar_sugestoes_rapidas(opcoes_viagem, criterios)
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
+
+    def _montar_resposta(self, criterios):
+        """Opções de viagem organizadas por cidade, estatísticas e sugestões."""
+        # Busca em etapas para reduzir carga
+        opcoes_viagem = self._buscar_opcoes_otimizado(criterios)
 
-            return JsonResponse({
+        if not opcoes_viagem:
+            return {
                 'success': True,
-                'criterios_busca': self._serializar_criterios(criterios),
-                'total_opcoes': len(opcoes_viagem),
-                'resultados_por_cidade': resultados_organizados,
-                'estatisticas': estatisticas,
-                'sugestoes': sugestoes,
-            }, safe=False)
+                'total_opcoes': 0,
+                'resultados_por_cidade': [],
+                'estatisticas': self._stats_vazias(),
+                'sugestoes': [{'tipo': 'sem_resultados', 'titulo': 'Nenhuma opção encontrada',
+                               'descricao': 'Tente aumentar seu orçamento ou período.', 'acao': 'Ajustar'}]
+            }
 
-        except Exception as e:
-            return JsonResponse({'error': str(e)}, status=500)
+        # Organizar e processar apenas o necessário
+        resultados_organizados = self._organizar_resultados_otimizado(opcoes_viagem)
+        estatisticas = self._gerar_estatisticas_rapidas(opcoes_viagem, criterios)
+        sugestoes = self._gerar_sugestoes_rapidas(opcoes_viagem, criterios)
+        distribuicao_mercado = self._obter_distribuicao_mercado(criterios)
 
-    def _buscar_opcoes_otimizado(self, criterios):
-        """Busca com filtros em ordem de seletividade."""
+        return {
+            'success': True,
+            'criterios_busca': self._serializar_criterios(criterios),
+            'total_opcoes': len(opcoes_viagem),
+            'resultados_por_cidade': resultados_organizados,
+            'estatisticas': estatisticas,
+            'distribuicao_mercado': distribuicao_mercado,
+            'sugestoes': sugestoes,
+        }
 
-        # ETAPA 1: Filtros mais seletivos primeiro
-        preco_maximo_por_dia = float(criterios['orcamento_total']) / criterios['quantidade_noites']
+    def _buscar_opcoes_otimizado(self, criterios):
+        """
+        Busca com filtros em ordem de seletividade. Os preços são lidos e calculados em centavos
+        inteiros (apps.core.centavos) e convertidos para reais só no dicionário de saída.
+        """
+        noites = criterios['quantidade_noites']
+        orcamento_centavos = para_centavos(criterios['orcamento_total'])
 
-        # Query base
-        base_query = Agendamento.objects.select_related(
-            'imovel__cidade', 'imovel__bairro'
-        ).filter(
-            # Filtros seletivos
-            preco_por_dia__lte=preco_maximo_por_dia,
+        # ETAPA 1: Filtros mais seletivos primeiro. Com a diária limitada à divisão inteira do
+        # orçamento pelas noites, o total de todas as opções cabe no orçamento
+        base_query = Agendamento.objects.filter(
+            preco_por_dia_centavos__lte=orcamento_centavos // noites,
             data_checkin__gte=criterios['data_inicio_busca'],
             data_checkin__lte=criterios['data_fim_busca'],
             hospedes__gte=criterios['hospedes']
         ).annotate(
             duracao_noites=F('data_checkout') - F('data_checkin')
         ).filter(
-            duracao_noites=timedelta(days=criterios['quantidade_noites'])
+            duracao_noites=timedelta(days=noites)
         )
 
         # ETAPA 2: Filtros opcionais
         if criterios.get('quartos_minimo'):
-            base_query = base_query.filter(imovel__quartos__gte=criterios['quartos_minimo'])
+            base_query = base_query.filter(quartos__gte=criterios['quartos_minimo'])
 
         if criterios.get('camas_minimo'):
-            base_query = base_query.filter(imovel__camas__gte=criterios['camas_minimo'])
+            base_query = base_query.filter(camas__gte=criterios['camas_minimo'])
 
-        # ETAPA 3: Ordenar por economia e limitar resultados iniciais
-        base_query = base_query.order_by('preco_por_dia')[:2000]  # Limitado para performance
+        # ETAPA 3: Ordenar por economia e limitar resultados iniciais. Só as colunas usadas, como
+        # dicionários: cidade e bairro pelas cópias em agendamento e a nota como float, sem
+        # instanciar modelos nem construir Decimal por linha
+        base_query = base_query.annotate(nota_avaliacao=Cast('nota', FloatField())).values(
+            'id', 'imovel_id', 'data_checkin', 'hospedes', 'preco_por_dia_centavos', 'quartos', 'camas',
+            'banheiros', 'nota_avaliacao', 'qtd_avaliacoes', 'cidade_id', 'cidade__nome', 'cidade__estado',
+            'bairro_id', 'bairro__nome',
+        ).order_by('preco_por_dia_centavos')[:2000]  # Limitado para performance
 
         # ETAPA 4: Processar filtro de fim de semana apenas se necessário
         if criterios['inclui_fim_de_semana']:
-            agendamentos_fds = []
-            for agendamento in base_query:
-                data_checkout = agendamento.data_checkin + timedelta(days=criterios['quantidade_noites'])
-                if self._inclui_fim_de_semana_rapido(agendamento.data_checkin, data_checkout):
-                    agendamentos_fds.append(agendamento)
-            agendamentos_finais = agendamentos_fds
+            agendamentos_finais = [
+                agendamento for agendamento in base_query
+                if self._inclui_fim_de_semana_rapido(
+                    agendamento['data_checkin'], agendamento['data_checkin'] + timedelta(days=noites)
+                )
+            ]
         else:
             agendamentos_finais = list(base_query)
 
-        # ETAPA 5: Processar opções (limitado a 1000 para performance)
-        opcoes = []
-
-        # Coletar IDs dos agendamentos para busca em lote dos anúncios
-        agendamento_ids = [ag.id for ag in agendamentos_finais[:1000]]
-
-        # Buscar anúncios em uma única query usando prefetch em lote
-        anuncios_dict = {}
-        if agendamento_ids:
+        # ETAPA 5: Processar opções (limitado a 1000 para performance). Anúncios e tipos de
+        # acomodação só das opções devolvidas, em lote: no JOIN da consulta principal seriam
+        # lidos para todas as candidatas antes do LIMIT
+        agendamentos_finais = agendamentos_finais[:1000]
+        anuncios = {}
+        tipos = {}
+        if agendamentos_finais:
             from apps.anuncios.models import Anuncio
-            anuncios_queryset = Anuncio.objects.filter(
-                agendamento_id__in=agendamento_ids
-            ).select_related('agendamento')
-
-            for anuncio in anuncios_queryset:
-                anuncios_dict[anuncio.agendamento_id] = anuncio
-
-        for agendamento in agendamentos_finais[:1000]:
-            preco_total = float(agendamento.preco_por_dia) * criterios['quantidade_noites']
-
-            if preco_total <= float(criterios['orcamento_total']):
-                data_checkout = agendamento.data_checkin + timedelta(days=criterios['quantidade_noites'])
-
-                # Buscar anúncio do dicionário pré-carregado
-                anuncio = anuncios_dict.get(agendamento.id)
-
-                opcao = {
-                    'cidade_nome': agendamento.imovel.cidade.nome,
-                    'cidade_estado': agendamento.imovel.cidade.estado,
-                    'cidade_id': agendamento.imovel.cidade.id,
-                    'bairro_nome': agendamento.imovel.bairro.nome,
-                    'bairro_id': agendamento.imovel.bairro.id,
-                    'data_checkin': agendamento.data_checkin.isoformat(),
-                    'data_checkout': data_checkout.isoformat(),
-                    'preco_total': preco_total,
-                    'economia': float(criterios['orcamento_total']) - preco_total,
-                    'preco_por_dia': float(agendamento.preco_por_dia),
-                    'hospedes': agendamento.hospedes,
-                    'inclui_fim_de_semana': criterios['inclui_fim_de_semana'] if criterios[
-                        'inclui_fim_de_semana'] else self._inclui_fim_de_semana_rapido(agendamento.data_checkin,
-                                                                                       data_checkout),
-                    'tipo_acomodacao': agendamento.imovel.tipo_acomodacao or 'Acomodação',
-                    # Dados básicos do imóvel
-                    'imovel': {
-                        'quartos': agendamento.imovel.quartos or 0,
-                        'camas': agendamento.imovel.camas or 0,
-                        'banheiros': agendamento.imovel.banheiros or 0,
-                        'tipo_acomodacao': agendamento.imovel.tipo_acomodacao or 'N/A',
-                    },
-                    # Dados do anúncio sem queries adicionais
-                    'anuncio': {
-                        'titulo': anuncio.titulo if anuncio else (agendamento.imovel.tipo_acomodacao or 'Acomodação'),
-                        'link': anuncio.link if anuncio and anuncio.link else None
-                    }
-                }
-
-                # LAZY LOADING: Carregar avaliação apenas quando necessário (comentado para performance)
-                # Pode ser ativado se necessário, mas adiciona queries
-                opcao['avaliacao'] = {'nota': None, 'quantidade': 0}
+            anuncios = {
+                agendamento_id: (titulo, link)
+                for agendamento_id, titulo, link in Anuncio.objects.filter(
+                    agendamento_id__in=[agendamento['id'] for agendamento in agendamentos_finais]
+                ).values_list('agendamento_id', 'titulo', 'link')
+            }
+            tipos = dict(Imovel.objects.filter(
+                id__in={agendamento['imovel_id'] for agendamento in agendamentos_finais}
+            ).values_list('id', 'tipo_acomodacao'))
 
-                opcoes.append(opcao)
+        opcoes = []
+        for agendamento in agendamentos_finais:
+            preco_total_centavos = agendamento['preco_por_dia_centavos'] * noites
+            economia_centavos = orcamento_centavos - preco_total_centavos
+            data_checkout = agendamento['data_checkin'] + timedelta(days=noites)
+            tipo_acomodacao = tipos.get(agendamento['imovel_id'])
+            titulo, link = anuncios.get(agendamento['id'], (None, None))
+
+            opcoes.append({
+                'cidade_nome': agendamento['cidade__nome'],
+                'cidade_estado': agendamento['cidade__estado'],
+                'cidade_id': agendamento['cidade_id'],
+                'bairro_nome': agendamento['bairro__nome'],
+                'bairro_id': agendamento['bairro_id'],
+                'data_checkin': agendamento['data_checkin'].isoformat(),
+                'data_checkout': data_checkout.isoformat(),
+                'preco_total': preco_total_centavos / 100,
+                'preco_total_centavos': preco_total_centavos,
+                'economia': economia_centavos / 100,
+                'economia_centavos': economia_centavos,
+                'preco_por_dia': agendamento['preco_por_dia_centavos'] / 100,
+                'hospedes': agendamento['hospedes'],
+                'inclui_fim_de_semana': criterios['inclui_fim_de_semana'] or self._inclui_fim_de_semana_rapido(
+                    agendamento['data_checkin'], data_checkout
+                ),
+                'tipo_acomodacao': tipo_acomodacao or 'Acomodação',
+                # Dados básicos do imóvel
+                'imovel': {
+                    'quartos': agendamento['quartos'] or 0,
+                    'camas': agendamento['camas'] or 0,
+                    'banheiros': agendamento['banheiros'] or 0,
+                    'tipo_acomodacao': tipo_acomodacao or 'N/A',
+                },
+                'anuncio': {
+                    'titulo': titulo or tipo_acomodacao or 'Acomodação',
+                    'link': link or None
+                },
+                # Avaliação mais recente, copiada no próprio agendamento (sem consultas extras)
+                'avaliacao': {
+                    'nota': agendamento['nota_avaliacao'],
+                    'quantidade': agendamento['qtd_avaliacoes'] or 0,
+                },
+            })
 
         return opcoes
 
+    def _obter_distribuicao_mercado(self, criterios):
+        """
+        Distribuição das diárias de todas as cidades no período e condições da busca,
+        independente do orçamento, para situar as opções encontradas no mercado.
+        """
+        return distribuicao_precos(
+            bairro__isnull=True,
+            data_checkin__range=(criterios['data_inicio_busca'], criterios['data_fim_busca']),
+            noites=criterios['quantidade_noites'],
+            hospedes_minimo=criterios['hospedes'],
+        )
+
     def _inclui_fim_de_semana_rapido(self, data_inicio, data_fim):
         """Verificação rápida de fim de semana."""
         if (data_fim - data_inicio).days < 2:
@@ -1236,9 +1330,9 @@ class PlanejadorFeriasResultadosView(View):
                     'bairro_id': opcao['bairro_id']
                 })
 
-            # Adicionar aos dados de agregação
-            preco = opcao['preco_total']
-            economia = opcao['economia']
+            # Adicionar aos dados de agregação (centavos)
+            preco = opcao['preco_total_centavos']
+            economia = opcao['economia_centavos']
 
             cidade['precos'].append(preco)
             cidade['economias'].append(economia)
@@ -1258,9 +1352,9 @@ class PlanejadorFeriasResultadosView(View):
                 'estado': cidade_data['estado'],
                 'cidade_id': cidade_data['cidade_id'],
                 'total_opcoes': len(precos_cidade),
-                'preco_medio': sum(precos_cidade) / len(precos_cidade) if precos_cidade else 0,
-                'preco_minimo': min(precos_cidade) if precos_cidade else 0,
-                'economia_media': sum(economias_cidade) / len(economias_cidade) if economias_cidade else 0,
+                'preco_medio': reais(sum(precos_cidade) / len(precos_cidade)) if precos_cidade else 0,
+                'preco_minimo': reais(min(precos_cidade)) if precos_cidade else 0,
+                'economia_media': reais(sum(economias_cidade) / len(economias_cidade)) if economias_cidade else 0,
                 'bairros': {}
             }
 
@@ -1271,15 +1365,15 @@ class PlanejadorFeriasResultadosView(View):
                 opcoes_bairro = bairro_data['opcoes']
 
                 # Ordenar por economia e manter top 3 para performance
-                opcoes_bairro.sort(key=lambda x: x['economia'], reverse=True)
+                opcoes_bairro.sort(key=lambda x: x['economia_centavos'], reverse=True)
 
                 cidade_final['bairros'][bairro_data['bairro_nome']] = {
                     'bairro_nome': bairro_data['bairro_nome'],
                     'bairro_id': bairro_data['bairro_id'],
                     'total_opcoes': len(opcoes_bairro),
-                    'preco_medio': sum(precos_bairro) / len(precos_bairro) if precos_bairro else 0,
-                    'preco_minimo': min(precos_bairro) if precos_bairro else 0,
-                    'economia_media': sum(economias_bairro) / len(economias_bairro) if economias_bairro else 0,
+                    'preco_medio': reais(sum(precos_bairro) / len(precos_bairro)) if precos_bairro else 0,
+                    'preco_minimo': reais(min(precos_bairro)) if precos_bairro else 0,
+                    'economia_media': reais(sum(economias_bairro) / len(economias_bairro)) if economias_bairro else 0,
                     'opcoes': opcoes_bairro[:3]  # Top 3 por bairro para performance
                 }
 
@@ -1294,9 +1388,9 @@ class PlanejadorFeriasResultadosView(View):
         if not opcoes:
             return self._stats_vazias()
 
-        # Cálculos em vetores para performance
-        precos = [o['preco_total'] for o in opcoes]
-        economias = [o['economia'] for o in opcoes]
+        # Cálculos em centavos
+        precos = [o['preco_total_centavos'] for o in opcoes]
+        economias = [o['economia_centavos'] for o in opcoes]
 
         # Sets para contagem única
         cidades_unicas = {o['cidade_nome'] for o in opcoes}
@@ -1307,15 +1401,15 @@ class PlanejadorFeriasResultadosView(View):
 
         preco_medio = sum(precos) / len(precos)
         economia_media = sum(economias) / len(economias)
-        percentual_usado = (preco_medio / float(criterios['orcamento_total'])) * 100
+        percentual_usado = (preco_medio / para_centavos(criterios['orcamento_total'])) * 100
 
         return {
             'total_opcoes': len(opcoes),
             'total_cidades': len(cidades_unicas),
             'total_bairros': len(bairros_unicos),
-            'economia_media': round(economia_media, 2),
-            'economia_maxima': round(max(economias), 2),
-            'preco_medio': round(preco_medio, 2),
+            'economia_media': reais(economia_media),
+            'economia_maxima': reais(max(economias)),
+            'preco_medio': reais(preco_medio),
             'opcoes_com_fim_de_semana': opcoes_fds,
             'percentual_orcamento_usado': round(percentual_usado, 1)
         }
@@ -1327,7 +1421,7 @@ class PlanejadorFeriasResultadosView(View):
                      'descricao': 'Tente aumentar seu orçamento ou período.', 'acao': 'Ajustar'}]
 
         sugestoes = []
-        economia_media = sum(o['economia'] for o in opcoes) / len(opcoes)
+        economia_media = reais(sum(o['economia_centavos'] for o in opcoes) / len(opcoes))
 
         if economia_media > 100:
             sugestoes.append({
@@ -1350,7 +1444,7 @@ class PlanejadorFeriasResultadosView(View):
         sample_opcoes = opcoes[:50]
         cidades_economia = defaultdict(list)
         for opcao in sample_opcoes:
-            cidades_economia[opcao['cidade_nome']].append(opcao['economia'])
+            cidades_economia[opcao['cidade_nome']].append(opcao['economia_centavos'])
 
         if cidades_economia:
             melhor_cidade = max(cidades_economia.items(),
@@ -1387,6 +1481,9 @@ class PlanejadorFeriasResultadosView(View):
 
 class HomePageView(TemplateView):
     """View para a página inicial."""
+    orcamento_consultas = 3
+    microcache = True
+    usar_replica = True
     template_name = "core/index.html"
 
     def get_context_data(self, **kwargs):
@@ -1396,42 +1493,48 @@ class HomePageView(TemplateView):
         return context
 
 
-class BairrosPorCidadeView(View):
+class BairrosPorCidadeView(RespostaCondicionalMixin, View):
     """API View para retornar uma lista de bairros por cidade."""
+    orcamento_consultas = 3
+    campos_cidade = ('cidade_id',)
 
-    def get(self, request, *args, **kwargs):
+    async def get(self, request, *args, **kwargs):
         cidade_id = request.GET.get('cidade_id')
         if not cidade_id:
             return JsonResponse({'error': 'Cidade não especificada'}, status=400)
 
         bairros = Bairro.objects.filter(cidade_id=cidade_id).order_by('nome').values('id', 'nome')
-        return JsonResponse(list(bairros), safe=False)
+        return JsonResponse([bairro async for bairro in bairros], safe=False)
 
 
-class DatasDisponiveisView(View):
+class DatasDisponiveisView(RespostaCondicionalMixin, View):
     """API View que retorna as datas de check-in disponíveis."""
+    orcamento_consultas = 3
+    campos_cidade = ('cidade_id',)
 
-    def get(self, request, *args, **kwargs):
+    async def get(self, request, *args, **kwargs):
         cidade_id = request.GET.get('cidade_id')
         bairro_id = request.GET.get('bairro_id')
 
         if not cidade_id:
             return JsonResponse({'error': 'Cidade não especificada'}, status=400)
 
-        filtro = Q(imovel__cidade_id=cidade_id, data_checkin__gte=datetime.today())
+        filtro = Q(cidade_id=cidade_id, data_checkin__gte=datetime.today(), preco_por_dia__isnull=False)
 
         if bairro_id:
-            filtro &= Q(imovel__bairro_id=bairro_id)
+            filtro &= Q(bairro_id=bairro_id)
 
         datas = Agendamento.objects.filter(filtro).values('data_checkin').distinct().order_by('data_checkin')
-        datas_formatadas = [d['data_checkin'].strftime('%Y-%m-%d') for d in datas]
+        datas_formatadas = [d['data_checkin'].strftime('%Y-%m-%d') async for d in datas]
         return JsonResponse(datas_formatadas, safe=False)
 
 
-class HospedesDisponiveisView(View):
+class HospedesDisponiveisView(RespostaCondicionalMixin, View):
     """API View que retorna a quantidade de hóspedes disponíveis."""
+    orcamento_consultas = 3
+    campos_cidade = ('cidade_id',)
 
-    def get(self, request, *args, **kwargs):
+    async def get(self, request, *args, **kwargs):
         cidade_id = request.GET.get('cidade_id')
         bairro_id = request.GET.get('bairro_id')
         data_checkin_str = request.GET.get('data_checkin')
@@ -1444,19 +1547,21 @@ class HospedesDisponiveisView(View):
         except ValueError:
             return JsonResponse({'error': 'Formato de data inválido'}, status=400)
 
-        filtro = Q(imovel__cidade_id=cidade_id, data_checkin=data_checkin)
+        filtro = Q(cidade_id=cidade_id, data_checkin=data_checkin, preco_por_dia__isnull=False)
 
         if bairro_id:
-            filtro &= Q(imovel__bairro_id=bairro_id)
+            filtro &= Q(bairro_id=bairro_id)
 
         hospedes = Agendamento.objects.filter(filtro).values_list('hospedes', flat=True).distinct().order_by('hospedes')
-        return JsonResponse(list(hospedes), safe=False)
+        return JsonResponse([h async for h in hospedes], safe=False)
 
 
-class NoitesDisponiveisView(View):
+class NoitesDisponiveisView(RespostaCondicionalMixin, View):
     """API View que retorna as durações de estadia disponíveis."""
+    orcamento_consultas = 3
+    campos_cidade = ('cidade_id',)
 
-    def get(self, request, *args, **kwargs):
+    async def get(self, request, *args, **kwargs):
         cidade_id = request.GET.get('cidade_id')
         bairro_id = request.GET.get('bairro_id')
         data_checkin_str = request.GET.get('data_checkin')
@@ -1470,15 +1575,52 @@ class NoitesDisponiveisView(View):
         except ValueError:
             return JsonResponse({'error': 'Formato de data inválido'}, status=400)
 
-        filtro = Q(imovel__cidade_id=cidade_id, data_checkin=data_checkin, hospedes__gte=hospedes)
+        filtro = Q(cidade_id=cidade_id, data_checkin=data_checkin, hospedes__gte=hospedes, preco_por_dia__isnull=False)
 
         if bairro_id:
-            filtro &= Q(imovel__bairro_id=bairro_id)
+            filtro &= Q(bairro_id=bairro_id)
 
         duracoes = Agendamento.objects.filter(filtro).annotate(
             duracao_em_dias=F('data_checkout') - F('data_checkin')
         ).values_list('duracao_em_dias', flat=True).distinct()
 
-        noites = sorted([d.days for d in duracoes if d and d.days > 0])
+        noites = sorted([d.days async for d in duracoes if d and d.days > 0])
         return JsonResponse(noites, safe=False)
 
+
+class HistoricoPrecosView(RespostaCondicionalMixin, View):
+    """
+    API View com a evolução da diária ao longo das coletas, para um agendamento
+    (`agendamento_id`), um imóvel (`imovel_id`) ou uma localização (`cidade_id`, `bairro_id`).
+    Filtros opcionais: data_checkin, noites, hospedes; período das coletas: desde, ate.
+    """
+    orcamento_consultas = 3
+    campos_cidade = ('cidade_id',)
+
+    async def get(self, request, *args, **kwargs):
+        try:
+            inteiros = {
+                campo: int(request.GET[campo])
+                for campo in ('agendamento_id', 'imovel_id', 'cidade_id', 'bairro_id', 'noites', 'hospedes')
+                if request.GET.get(campo)
+            }
+            datas = {
+                campo: datetime.strptime(request.GET[campo], '%Y-%m-%d').date()
+                for campo in ('data_checkin', 'desde', 'ate')
+                if request.GET.get(campo)
+            }
+            desde, ate = intervalo_coletas(datas.pop('desde', None), datas.pop('ate', None))
+        except ValueError as e:
+            return JsonResponse({'error': f'Parâmetros inválidos: {e}'}, status=400)
+
+        if not any(campo in inteiros for campo in ('agendamento_id', 'imovel_id', 'cidade_id')):
+            return JsonResponse({'error': 'Informe agendamento_id, imovel_id ou cidade_id'}, status=400)
+
+        cache_key = await achave_cache(
+            'historico_precos', request.GET.dict(), cidades_dos_parametros(request.GET, 'cidade_id')
+        )
+        resposta = await aobter_ou_calcular(
+            cache_key, lambda: evolucao_precos(desde, ate, **inteiros, **datas), ttl_versionado(),
+            nome='historico_precos'
+        )
+        return JsonResponse(resposta)
@@ -33,4 +33,8 @@ class Imovel(models.Model):
             models.Index(fields=['cidade', 'bairro']),
             models.Index(fields=['quartos']),
             models.Index(fields=['camas']),
+        ]
+        constraints = [
+            # ID do quarto no Airbnb: a importação faz upsert por ele
+            models.UniqueConstraint(fields=['id_imovel'], name='imovel_id_imovel_unico'),
         ]
\ No newline at end of file
@@ -22,4 +22,7 @@ class Bairro(models.Model):
     class Meta:
         db_table = 'bairro'
         verbose_name = "Bairro"
-        verbose_name_plural = "Bairros"
\ No newline at end of file
+        verbose_name_plural = "Bairros"
+        constraints = [
+            models.UniqueConstraint(fields=['cidade', 'nome'], name='bairro_cidade_nome_unico'),
+        ]
\ No newline at end of file
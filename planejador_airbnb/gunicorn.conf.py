@@ -0,0 +1,65 @@
+"""
+Configuração do gunicorn em produção (carregada pelo Dockerfile com `-c gunicorn.conf.py`).
+
+Todos os valores podem ser ajustados por variáveis de ambiente, sem reconstruir a imagem.
+O cache padrão fica na memória de cada worker: com vários workers, cada um aquece o seu
+(com CACHE_BACKEND=redis ou memcached, todos usam o mesmo).
+"""
+import multiprocessing
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+
+# ASGI com as views assíncronas; com 'sync' ou 'gthread' use planejador_airbnb.wsgi:application
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'uvicorn_worker.UvicornWorker')
+# Um worker assíncrono já sobrepõe as esperas pelo banco; os síncronos precisam de mais processos
+_por_cpu = 1 if worker_class.endswith('UvicornWorker') else 2
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count() * _por_cpu + 1))
+# Só vale para o worker 'gthread' (o gunicorn troca 'sync' por 'gthread' quando threads > 1)
+threads = int(os.getenv('GUNICORN_THREADS', '4' if worker_class == 'gthread' else '1'))
+
+# O Django é importado uma vez no processo mestre e compartilhado com os workers (copy-on-write)
+preload_app = os.getenv('GUNICORN_PRELOAD', '1') == '1'
+
+# Recicla cada worker após um número de requisições (limita vazamentos de memória); o jitter
+# evita que todos reiniciem ao mesmo tempo
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '2000'))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', '200'))
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '60'))
+graceful_timeout = 30
+# Atrás do nginx: mantém a conexão com o proxy entre requisições
+keepalive = 5
+# Heartbeat dos workers em memória (em contêineres /tmp pode ficar em disco lento)
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+accesslog = os.getenv('GUNICORN_ACCESSLOG')  # '-' para stdout
+errorlog = '-'
+
+
+def when_ready(server):
+    if not preload_app:
+        return
+    # Com o preload, a URLconf (e com ela as views) também é carregada antes do fork
+    from django.urls import get_resolver
+    get_resolver().url_patterns
+
+
+def pre_fork(server, worker):
+    """
+    Nenhuma conexão com o banco aberta no mestre (no preload ou no when_ready) pode ser herdada:
+    dois processos usando o mesmo socket corrompem o protocolo. Fechar antes de cada fork
+    garante que cada worker abre as suas.
+    """
+    if not preload_app:
+        return
+    from django.db import connections
+    for conexao in connections.all(initialized_only=True):
+        conexao.close()
+        # O pool do psycopg 3 é criado na primeira conexão e guardado na classe do backend
+        if conexao.alias in getattr(conexao, '_connection_pools', {}):
+            conexao.close_pool()
+
+
+def post_fork(server, worker):
+    server.log.info("Worker %s iniciado (%s, %d thread(s)).", worker.pid, worker_class, threads)
@@ -0,0 +1,23 @@
+// Normaliza a query string usada na chave do microcache (nginx/conf/default.conf):
+// ordena os parâmetros e descarta os vazios e os de rastreamento, para que
+// "?hospedes=2&cidade=1", "?cidade=1&hospedes=2&bairro=" e "?cidade=1&hospedes=2&utm_source=x"
+// compartilhem a mesma entrada. Os valores não são decodificados.
+
+var IGNORADOS = /^(utm_[a-z]+|fbclid|gclid|_)$/;
+
+function normalizar(r) {
+    var args = r.variables.args;
+    if (!args) {
+        return '';
+    }
+    return args.split('&')
+        .filter(function (par) {
+            var igual = par.indexOf('=');
+            var nome = igual < 0 ? par : par.slice(0, igual);
+            return nome && igual >= 0 && igual < par.length - 1 && !IGNORADOS.test(nome);
+        })
+        .sort()
+        .join('&');
+}
+
+export default { normalizar };
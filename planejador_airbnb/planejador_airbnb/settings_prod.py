@@ -1,6 +1,9 @@
 import os
+import sys
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Diretório base do projeto
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -60,6 +63,10 @@ INSTALLED_APPS = [
 # ==========================
 
 MIDDLEWARE = [
+    'apps.core.instrumentacao.InstrumentacaoMiddleware',  # Deve ser o primeiro
+    'apps.core.replicas.LeituraReplicaMiddleware',
+    'apps.core.registro_buscas.RegistroBuscasMiddleware',
+    'apps.core.respostas_condicionais.MicrocacheMiddleware',  # Antes dos que gravam cookies
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -107,10 +114,114 @@ DATABASES = {
         'NAME': 'planb',    # O nome do seu banco de dados no PostgreSQL
         'USER': 'usuario',       # Seu usuário do PostgreSQL
         'PASSWORD': 'senha',   # Sua senha do PostgreSQL
-        'HOST': 'localhost',         # Ou o endereço do seu servidor de banco de dados
-        'PORT': '5436',              # A porta padrão do PostgreSQL
+        'HOST': os.getenv('DB_HOST', 'localhost'),  # Ou o endereço do seu servidor de banco de dados
+        'PORT': os.getenv('DB_PORT', '5436'),       # A porta padrão do PostgreSQL
+        # Conexão quebrada (banco reiniciado, pooler derrubou) é descartada antes de ser reutilizada
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {},
+    }
+}
+
+# Sob ASGI (padrão do contêiner) conexões persistentes não são reaproveitadas entre requisições:
+# cada worker mantém um pool do psycopg 3 (DB_POOL_MIN a DB_POOL_MAX conexões, verificadas ao
+# sair do pool). Com workers síncronos (DB_POOL=0), cada thread mantém a própria conexão
+# aberta por DB_CONN_MAX_AGE segundos.
+if os.getenv('DB_POOL', '1') == '1':
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': int(os.getenv('DB_POOL_MIN', '2')),
+        'max_size': int(os.getenv('DB_POOL_MAX', '10')),
+        'timeout': int(os.getenv('DB_POOL_TIMEOUT', '10')),
+        'max_idle': 300,
+    }
+else:
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.getenv('DB_CONN_MAX_AGE', '60'))
+
+# Atrás do PgBouncer em modo transaction, cursores do lado do servidor não sobrevivem entre
+# transações (prepared statements o Django já desativa por padrão no psycopg 3)
+if os.getenv('DB_PGBOUNCER') == '1':
+    DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+
+# Réplicas de leitura (apps.core.replicas). DB_REPLICAS="host[:porta],..." cria os aliases
+# replica_1, replica_2... com as credenciais do primário; DB_REPLICA_SIMULADA=1 cria o alias
+# replica_simulada apontando para o próprio primário, para testar o roteamento com um só banco
+for _numero, _endereco in enumerate(filter(None, os.getenv('DB_REPLICAS', '').split(',')), start=1):
+    _host, _, _porta = _endereco.strip().partition(':')
+    DATABASES[f'replica_{_numero}'] = {
+        **DATABASES['default'], 'HOST': _host, 'PORT': _porta or DATABASES['default'].get('PORT', ''),
+        'OPTIONS': dict(DATABASES['default'].get('OPTIONS', {})), 'TEST': {'MIRROR': 'default'},
+    }
+if os.getenv('DB_REPLICA_SIMULADA') == '1':
+    DATABASES['replica_simulada'] = {
+        **DATABASES['default'], 'OPTIONS': dict(DATABASES['default'].get('OPTIONS', {})),
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['apps.core.replicas.RoteadorReplicas']
+# Réplicas mais atrasadas que isto (segundos) ficam fora do roteamento até alcançarem o primário
+REPLICAS_ATRASO_MAXIMO = float(os.getenv('REPLICAS_ATRASO_MAXIMO', '30'))
+REPLICAS_INTERVALO_VERIFICACAO = int(os.getenv('REPLICAS_INTERVALO_VERIFICACAO', '5'))
+
+# ==========================
+# Cache e Instrumentação
+# ==========================
+
+# Backends que contabilizam acertos/falhas para a instrumentação. O padrão ('local') fica na
+# memória de cada processo; com CACHE_BACKEND=redis ou memcached (endereço em CACHE_LOCATION)
+# todos os workers compartilham as entradas e a trava de cálculo do cache_protegido
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'local')
+_CACHE_BACKENDS = {
+    'local': ('apps.core.instrumentacao.LocMemCacheInstrumentado', ''),
+    'redis': ('apps.core.instrumentacao.RedisCacheInstrumentado', 'redis://127.0.0.1:6379/0'),
+    'memcached': ('apps.core.instrumentacao.MemcachedCacheInstrumentado', '127.0.0.1:11211'),
+}
+if CACHE_BACKEND not in _CACHE_BACKENDS:
+    raise ImproperlyConfigured(f"CACHE_BACKEND deve ser um de: {', '.join(_CACHE_BACKENDS)}.")
+CACHES = {
+    'default': {
+        'BACKEND': _CACHE_BACKENDS[CACHE_BACKEND][0],
+        'LOCATION': os.getenv('CACHE_LOCATION', _CACHE_BACKENDS[CACHE_BACKEND][1]),
+        'KEY_PREFIX': os.getenv('CACHE_KEY_PREFIX', 'planb'),
     }
 }
+if CACHE_BACKEND == 'local':
+    # Com as chaves versionadas os valores vivem até a próxima importação; comporta mais entradas
+    CACHES['default']['OPTIONS'] = {'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRADAS', '5000'))}
+
+# Requisições acima destes limites são registradas no log 'apps.core.instrumentacao'
+INSTRUMENTACAO_LIMITE_CONSULTAS = int(os.getenv('INSTRUMENTACAO_LIMITE_CONSULTAS', '20'))
+INSTRUMENTACAO_LIMITE_MS = int(os.getenv('INSTRUMENTACAO_LIMITE_MS', '500'))
+# O endpoint /metricas/ exige 'Authorization: Bearer <token>'; sem o token definido, responde 403
+INSTRUMENTACAO_TOKEN_METRICAS = os.getenv('INSTRUMENTACAO_TOKEN_METRICAS')
+INSTRUMENTACAO_METRICAS_SEM_TOKEN = False
+# Detecção de N+1 e de consultas lentas (com a pilha de origem no log)
+INSTRUMENTACAO_DETECTAR_PADROES = DEBUG
+INSTRUMENTACAO_LIMITE_REPETICOES = 5
+INSTRUMENTACAO_CONSULTA_LENTA_MS = 100
+# Nos testes, views acima do `orcamento_consultas` declarado fazem o teste falhar
+INSTRUMENTACAO_FALHAR_ORCAMENTO = 'test' in sys.argv
+# Cálculos caros em cache (apps.core.cache_protegido): valores expirados são renovados por
+# este pool de threads; nos testes a renovação acontece na própria requisição
+CACHE_RENOVACAO_EM_SEGUNDO_PLANO = 'test' not in sys.argv
+CACHE_RENOVACAO_WORKERS = int(os.getenv('CACHE_RENOVACAO_WORKERS', '2'))
+# As chaves de cache incluem a versão dos dados (apps.core.versao_dados), incrementada a cada
+# importação; o TTL só limita valores de dias anteriores
+CACHE_TTL_VERSIONADO = int(os.getenv('CACHE_TTL_VERSIONADO', str(24 * 3600)))
+VERSAO_DADOS_INTERVALO_VERIFICACAO = int(os.getenv('VERSAO_DADOS_INTERVALO_VERIFICACAO', '5'))
+# Buscas registradas (apps.core.registro_buscas) e reaquecidas pelo comando aquecer_cache,
+# que roda ao final do atualizar_estatisticas. Com o cache em memória local, o aquecimento
+# precisa passar pelo servidor: AQUECIMENTO_URL_BASE aponta para o gunicorn/runserver
+REGISTRO_BUSCAS_DIRETORIO = os.getenv('REGISTRO_BUSCAS_DIRETORIO', os.path.join(BASE_DIR, 'logs', 'buscas'))
+REGISTRO_BUSCAS_AMOSTRAGEM = float(os.getenv('REGISTRO_BUSCAS_AMOSTRAGEM', '1.0'))
+REGISTRO_BUSCAS_RETENCAO_DIAS = int(os.getenv('REGISTRO_BUSCAS_RETENCAO_DIAS', '7'))
+AQUECIMENTO_URL_BASE = os.getenv('AQUECIMENTO_URL_BASE')
+# APIs JSON (apps.core.respostas_condicionais): ETag pela versão dos dados e por quanto
+# tempo navegador e nginx reaproveitam a resposta antes de revalidar
+API_CACHE_MAX_AGE = int(os.getenv('API_CACHE_MAX_AGE', '300'))
+# TTL do microcache do nginx (X-Accel-Expires) para páginas e APIs públicas; 0 desliga
+MICROCACHE_SEGUNDOS = int(os.getenv('MICROCACHE_SEGUNDOS', '5'))
+# Partições mensais de agendamento (apps.core.particoes): meses futuros criados com antecedência
+# e meses passados mantidos antes de ir para o schema 'arquivo' (0 mantém todos)
+AGENDAMENTO_PARTICOES_MESES_A_FRENTE = int(os.getenv('AGENDAMENTO_PARTICOES_MESES_A_FRENTE', '18'))
+AGENDAMENTO_RETENCAO_MESES = int(os.getenv('AGENDAMENTO_RETENCAO_MESES', '24'))
 
 # ==========================
 # Validação de Senhas
@@ -157,10 +268,12 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Configuração de Sessões
 # ==========================
 
+# Só o admin usa sessão: lida do cache (o banco fica como reserva) e gravada apenas quando muda,
+# então as requisições de quem está logado não fazem mais SELECT + UPDATE em django_session
 SESSION_COOKIE_AGE = 30 * 60  # 30 minutos
-SESSION_SAVE_EVERY_REQUEST = True
+SESSION_SAVE_EVERY_REQUEST = False
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True
-SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
 SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_DOMAIN = 'exemplo.exemplo.com'
 
@@ -170,7 +283,8 @@ SESSION_COOKIE_DOMAIN = 'exemplo.exemplo.com'
 # ==========================
 
 CSRF_COOKIE_HTTPONLY = True
-CSRF_USE_SESSIONS = True
+# Token no cookie: a verificação de CSRF não precisa carregar a sessão a cada requisição
+CSRF_USE_SESSIONS = False
 CSRF_COOKIE_SAMESITE = 'Lax'
 
 SECURE_HSTS_SECONDS = 31536000  # 1 ano
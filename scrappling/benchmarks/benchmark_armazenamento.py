@@ -0,0 +1,152 @@
+"""
+Benchmark do armazenamento em CSV (formato original dos scripts) versus Parquet
+particionado (`funcoes/armazenamento.py`) para um mês de coletas.
+
+Gera um mês de coletas sintéticas com as mesmas colunas do script 1 e compara:
+- tamanho total em disco;
+- tempo de carga completa (CSV com `pd.read_csv` x Parquet com `carregar_tabela`);
+- tempo da verificação de retomada (conjunto de IDs já coletados);
+- tempo da mesclagem com os detalhes dos imóveis (`pd.merge` x join do Arrow).
+
+Uso:
+    python benchmarks/benchmark_armazenamento.py <diretorio_saida> [--linhas-por-dia 3000] [--dias 30]
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import time
+from datetime import date, timedelta
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from funcoes.armazenamento import (
+    COLUNA_ID, PYARROW_DISPONIVEL, carregar_detalhes, carregar_tabela, gravar_detalhes, gravar_particao_busca,
+    ler_ids, mesclar_detalhes
+)
+
+LOCAIS = [
+    "Copacabana, Rio de Janeiro",
+    "Ipanema, Rio de Janeiro",
+    "Barra da Tijuca, Rio de Janeiro",
+    "Leblon, Rio de Janeiro",
+]
+TIPOS = ["Apartamento em Rio de Janeiro", "Quarto em Rio de Janeiro", "Casa em Rio de Janeiro", "Loft em Rio de Janeiro"]
+
+
+def _coleta_sintetica(local, dia_coleta, linhas, total_imoveis):
+    dados = []
+    for _ in range(linhas):
+        checkin = dia_coleta + timedelta(days=random.randint(1, 120))
+        noites = 4
+        dados.append({
+            'Localização': local,
+            COLUNA_ID: random.randint(1, total_imoveis) * 7919,
+            'Título': random.choice(TIPOS),
+            'Tipo de Acomodação': random.choice(TIPOS),
+            'Data de Check-in': checkin.strftime('%d/%m/%Y'),
+            'Data de Check-out': (checkin + timedelta(days=noites)).strftime('%d/%m/%Y'),
+            'Inclui Fim de Semana': random.choice(['Sim', 'Não']),
+            'Número de Hóspedes': 1,
+            'Preço total': f"R${random.randint(300, 9000)}",
+            'Total de Noites': noites,
+            'Avaliação': f"4,{random.randint(10, 99)}",
+            'Quantidade de Avaliações': random.randint(0, 500),
+            'Link': f"https://www.airbnb.com.br/rooms/{random.randint(1, total_imoveis)}?check_in={checkin.isoformat()}",
+        })
+    return pd.DataFrame(dados)
+
+
+def _detalhes_sinteticos(ids):
+    return pd.DataFrame({
+        COLUNA_ID: list(ids),
+        'Quartos': [f"{random.randint(1, 4)} quartos" for _ in ids],
+        'Camas': [f"{random.randint(1, 6)} camas" for _ in ids],
+        'Banheiros': [f"{random.randint(1, 3)} banheiros" for _ in ids],
+        'Horário de Check-in': ["Check-in após 15:00"] * len(ids),
+        'Horário de Check-out': ["Checkout antes das 11:00"] * len(ids),
+    })
+
+
+def _tamanho_mb(caminho):
+    if os.path.isfile(caminho):
+        return os.path.getsize(caminho) / (1024 * 1024)
+    return sum(
+        os.path.getsize(os.path.join(raiz, nome)) for raiz, _, arquivos in os.walk(caminho) for nome in arquivos
+    ) / (1024 * 1024)
+
+
+def _cronometrar(funcao, repeticoes=3):
+    melhor = None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        decorrido = time.perf_counter() - inicio
+        melhor = decorrido if melhor is None else min(melhor, decorrido)
+    return melhor, resultado
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark CSV x Parquet particionado para um mês de coletas.")
+    parser.add_argument('diretorio_saida', help="Diretório de trabalho (será recriado).")
+    parser.add_argument('--linhas-por-dia', type=int, default=3000, help="Linhas coletadas por local e por dia.")
+    parser.add_argument('--dias', type=int, default=30, help="Quantidade de dias de coleta.")
+    args = parser.parse_args()
+
+    if not PYARROW_DISPONIVEL:
+        print("ERRO: Este benchmark requer o pacote 'pyarrow'.")
+        sys.exit(1)
+
+    shutil.rmtree(args.diretorio_saida, ignore_errors=True)
+    os.makedirs(args.diretorio_saida)
+    arquivo_csv = os.path.join(args.diretorio_saida, "busca.csv")
+    arquivo_detalhes_csv = os.path.join(args.diretorio_saida, "detalhes.csv")
+    diretorio_parquet = os.path.join(args.diretorio_saida, "busca_parquet")
+    diretorio_detalhes_parquet = os.path.join(args.diretorio_saida, "detalhes_parquet")
+
+    random.seed(42)
+    total_imoveis = args.linhas_por_dia * 2
+    inicio_coleta = date(2025, 7, 1)
+    print(f"Gerando {args.dias} dias x {len(LOCAIS)} locais x {args.linhas_por_dia} linhas...")
+    for dia in range(args.dias):
+        dia_coleta = inicio_coleta + timedelta(days=dia)
+        for local in LOCAIS:
+            df = _coleta_sintetica(local, dia_coleta, args.linhas_por_dia, total_imoveis)
+            # Mesma forma de gravação dos scripts: append no CSV x um arquivo novo por partição
+            df.to_csv(arquivo_csv, mode='a', header=not os.path.exists(arquivo_csv), index=False, encoding='utf-8-sig')
+            gravar_particao_busca(df.drop(columns=['Localização']), diretorio_parquet, local, dia_coleta)
+
+    ids = pd.read_csv(arquivo_csv, usecols=[COLUNA_ID])[COLUNA_ID].unique()
+    df_detalhes = _detalhes_sinteticos(ids)
+    df_detalhes.to_csv(arquivo_detalhes_csv, index=False)
+    gravar_detalhes(df_detalhes, diretorio_detalhes_parquet)
+
+    total_linhas = args.dias * len(LOCAIS) * args.linhas_por_dia
+    print(f"\n{total_linhas} linhas | {len(ids)} imóveis únicos\n")
+    print(f"{'Operação':<34} | {'CSV':>10} | {'Parquet':>10} | {'Ganho':>7}")
+    print('-' * 70)
+
+    def _linha(nome, csv, parquet, unidade):
+        print(f"{nome:<34} | {csv:>8.2f}{unidade} | {parquet:>8.2f}{unidade} | {csv / parquet:>6.1f}x")
+
+    _linha("Tamanho em disco", _tamanho_mb(arquivo_csv), _tamanho_mb(diretorio_parquet), 'MB')
+
+    tempo_csv, _ = _cronometrar(lambda: pd.read_csv(arquivo_csv))
+    tempo_parquet, _ = _cronometrar(lambda: carregar_tabela(diretorio_parquet).to_pandas())
+    _linha("Carga completa", tempo_csv, tempo_parquet, ' s')
+
+    tempo_csv, _ = _cronometrar(lambda: set(pd.read_csv(arquivo_csv)[COLUNA_ID]))
+    tempo_parquet, _ = _cronometrar(lambda: ler_ids(diretorio_parquet, particionado=True))
+    _linha("Retomada (IDs já coletados)", tempo_csv, tempo_parquet, ' s')
+
+    tempo_csv, _ = _cronometrar(
+        lambda: pd.merge(pd.read_csv(arquivo_csv), pd.read_csv(arquivo_detalhes_csv), on=COLUNA_ID, how='left')
+    )
+    tempo_parquet, _ = _cronometrar(
+        lambda: mesclar_detalhes(
+            carregar_tabela(diretorio_parquet), carregar_detalhes(diretorio_detalhes_parquet)
+        )
+    )
+    _linha("Carga + mesclagem com detalhes", tempo_csv, tempo_parquet, ' s')
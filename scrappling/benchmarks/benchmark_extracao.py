@@ -0,0 +1,149 @@
+"""
+Benchmark do motor de extração (`funcoes/extracao.py`) sobre um corpus de páginas salvas.
+
+Mede quantos anúncios (cards) e páginas de detalhes são processados por segundo
+em cada backend de parsing:
+- 'bs4': BeautifulSoup com 'html.parser' (parser usado originalmente pelos scripts);
+- 'lxml': backend padrão do motor de extração.
+
+O corpus é um diretório com arquivos 'busca_*.html' e 'detalhes_*.html'. Ele pode ser
+gerado durante uma coleta real definindo a variável de ambiente AIRBNB_CORPUS_DIR antes de
+executar os scripts 1 e 2, ou de forma sintética com a opção --gerar-sintetico.
+
+Uso:
+    python benchmarks/benchmark_extracao.py <diretorio_corpus> [--repeticoes 3]
+    python benchmarks/benchmark_extracao.py <diretorio_corpus> --gerar-sintetico 50
+"""
+import argparse
+import glob
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from funcoes.extracao import (
+    LXML_DISPONIVEL, Pagina, extrair_cards, extrair_regras, extrair_visao_geral
+)
+
+
+def _card_sintetico(indice):
+    noites = random.randint(1, 7)
+    preco = f"{random.randint(200, 9000):,}".replace(',', '.')
+    return f"""
+    <div data-testid="card-container">
+      <a href="/rooms/{10_000_000 + indice}?check_in=2025-08-01&amp;adults=1">
+        <div data-testid="listing-card-title">Apartamento em Copacabana</div>
+      </a>
+      <div><span class="r4a59j5 atm_x">
+        <span aria-hidden="true">4,{random.randint(10, 99)} ({random.randint(1, 400)})</span>
+      </span></div>
+      <div data-testid="price-availability-row">
+        <span>R$ {preco}</span><span>por {noites} noites</span>
+      </div>
+      {'<div class="decoracao"><span>texto</span></div>' * 20}
+    </div>"""
+
+
+def _detalhes_sintetico():
+    return f"""
+    <html><body>
+      {'<div class="ruido"><p>conteúdo</p></div>' * 300}
+      <div data-plugin-in-point-id="OVERVIEW_DEFAULT_V2"><ol>
+        <li class="l7n4lsf">4 hóspedes</li>
+        <li class="l7n4lsf"><span>·</span>{random.randint(1, 4)} quartos</li>
+        <li class="l7n4lsf"><span>·</span>{random.randint(1, 6)} camas</li>
+        <li class="l7n4lsf"><span>·</span>{random.randint(1, 3)} banheiros</li>
+      </ol></div>
+      <div data-section-id="POLICIES_DEFAULT">
+        <div class="i1303y2k">Check-in após 15:00</div>
+        <div class="i1303y2k">Checkout antes das 11:00</div>
+      </div>
+    </body></html>"""
+
+
+def gerar_corpus_sintetico(diretorio, quantidade_paginas):
+    """Gera páginas de busca (18 cards cada) e de detalhes com a estrutura das páginas reais."""
+    os.makedirs(diretorio, exist_ok=True)
+    random.seed(42)
+    for pagina in range(quantidade_paginas):
+        cards = ''.join(_card_sintetico(pagina * 18 + i) for i in range(18))
+        html = f"<html><body>{'<script>var x = 1;</script>' * 50}{cards}</body></html>"
+        with open(os.path.join(diretorio, f"busca_sintetica_p{pagina}.html"), 'w', encoding='utf-8') as f:
+            f.write(html)
+        with open(os.path.join(diretorio, f"detalhes_sintetico_{pagina}.html"), 'w', encoding='utf-8') as f:
+            f.write(_detalhes_sintetico())
+    print(f"Corpus sintético com {quantidade_paginas} páginas de busca e de detalhes gerado em '{diretorio}'.")
+
+
+def _carregar(diretorio, padrao):
+    paginas = []
+    for caminho in sorted(glob.glob(os.path.join(diretorio, padrao))):
+        with open(caminho, 'r', encoding='utf-8') as arquivo:
+            paginas.append(arquivo.read())
+    return paginas
+
+
+def medir_busca(paginas, backend, repeticoes):
+    """Retorna (melhor tempo em segundos, total de cards) para as páginas de busca."""
+    melhor, total_cards = None, 0
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        total_cards = 0
+        for html in paginas:
+            total_cards += len(extrair_cards(Pagina(html, backend=backend)))
+        decorrido = time.perf_counter() - inicio
+        melhor = decorrido if melhor is None else min(melhor, decorrido)
+    return melhor, total_cards
+
+
+def medir_detalhes(paginas, backend, repeticoes):
+    """Retorna o melhor tempo em segundos para as páginas de detalhes (um parse por página)."""
+    melhor = None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        for html in paginas:
+            pagina = Pagina(html, backend=backend)
+            extrair_visao_geral(pagina)
+            extrair_regras(pagina)
+        decorrido = time.perf_counter() - inicio
+        melhor = decorrido if melhor is None else min(melhor, decorrido)
+    return melhor
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark do motor de extração de páginas do Airbnb.")
+    parser.add_argument('diretorio_corpus', help="Diretório com arquivos busca_*.html e detalhes_*.html.")
+    parser.add_argument('--repeticoes', type=int, default=3, help="Número de repetições (usa o melhor tempo).")
+    parser.add_argument('--gerar-sintetico', type=int, metavar='N',
+                        help="Gera N páginas sintéticas de busca e de detalhes antes de medir.")
+    args = parser.parse_args()
+
+    if args.gerar_sintetico:
+        gerar_corpus_sintetico(args.diretorio_corpus, args.gerar_sintetico)
+
+    paginas_busca = _carregar(args.diretorio_corpus, 'busca_*.html')
+    paginas_detalhes = _carregar(args.diretorio_corpus, 'detalhes_*.html')
+    if not paginas_busca and not paginas_detalhes:
+        print(f"ERRO: Nenhuma página encontrada em '{args.diretorio_corpus}'.")
+        sys.exit(1)
+
+    backends = ['bs4'] + (['lxml'] if LXML_DISPONIVEL else [])
+    print(f"\nCorpus: {len(paginas_busca)} páginas de busca, {len(paginas_detalhes)} páginas de detalhes.")
+    print(f"{'Backend':<8} | {'Anúncios/s':>12} | {'Páginas busca/s':>15} | {'Páginas detalhes/s':>18}")
+    print('-' * 62)
+
+    resultados = {}
+    for backend in backends:
+        anuncios_s = paginas_busca_s = detalhes_s = 0.0
+        if paginas_busca:
+            tempo, total_cards = medir_busca(paginas_busca, backend, args.repeticoes)
+            anuncios_s = total_cards / tempo
+            paginas_busca_s = len(paginas_busca) / tempo
+        if paginas_detalhes:
+            detalhes_s = len(paginas_detalhes) / medir_detalhes(paginas_detalhes, backend, args.repeticoes)
+        resultados[backend] = anuncios_s
+        print(f"{backend:<8} | {anuncios_s:>12.1f} | {paginas_busca_s:>15.1f} | {detalhes_s:>18.1f}")
+
+    if 'lxml' in resultados and resultados['bs4']:
+        print(f"\nGanho do lxml sobre o html.parser: {resultados['lxml'] / resultados['bs4']:.1f}x anúncios/s")
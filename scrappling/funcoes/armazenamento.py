@@ -0,0 +1,220 @@
+"""
+Armazenamento colunar (Parquet/Arrow) dos dados coletados.
+
+Alternativa aos CSVs que crescem com `to_csv(mode='a')` e precisam ser relidos por
+inteiro para retomar a coleta ou mesclar resultados:
+- Os dados da busca são gravados em um dataset Parquet particionado no estilo Hive
+  (`localizacao=<local>/data_coleta=<AAAA-MM-DD>/parte-*.parquet`).
+- As colunas são tipadas (inteiros, datas, floats e strings com dicionário), o que
+  reduz o tamanho em disco e elimina a conversão de tipos a cada leitura.
+- A verificação de retomada lê uma única coluna (`ler_ids`), sem carregar o restante.
+- A mesclagem com os detalhes dos imóveis é um join do Arrow (`mesclar_detalhes`).
+- `carregar_tabela` devolve uma `pyarrow.Table`, que pode ser convertida para pandas
+  sem cópia (`to_pandas(types_mapper=pd.ArrowDtype)`) pelo notebook de ETL.
+"""
+import os
+import re
+import uuid
+from datetime import date, datetime, timezone
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+    PYARROW_DISPONIVEL = True
+except ImportError:
+    PYARROW_DISPONIVEL = False
+
+
+COLUNA_ID = 'ID Imóvel'
+# Momento da gravação do lote de detalhes; decide qual registro vale na mesclagem
+COLUNA_EXTRAIDO_EM = 'Extraído em'
+
+if PYARROW_DISPONIVEL:
+    # Esquema das linhas da busca (mesmas colunas do CSV do script 1, agora tipadas).
+    # 'Localização' e a data da coleta ficam nas partições, não nos arquivos.
+    ESQUEMA_BUSCA = pa.schema([
+        (COLUNA_ID, pa.int64()),
+        ('Título', pa.dictionary(pa.int32(), pa.string())),
+        ('Tipo de Acomodação', pa.dictionary(pa.int32(), pa.string())),
+        ('Data de Check-in', pa.date32()),
+        ('Data de Check-out', pa.date32()),
+        ('Inclui Fim de Semana', pa.bool_()),
+        ('Número de Hóspedes', pa.int16()),
+        ('Preço total', pa.int32()),
+        ('Total de Noites', pa.int16()),
+        ('Avaliação', pa.float32()),
+        ('Quantidade de Avaliações', pa.int32()),
+        ('Link', pa.string()),
+    ])
+
+    ESQUEMA_DETALHES = pa.schema([
+        (COLUNA_ID, pa.int64()),
+        ('Quartos', pa.int16()),
+        ('Camas', pa.int16()),
+        ('Banheiros', pa.int16()),
+        ('Horário de Check-in', pa.string()),
+        ('Horário de Check-out', pa.string()),
+        (COLUNA_EXTRAIDO_EM, pa.timestamp('us', tz='UTC')),
+    ])
+
+    PARTICIONAMENTO = ds.partitioning(
+        pa.schema([('localizacao', pa.string()), ('data_coleta', pa.string())]), flavor='hive'
+    )
+
+
+def _exigir_pyarrow():
+    if not PYARROW_DISPONIVEL:
+        raise ImportError("O armazenamento em Parquet requer o pacote 'pyarrow' (pip install pyarrow).")
+
+
+def _numeros(serie):
+    """Extrai o primeiro número de cada valor ('R$1234' -> 1234, '2 quartos' -> 2)."""
+    texto = serie.astype('string').str.replace('.', '', regex=False)
+    return pd.to_numeric(texto.str.extract(r'(\d+)', expand=False), errors='coerce')
+
+
+def tipar_busca(df):
+    """Converte o DataFrame da busca (textos extraídos das páginas) para o `ESQUEMA_BUSCA`."""
+    _exigir_pyarrow()
+    tipado = pd.DataFrame({
+        COLUNA_ID: pd.to_numeric(df[COLUNA_ID], errors='coerce'),
+        'Título': df['Título'].astype('string'),
+        'Tipo de Acomodação': df['Tipo de Acomodação'].astype('string'),
+        'Data de Check-in': pd.to_datetime(df['Data de Check-in'], format='%d/%m/%Y', errors='coerce').dt.date,
+        'Data de Check-out': pd.to_datetime(df['Data de Check-out'], format='%d/%m/%Y', errors='coerce').dt.date,
+        'Inclui Fim de Semana': df['Inclui Fim de Semana'].eq('Sim'),
+        'Número de Hóspedes': pd.to_numeric(df['Número de Hóspedes'], errors='coerce'),
+        'Preço total': _numeros(df['Preço total']),
+        'Total de Noites': pd.to_numeric(df['Total de Noites'], errors='coerce'),
+        'Avaliação': pd.to_numeric(
+            df['Avaliação'].astype('string').str.replace(',', '.', regex=False), errors='coerce'
+        ),
+        'Quantidade de Avaliações': pd.to_numeric(df['Quantidade de Avaliações'], errors='coerce'),
+        'Link': df['Link'].astype('string'),
+    })
+    tipado = tipado.dropna(subset=[COLUNA_ID])
+    return pa.Table.from_pandas(tipado, schema=ESQUEMA_BUSCA, preserve_index=False)
+
+
+def tipar_detalhes(df, extraido_em=None):
+    """Converte o DataFrame de detalhes dos imóveis para o `ESQUEMA_DETALHES`."""
+    _exigir_pyarrow()
+    extraido_em = extraido_em or datetime.now(timezone.utc)
+    tipado = pd.DataFrame({
+        COLUNA_ID: pd.to_numeric(df[COLUNA_ID], errors='coerce'),
+        'Quartos': _numeros(df['Quartos']),
+        'Camas': _numeros(df['Camas']),
+        'Banheiros': _numeros(df['Banheiros']),
+        'Horário de Check-in': df.get('Horário de Check-in', pd.Series(index=df.index, dtype='string')).astype('string'),
+        'Horário de Check-out': df.get('Horário de Check-out', pd.Series(index=df.index, dtype='string')).astype('string'),
+        COLUNA_EXTRAIDO_EM: pd.Series(extraido_em, index=df.index),
+    })
+    tipado = tipado.dropna(subset=[COLUNA_ID])
+    return pa.Table.from_pandas(tipado, schema=ESQUEMA_DETALHES, preserve_index=False)
+
+
+def _valor_particao(valor):
+    # Valores de partição viram nomes de diretório: remove separadores e '='
+    return re.sub(r'[\\/=]+', '_', str(valor)).strip()
+
+
+def gravar_particao_busca(df, diretorio_base, local, data_coleta=None):
+    """
+    Grava um lote da busca como um novo arquivo na partição (local, data da coleta).
+    Cada chamada cria um arquivo próprio, então nada é relido nem reescrito.
+    Retorna o caminho do arquivo gravado.
+    """
+    tabela = tipar_busca(df)
+    data_coleta = (data_coleta or date.today()).isoformat()
+    diretorio = os.path.join(
+        diretorio_base, f"localizacao={_valor_particao(local)}", f"data_coleta={data_coleta}"
+    )
+    os.makedirs(diretorio, exist_ok=True)
+    caminho = os.path.join(diretorio, f"parte-{uuid.uuid4().hex}.parquet")
+    pq.write_table(tabela, caminho, compression='zstd')
+    return caminho
+
+
+def gravar_detalhes(df, diretorio_base, extraido_em=None):
+    """
+    Grava um lote de detalhes de imóveis como um novo arquivo do dataset de detalhes, com o
+    momento da extração (padrão: agora) em `COLUNA_EXTRAIDO_EM`.
+    """
+    tabela = tipar_detalhes(df, extraido_em)
+    os.makedirs(diretorio_base, exist_ok=True)
+    caminho = os.path.join(diretorio_base, f"parte-{uuid.uuid4().hex}.parquet")
+    pq.write_table(tabela, caminho, compression='zstd')
+    return caminho
+
+
+def salvar_tabela(tabela, caminho):
+    """Grava uma `pyarrow.Table` (ex.: o resultado de `mesclar_detalhes`) em um único arquivo."""
+    _exigir_pyarrow()
+    pq.write_table(tabela, caminho, compression='zstd')
+
+
+def _dataset(diretorio_base, particionado=True):
+    _exigir_pyarrow()
+    return ds.dataset(
+        diretorio_base, format='parquet', partitioning=PARTICIONAMENTO if particionado else None
+    )
+
+
+def existe_dataset(diretorio_base):
+    return os.path.isdir(diretorio_base) and any(
+        nome.endswith('.parquet') for _, _, arquivos in os.walk(diretorio_base) for nome in arquivos
+    )
+
+
+def ler_ids(diretorio_base, particionado=False):
+    """Conjunto de IDs de imóveis do dataset, lendo apenas a coluna de ID."""
+    if not existe_dataset(diretorio_base):
+        return set()
+    coluna = _dataset(diretorio_base, particionado).to_table(columns=[COLUNA_ID]).column(COLUNA_ID)
+    return set(pc.unique(coluna).to_pylist())
+
+
+def carregar_tabela(diretorio_base, colunas=None, filtro=None, particionado=True):
+    """
+    Carrega o dataset como `pyarrow.Table`. `filtro` é uma expressão do Arrow, por exemplo
+    `ds.field('localizacao') == 'Copacabana, Rio de Janeiro'`, e descarta partições inteiras
+    sem abri-las.
+    """
+    return _dataset(diretorio_base, particionado).to_table(columns=colunas, filter=filtro)
+
+
+def carregar_detalhes(diretorio_base):
+    """
+    Carrega o dataset de detalhes com o `ESQUEMA_DETALHES`: arquivos gravados antes da coluna
+    `COLUNA_EXTRAIDO_EM` entram com ela nula, em vez de a coluna sumir do dataset.
+    """
+    _exigir_pyarrow()
+    return ds.dataset(diretorio_base, format='parquet', schema=ESQUEMA_DETALHES).to_table()
+
+
+def mesclar_detalhes(tabela_busca, tabela_detalhes):
+    """
+    Junta os detalhes (quartos, camas, banheiros, horários) a cada linha da busca via
+    join do Arrow, mantendo apenas o registro de detalhes mais recente por imóvel.
+    """
+    _exigir_pyarrow()
+    if COLUNA_EXTRAIDO_EM in tabela_detalhes.column_names:
+        # Os arquivos do dataset são lidos em ordem arbitrária: ordena pela extração (as sem
+        # data, mais antigas, primeiro) para que o último registro de cada imóvel seja o mais recente
+        extraido_em = tabela_detalhes.column(COLUNA_EXTRAIDO_EM)
+        ordem = pc.sort_indices(pc.fill_null(extraido_em, pa.scalar(0, extraido_em.type)))
+        tabela_detalhes = tabela_detalhes.take(ordem).drop_columns([COLUNA_EXTRAIDO_EM])
+    # skip_nulls=False: o registro mais recente vale inteiro, sem completar campos com os antigos
+    ultimo = pc.ScalarAggregateOptions(skip_nulls=False)
+    detalhes_unicos = tabela_detalhes.group_by(COLUNA_ID, use_threads=False).aggregate(
+        [(coluna, 'last', ultimo) for coluna in tabela_detalhes.column_names if coluna != COLUNA_ID]
+    )
+    detalhes_unicos = detalhes_unicos.rename_columns(
+        [nome.removesuffix('_last') for nome in detalhes_unicos.column_names]
+    )
+    # Cada arquivo do dataset tem seu próprio dicionário de strings; o join exige um só
+    return tabela_busca.unify_dictionaries().join(detalhes_unicos, keys=COLUNA_ID, join_type='left outer')
@@ -0,0 +1,122 @@
+"""
+Cache persistente (SQLite) dos detalhes dos imóveis, indexado pelo ID do anúncio.
+
+Quartos, camas, banheiros e horários de check-in/out quase nunca mudam entre coletas.
+Em vez de visitar a página de cada imóvel a cada execução do script 2, os detalhes
+extraídos ficam guardados com a data da extração e a última vez em que o imóvel foi
+visto; a página só é carregada para imóveis novos ou cujo registro passou do TTL.
+"""
+import json
+import os
+import sqlite3
+from datetime import datetime, timedelta
+
+
+CAMINHO_CACHE_DETALHES = os.getenv("AIRBNB_CACHE_DETALHES", "cache_detalhes.sqlite3")
+# Idade máxima (em dias) de um registro antes de a página ser visitada novamente.
+TTL_DIAS = int(os.getenv("AIRBNB_CACHE_DETALHES_TTL_DIAS", "30"))
+
+# Valores que indicam falha na extração e, portanto, não devem ser reaproveitados
+VALORES_INVALIDOS = (None, 'Erro', 'Erro na extração', 'Link Inválido')
+# Campos que precisam ter sido extraídos para o registro entrar no cache
+CAMPOS_OBRIGATORIOS = ('Quartos', 'Camas', 'Banheiros')
+# Quantidade de acertos cujo "visto em" é gravado de uma só vez (um commit por lote)
+LOTE_VISTO_EM = 200
+
+
+class CacheDetalhes:
+    """
+    Uso:
+        with CacheDetalhes() as cache:
+            detalhes = cache.obter(id_imovel)
+            if detalhes is None:
+                detalhes = extrair_detalhes_anuncio(navegador, url)
+                cache.salvar(id_imovel, detalhes)
+            cache.imprimir_resumo()
+    """
+
+    def __init__(self, caminho=CAMINHO_CACHE_DETALHES, ttl_dias=TTL_DIAS, lote_visto_em=LOTE_VISTO_EM):
+        self.caminho = caminho
+        self.ttl = timedelta(days=ttl_dias)
+        self.lote_visto_em = lote_visto_em
+        self._vistos = []
+        self.estatisticas = {'acertos': 0, 'novos': 0, 'expirados': 0, 'salvos': 0}
+        self.conn = sqlite3.connect(caminho)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS detalhes_imovel (
+                id_imovel INTEGER PRIMARY KEY,
+                detalhes TEXT NOT NULL,
+                extraido_em TEXT NOT NULL,
+                visto_em TEXT NOT NULL
+            )
+        """)
+        self.conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.fechar()
+
+    def obter(self, id_imovel):
+        """
+        Retorna os detalhes em cache se ainda estiverem dentro do TTL, ou None se o imóvel
+        for novo ou o registro estiver expirado. O "visto em" dos acertos é gravado em lote.
+        """
+        agora = datetime.now()
+        linha = self.conn.execute(
+            "SELECT detalhes, extraido_em FROM detalhes_imovel WHERE id_imovel = ?", (int(id_imovel),)
+        ).fetchone()
+        if linha is None:
+            self.estatisticas['novos'] += 1
+            return None
+
+        detalhes, extraido_em = linha
+        if agora - datetime.fromisoformat(extraido_em) > self.ttl:
+            self.estatisticas['expirados'] += 1
+            return None
+
+        self._vistos.append((agora.isoformat(), int(id_imovel)))
+        if len(self._vistos) >= self.lote_visto_em:
+            self._gravar_vistos()
+        self.estatisticas['acertos'] += 1
+        return json.loads(detalhes)
+
+    def salvar(self, id_imovel, detalhes):
+        """
+        Guarda os detalhes extraídos. Extrações com falha em algum dos `CAMPOS_OBRIGATORIOS`
+        são ignoradas, para que a página seja visitada de novo na próxima execução.
+        """
+        if any(detalhes.get(campo) in VALORES_INVALIDOS for campo in CAMPOS_OBRIGATORIOS):
+            return
+        agora = datetime.now().isoformat()
+        self.conn.execute(
+            """
+            INSERT INTO detalhes_imovel (id_imovel, detalhes, extraido_em, visto_em) VALUES (?, ?, ?, ?)
+            ON CONFLICT (id_imovel) DO UPDATE SET
+                detalhes = excluded.detalhes, extraido_em = excluded.extraido_em, visto_em = excluded.visto_em
+            """,
+            (int(id_imovel), json.dumps(detalhes, ensure_ascii=False), agora, agora),
+        )
+        self.conn.commit()
+        self.estatisticas['salvos'] += 1
+
+    def taxa_acerto(self):
+        consultas = self.estatisticas['acertos'] + self.estatisticas['novos'] + self.estatisticas['expirados']
+        return self.estatisticas['acertos'] / consultas if consultas else 0.0
+
+    def imprimir_resumo(self):
+        print("\n--- Cache de detalhes dos imóveis ---")
+        print(f"  Acertos (páginas evitadas): {self.estatisticas['acertos']} | "
+              f"Novos: {self.estatisticas['novos']} | Expirados: {self.estatisticas['expirados']} | "
+              f"Taxa de acerto: {self.taxa_acerto():.1%}")
+
+    def _gravar_vistos(self):
+        if self._vistos:
+            self.conn.executemany("UPDATE detalhes_imovel SET visto_em = ? WHERE id_imovel = ?", self._vistos)
+            self.conn.commit()
+            self._vistos = []
+
+    def fechar(self):
+        self._gravar_vistos()
+        self.conn.close()
@@ -0,0 +1,309 @@
+"""
+Motor de extração de dados das páginas do Airbnb.
+
+Centraliza o parsing do HTML retornado pelo Selenium (`driver.page_source`):
+- Cada página é parseada UMA única vez (classe `Pagina`) e o documento é
+  compartilhado por todos os extratores.
+- O backend padrão é o lxml, bem mais rápido que o 'html.parser' do BeautifulSoup.
+  Se o lxml não estiver instalado, o BeautifulSoup é usado como fallback.
+- Regexes e seletores CSS são compilados uma única vez, no carregamento do módulo.
+- Os campos extraídos dos cards (página de busca) e da página de detalhes são
+  descritos de forma declarativa em `CAMPOS_CARD`, `ITENS_VISAO_GERAL` etc.
+"""
+import os
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+
+try:
+    import lxml.html
+    from lxml.cssselect import CSSSelector
+    LXML_DISPONIVEL = True
+except ImportError:
+    LXML_DISPONIVEL = False
+
+from bs4 import BeautifulSoup
+
+
+URL_BASE_AIRBNB = "https://www.airbnb.com.br"
+
+# --- Regexes pré-compiladas (antes eram compiladas dentro do loop de anúncios) ---
+RE_ID_IMOVEL = re.compile(r'/rooms/(\d+)')
+RE_NOTA = re.compile(r'([\d,.]+)')
+RE_QTD_AVALIACOES = re.compile(r'\((\d+)\)')
+RE_PRECO = re.compile(r'R\$\s*([\d.]+)')
+RE_NOITES = re.compile(r'(\d+)\s*noites')
+RE_QUARTOS = re.compile(r'(\d+\s*quarto|Estúdio)')
+RE_CAMAS = re.compile(r'(\d+\s*cama)')
+RE_BANHEIROS = re.compile(r'(\d+\s*banheiro)')
+
+# --- Seletores CSS utilizados nas páginas ---
+SELETOR_CARD = "div[data-testid='card-container']"
+SELETOR_VISAO_GERAL = "div[data-plugin-in-point-id='OVERVIEW_DEFAULT_V2'] li.l7n4lsf"
+SELETOR_SECAO_VISAO_GERAL = "div[data-plugin-in-point-id='OVERVIEW_DEFAULT_V2']"
+SELETOR_REGRAS = "div[data-section-id='POLICIES_DEFAULT'] div.i1303y2k"
+SELETOR_REGRAS_MODAL = "div.f15dgkuj"
+
+
+# ==============================================================================
+# ESPECIFICAÇÃO DECLARATIVA DOS CAMPOS
+# ==============================================================================
+
+@dataclass(frozen=True)
+class Campo:
+    """
+    Descreve como extrair um campo de um nó do documento.
+
+    - seletor: seletor CSS relativo ao nó (usa o primeiro elemento encontrado).
+    - atributo: nome do atributo a ser lido; se None, usa o texto do elemento.
+    - separador: separador usado para juntar os trechos de texto do elemento.
+    - origem: nome de um campo já extraído, usado como valor bruto no lugar do seletor.
+    - transformar: função aplicada ao valor bruto; se retornar None, usa o padrão.
+    """
+    nome: str
+    seletor: str = None
+    atributo: str = None
+    separador: str = ''
+    origem: str = None
+    transformar: object = None
+    padrao: object = 'N/A'
+
+
+@dataclass(frozen=True)
+class ItensClassificados:
+    """
+    Percorre todos os elementos de um seletor e classifica o texto de cada um
+    pela primeira palavra-chave encontrada (ex.: 'quarto' -> 'Quartos').
+    Quando mais de um elemento cai na mesma categoria, o último prevalece.
+    """
+    seletor: str
+    regras: tuple
+    limpar: object = None
+
+
+def _montar_link(href):
+    return URL_BASE_AIRBNB + href if href else None
+
+
+def _extrair_id(link):
+    id_match = RE_ID_IMOVEL.search(link)
+    return id_match.group(1) if id_match else None
+
+
+def _extrair_tipo(titulo):
+    return titulo.split(' em ', 1)[0] if ' em ' in titulo else None
+
+
+def _extrair_nota(texto_avaliacao):
+    if "Novo" in texto_avaliacao:
+        return 'Novo'
+    score_match = RE_NOTA.search(texto_avaliacao)
+    return score_match.group(1) if score_match else None
+
+
+def _extrair_qtd_avaliacoes(texto_avaliacao):
+    if "Novo" in texto_avaliacao:
+        return '0'
+    count_match = RE_QTD_AVALIACOES.search(texto_avaliacao)
+    return count_match.group(1) if count_match else None
+
+
+def _extrair_preco(texto_preco):
+    preco_match = RE_PRECO.search(texto_preco)
+    return f"R${preco_match.group(1).replace('.', '')}" if preco_match else None
+
+
+def _extrair_noites(texto_preco):
+    noites_match = RE_NOITES.search(texto_preco)
+    return noites_match.group(1) if noites_match else None
+
+
+# Campos de cada card da página de busca. A ordem importa: campos com `origem`
+# dependem de campos declarados antes deles.
+CAMPOS_CARD = (
+    Campo('Link', seletor='a[href]', atributo='href', transformar=_montar_link),
+    Campo('ID Imóvel', origem='Link', transformar=_extrair_id),
+    Campo('Título', seletor="div[data-testid='listing-card-title']"),
+    Campo('Tipo de Acomodação', origem='Título', transformar=_extrair_tipo),
+    Campo('_texto_avaliacao', seletor="span[class*='r4a59j5'] span[aria-hidden='true']", padrao=None),
+    Campo('Avaliação', origem='_texto_avaliacao', transformar=_extrair_nota),
+    Campo('Quantidade de Avaliações', origem='_texto_avaliacao', transformar=_extrair_qtd_avaliacoes),
+    Campo('_texto_preco', seletor="div[data-testid='price-availability-row']", separador=' ', padrao=None),
+    Campo('Preço total', origem='_texto_preco', transformar=_extrair_preco),
+    Campo('Total de Noites', origem='_texto_preco', transformar=_extrair_noites),
+)
+
+# Quartos, camas e banheiros da seção de visão geral da página de detalhes.
+ITENS_VISAO_GERAL = ItensClassificados(
+    seletor=SELETOR_VISAO_GERAL,
+    regras=(('Quartos', 'quarto'), ('Camas', 'cama'), ('Banheiros', 'banheiro')),
+    limpar=lambda texto: texto.replace('·', '').strip(),
+)
+
+# Horários de check-in/checkout da seção de regras da página de detalhes.
+ITENS_REGRAS = ItensClassificados(
+    seletor=SELETOR_REGRAS,
+    regras=(('Horário de Check-in', 'Check-in'), ('Horário de Check-out', 'Checkout')),
+)
+
+# Horários de check-in/checkout do modal "Mostrar regras da casa".
+ITENS_REGRAS_MODAL = ItensClassificados(
+    seletor=SELETOR_REGRAS_MODAL,
+    regras=(('Horário de Check-in', 'Check-in:'), ('Horário de Check-out', 'Checkout:')),
+)
+
+
+# ==============================================================================
+# DOCUMENTO PARSEADO (UM PARSE POR PÁGINA)
+# ==============================================================================
+
+@lru_cache(maxsize=None)
+def _seletor_compilado(seletor):
+    """Compila o seletor CSS para XPath uma única vez por processo (backend lxml)."""
+    return CSSSelector(seletor)
+
+
+class Pagina:
+    """
+    Documento HTML parseado uma única vez e compartilhado pelos extratores.
+
+    O backend pode ser 'lxml' (padrão quando disponível) ou 'bs4'
+    (BeautifulSoup com 'html.parser', o comportamento original dos scripts).
+    """
+
+    def __init__(self, html, backend=None):
+        if backend is None:
+            backend = 'lxml' if LXML_DISPONIVEL else 'bs4'
+        if backend == 'lxml' and not LXML_DISPONIVEL:
+            raise ImportError("O backend 'lxml' requer os pacotes 'lxml' e 'cssselect'.")
+        if backend not in ('lxml', 'bs4'):
+            raise ValueError(f"Backend de parsing desconhecido: '{backend}'")
+
+        self.backend = backend
+        if backend == 'lxml':
+            self.raiz = lxml.html.fromstring(html) if html and html.strip() else None
+        else:
+            self.raiz = BeautifulSoup(html, 'html.parser')
+
+    def selecionar(self, seletor, no=None):
+        """Retorna todos os elementos que casam com o seletor CSS."""
+        no = self.raiz if no is None else no
+        if no is None:
+            return []
+        if self.backend == 'lxml':
+            return _seletor_compilado(seletor)(no)
+        return no.select(seletor)
+
+    def primeiro(self, seletor, no=None):
+        """Retorna o primeiro elemento que casa com o seletor, ou None."""
+        encontrados = self.selecionar(seletor, no)
+        return encontrados[0] if encontrados else None
+
+    def texto(self, no, separador='', strip=True):
+        """Equivalente ao `get_text(separator=..., strip=...)` do BeautifulSoup."""
+        if self.backend == 'bs4':
+            return no.get_text(separator=separador, strip=strip)
+        trechos = no.itertext()
+        if strip:
+            trechos = (t.strip() for t in trechos)
+            trechos = [t for t in trechos if t]
+        return separador.join(trechos)
+
+    def atributo(self, no, nome):
+        return no.get(nome)
+
+
+# ==============================================================================
+# EXTRATORES
+# ==============================================================================
+
+def extrair_campos(pagina, no, campos):
+    """Aplica uma sequência de `Campo` sobre um nó e retorna um dicionário."""
+    resultado = {}
+    for campo in campos:
+        if campo.origem is not None:
+            bruto = resultado.get(campo.origem)
+        else:
+            elemento = pagina.primeiro(campo.seletor, no)
+            if elemento is None:
+                bruto = None
+            elif campo.atributo:
+                bruto = pagina.atributo(elemento, campo.atributo)
+            else:
+                # Mesmo comportamento de `.text.strip()` / `get_text(separator=...).strip()`
+                bruto = pagina.texto(elemento, separador=campo.separador, strip=False).strip()
+
+        valor = bruto
+        if bruto is not None and campo.transformar is not None:
+            valor = campo.transformar(bruto)
+        resultado[campo.nome] = campo.padrao if valor is None else valor
+
+    # Campos auxiliares (prefixados com '_') não fazem parte do resultado final
+    return {nome: valor for nome, valor in resultado.items() if not nome.startswith('_')}
+
+
+def extrair_itens_classificados(pagina, especificacao, no=None):
+    """Aplica uma especificação `ItensClassificados` e retorna um dicionário."""
+    resultado = {}
+    for elemento in pagina.selecionar(especificacao.seletor, no):
+        texto_item = pagina.texto(elemento)
+        if especificacao.limpar is not None:
+            texto_item = especificacao.limpar(texto_item)
+        for nome, palavra_chave in especificacao.regras:
+            if palavra_chave in texto_item:
+                resultado[nome] = texto_item
+                break
+    return resultado
+
+
+def extrair_cards(pagina):
+    """Extrai os dados de todos os cards de anúncios de uma página de busca."""
+    return [extrair_campos(pagina, card, CAMPOS_CARD) for card in pagina.selecionar(SELETOR_CARD)]
+
+
+def tem_secao_visao_geral(pagina):
+    return pagina.primeiro(SELETOR_SECAO_VISAO_GERAL) is not None
+
+
+def extrair_visao_geral(pagina):
+    """Quartos, camas e banheiros da página de detalhes (chaves ausentes se não encontrados)."""
+    return extrair_itens_classificados(pagina, ITENS_VISAO_GERAL)
+
+
+def extrair_regras(pagina):
+    """Horários de check-in/checkout da seção de regras da página de detalhes."""
+    return extrair_itens_classificados(pagina, ITENS_REGRAS)
+
+
+def extrair_regras_modal(pagina):
+    """Horários de check-in/checkout do modal de regras da casa."""
+    return extrair_itens_classificados(pagina, ITENS_REGRAS_MODAL)
+
+
+def extrair_visao_geral_texto(texto):
+    """Fallback por regex para quartos/camas/banheiros a partir de um texto livre."""
+    resultado = {}
+    for nome, regex in (('Quartos', RE_QUARTOS), ('Camas', RE_CAMAS), ('Banheiros', RE_BANHEIROS)):
+        encontrado = regex.search(texto)
+        if encontrado:
+            resultado[nome] = encontrado.group(1)
+    return resultado
+
+
+# ==============================================================================
+# CORPUS DE PÁGINAS (PARA BENCHMARK E DEPURAÇÃO)
+# ==============================================================================
+
+# Se definida, os scripts salvam o HTML de cada página visitada neste diretório.
+DIRETORIO_CORPUS = os.getenv("AIRBNB_CORPUS_DIR")
+
+
+def salvar_pagina_corpus(html, prefixo):
+    """Salva o HTML de uma página no diretório de corpus, se configurado."""
+    if not DIRETORIO_CORPUS:
+        return None
+    os.makedirs(DIRETORIO_CORPUS, exist_ok=True)
+    caminho = os.path.join(DIRETORIO_CORPUS, f"{prefixo}.html")
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        arquivo.write(html)
+    return caminho
@@ -0,0 +1,457 @@
+"""
+Ingestão direta dos dados coletados no banco de dados (sem CSVs intermediários).
+
+Os scripts de coleta enviam cada registro extraído para um `SinkIngestao`, que:
+- acumula os registros em um buffer limitado em memória;
+- ao atingir o tamanho do lote (ou o intervalo máximo entre gravações), copia o lote
+  com `COPY` para uma tabela temporária de staging e, na mesma transação, distribui os
+  dados nas tabelas normalizadas (cidade, bairro, imovel, avaliacao, agendamento, anuncio);
+- grava um checkpoint em disco com as unidades de trabalho (ex.: local + data de check-in)
+  cujos registros já foram confirmados no banco, permitindo retomar após uma falha.
+
+Todas as operações são idempotentes: reprocessar um lote já gravado não duplica linhas.
+"""
+import json
+import logging
+import os
+import re
+import time
+from datetime import datetime
+from io import StringIO
+
+from funcoes.banco_de_dados import abre_conexao_banco_de_dados, fecha_conexao_banco_de_dados
+
+
+RE_DIGITOS = re.compile(r'(\d+)')
+
+COLUNAS_STAGING_BUSCA = (
+    'cidade', 'estado', 'bairro', 'id_imovel', 'tipo_acomodacao', 'titulo', 'data_checkin',
+    'data_checkout', 'hospedes', 'preco_total', 'preco_por_dia', 'nota', 'qtd_avaliacoes', 'link',
+)
+COLUNAS_STAGING_DETALHES = ('id_imovel', 'quartos', 'camas', 'banheiros')
+
+# Caracteres que o formato texto do COPY interpreta: a barra é escapada e as quebras de
+# linha/tabulações viram espaço (um '\r' literal faz o PostgreSQL rejeitar o lote inteiro)
+ESCAPES_COPY = str.maketrans({'\\': '\\\\', '\t': ' ', '\n': ' ', '\r': ' '})
+
+
+def _campo_copy(valor):
+    """Formata um valor como campo do COPY em formato texto (None vira NULL)."""
+    return '\\N' if valor is None else str(valor).translate(ESCAPES_COPY)
+
+
+SQL_CRIA_STAGING = """
+CREATE TEMP TABLE IF NOT EXISTS staging_busca (
+    cidade varchar(100), estado varchar(2), bairro varchar(100), id_imovel bigint,
+    tipo_acomodacao varchar(100), titulo varchar(255), data_checkin date, data_checkout date,
+    hospedes integer, preco_total numeric(10, 2), preco_por_dia numeric(10, 2),
+    nota numeric(3, 1), qtd_avaliacoes integer, link varchar(1024), imovel_pk bigint
+);
+CREATE TEMP TABLE IF NOT EXISTS staging_detalhes (
+    id_imovel bigint, quartos integer, camas integer, banheiros integer
+);
+"""
+
+# Distribui o lote de staging nas tabelas normalizadas (mesma lógica do notebook de ETL).
+# Incrementa a versão dos dados das cidades afetadas (tabela `versao_dados` do Django), o que
+# invalida imediatamente o cache do site para essas cidades
+SQL_INCREMENTA_VERSAO = """
+    INSERT INTO versao_dados (escopo, versao, atualizado_em)
+    SELECT 'cidade:' || cidade_id, 1, now() FROM ({origem}) AS afetadas (cidade_id)
+    ON CONFLICT (escopo) DO UPDATE SET versao = versao_dados.versao + 1, atualizado_em = EXCLUDED.atualizado_em
+"""
+
+# Campos do imóvel e da sua avaliação copiados em agendamento (apps.core.resumo_imovel do Django),
+# para os imóveis de {origem}
+SQL_RESUMO_IMOVEL = """
+    SELECT i.id AS imovel_id, i.cidade_id, i.bairro_id, i.quartos, i.camas, i.banheiros, v.nota, v.qtd_avaliacoes
+    FROM imovel i
+    LEFT JOIN avaliacao v ON v.imovel_id = i.id
+    WHERE i.id IN ({origem})
+"""
+
+# Só regrava os agendamentos com alguma cópia diferente
+SQL_SINCRONIZA_RESUMO = """
+    UPDATE agendamento a
+    SET cidade_id = r.cidade_id, bairro_id = r.bairro_id, quartos = r.quartos, camas = r.camas,
+        banheiros = r.banheiros, nota = r.nota, qtd_avaliacoes = r.qtd_avaliacoes
+    FROM ({resumo}) r
+    WHERE a.imovel_id = r.imovel_id
+      AND (a.cidade_id, a.bairro_id, a.quartos, a.camas, a.banheiros, a.nota, a.qtd_avaliacoes)
+          IS DISTINCT FROM (r.cidade_id, r.bairro_id, r.quartos, r.camas, r.banheiros, r.nota, r.qtd_avaliacoes)
+""".replace('{resumo}', SQL_RESUMO_IMOVEL)
+
+# Upserts pelas chaves naturais (restrições únicas da migração agendamento 0006): cidade por nome,
+# bairro por (cidade, nome), imóvel pelo ID do Airbnb, uma avaliação por imóvel e um anúncio por
+# agendamento. As linhas só são regravadas quando algum valor muda
+SQL_DISTRIBUI_BUSCA = (
+    """
+    INSERT INTO cidade (nome, estado)
+    SELECT DISTINCT cidade, estado FROM staging_busca
+    ON CONFLICT (nome) DO NOTHING
+    """,
+    """
+    INSERT INTO bairro (nome, cidade_id)
+    SELECT DISTINCT s.bairro, c.id
+    FROM staging_busca s JOIN cidade c ON c.nome = s.cidade
+    ON CONFLICT (cidade_id, nome) DO NOTHING
+    """,
+    """
+    INSERT INTO imovel (id_imovel, tipo_acomodacao, cidade_id, bairro_id)
+    SELECT DISTINCT ON (s.id_imovel) s.id_imovel, s.tipo_acomodacao, c.id, b.id
+    FROM staging_busca s
+    JOIN cidade c ON c.nome = s.cidade
+    JOIN bairro b ON b.nome = s.bairro AND b.cidade_id = c.id
+    ORDER BY s.id_imovel
+    ON CONFLICT (id_imovel) DO UPDATE
+    SET tipo_acomodacao = COALESCE(NULLIF(EXCLUDED.tipo_acomodacao, ''), imovel.tipo_acomodacao),
+        cidade_id = EXCLUDED.cidade_id, bairro_id = EXCLUDED.bairro_id
+    WHERE (imovel.cidade_id, imovel.bairro_id) IS DISTINCT FROM (EXCLUDED.cidade_id, EXCLUDED.bairro_id)
+       OR (EXCLUDED.tipo_acomodacao <> '' AND imovel.tipo_acomodacao <> EXCLUDED.tipo_acomodacao)
+    """,
+    """
+    UPDATE staging_busca s SET imovel_pk = i.id
+    FROM imovel i
+    WHERE i.id_imovel = s.id_imovel
+    """,
+    # Entre registros do mesmo imóvel no lote, vale o de mais avaliações (o mais recente)
+    """
+    INSERT INTO avaliacao (imovel_id, nota, qtd_avaliacoes)
+    SELECT DISTINCT ON (s.imovel_pk) s.imovel_pk, s.nota, s.qtd_avaliacoes
+    FROM staging_busca s
+    ORDER BY s.imovel_pk, s.qtd_avaliacoes DESC NULLS LAST
+    ON CONFLICT (imovel_id) DO UPDATE
+    SET nota = EXCLUDED.nota, qtd_avaliacoes = EXCLUDED.qtd_avaliacoes
+    WHERE (avaliacao.nota, avaliacao.qtd_avaliacoes) IS DISTINCT FROM (EXCLUDED.nota, EXCLUDED.qtd_avaliacoes)
+    """,
+    # Uma nova coleta da mesma estadia atualiza o preço em vez de duplicar o agendamento
+    """
+    UPDATE agendamento a
+    SET preco_total = s.preco_total, preco_por_dia = s.preco_por_dia, link = s.link
+    FROM staging_busca s
+    WHERE a.imovel_id = s.imovel_pk AND a.data_checkin = s.data_checkin
+      AND a.data_checkout = s.data_checkout AND a.hospedes = s.hospedes
+    """,
+    # Com agendamento particionado por mês (migração agendamento 0003 do Django), cria antes as
+    # partições dos meses do lote; sem elas as linhas iriam para a partição padrão
+    """
+    DO $$
+    BEGIN
+        IF to_regprocedure('criar_particao_agendamento(date)') IS NOT NULL THEN
+            PERFORM criar_particao_agendamento(mes)
+            FROM (SELECT DISTINCT date_trunc('month', data_checkin)::date AS mes FROM staging_busca) meses;
+        END IF;
+    END
+    $$
+    """,
+    # Os agendamentos novos já levam as cópias do imóvel e da avaliação mais recente (colunas da
+    # migração agendamento 0005, usadas pelos filtros da busca)
+    """
+    INSERT INTO agendamento (imovel_id, data_checkin, data_checkout, hospedes, preco_total, preco_por_dia, link,
+                             cidade_id, bairro_id, quartos, camas, banheiros, nota, qtd_avaliacoes)
+    SELECT DISTINCT ON (s.imovel_pk, s.data_checkin, s.data_checkout, s.hospedes)
+           s.imovel_pk, s.data_checkin, s.data_checkout, s.hospedes, s.preco_total, s.preco_por_dia, s.link,
+           r.cidade_id, r.bairro_id, r.quartos, r.camas, r.banheiros, r.nota, r.qtd_avaliacoes
+    FROM staging_busca s
+    JOIN ({resumo}) r ON r.imovel_id = s.imovel_pk
+    WHERE NOT EXISTS (
+        SELECT 1 FROM agendamento a
+        WHERE a.imovel_id = s.imovel_pk AND a.data_checkin = s.data_checkin
+          AND a.data_checkout = s.data_checkout AND a.hospedes = s.hospedes
+    )
+    ORDER BY s.imovel_pk, s.data_checkin, s.data_checkout, s.hospedes
+    """.format(resumo=SQL_RESUMO_IMOVEL.format(origem="SELECT imovel_pk FROM staging_busca")),
+    # ... e os já existentes são atualizados se o imóvel ou a avaliação mudaram neste lote
+    SQL_SINCRONIZA_RESUMO.format(origem="SELECT imovel_pk FROM staging_busca"),
+    """
+    INSERT INTO anuncio (agendamento_id, titulo, link)
+    SELECT DISTINCT ON (a.id) a.id, s.titulo, s.link
+    FROM staging_busca s
+    JOIN agendamento a ON a.imovel_id = s.imovel_pk AND a.data_checkin = s.data_checkin
+                      AND a.data_checkout = s.data_checkout AND a.hospedes = s.hospedes
+    ORDER BY a.id
+    ON CONFLICT (agendamento_id) DO UPDATE SET titulo = EXCLUDED.titulo, link = EXCLUDED.link
+    WHERE (anuncio.titulo, anuncio.link) IS DISTINCT FROM (EXCLUDED.titulo, EXCLUDED.link)
+    """,
+    # Histórico de preços (tabela `observacao_preco`, migração agendamento 0004): uma observação
+    # por agendamento e dia de coleta; outra coleta no mesmo dia substitui o preço do dia
+    """
+    INSERT INTO observacao_preco (agendamento_id, imovel_id, observado_em, preco_total_centavos,
+                                  antecedencia_dias, noites, hospedes)
+    SELECT DISTINCT ON (a.id) a.id, a.imovel_id, CURRENT_DATE, round(s.preco_total * 100)::integer,
+           s.data_checkin - CURRENT_DATE, s.data_checkout - s.data_checkin, s.hospedes
+    FROM staging_busca s
+    JOIN agendamento a ON a.imovel_id = s.imovel_pk AND a.data_checkin = s.data_checkin
+                      AND a.data_checkout = s.data_checkout AND a.hospedes = s.hospedes
+    ORDER BY a.id
+    ON CONFLICT (agendamento_id, observado_em) DO UPDATE SET preco_total_centavos = EXCLUDED.preco_total_centavos
+    """,
+    SQL_INCREMENTA_VERSAO.format(origem="""
+        SELECT DISTINCT c.id FROM staging_busca s JOIN cidade c ON c.nome = s.cidade
+    """),
+)
+
+SQL_DISTRIBUI_DETALHES = (
+    """
+    UPDATE imovel i
+    SET quartos = COALESCE(s.quartos, i.quartos),
+        camas = COALESCE(s.camas, i.camas),
+        banheiros = COALESCE(s.banheiros, i.banheiros)
+    FROM staging_detalhes s
+    WHERE i.id_imovel = s.id_imovel
+    """,
+    SQL_SINCRONIZA_RESUMO.format(origem="""
+        SELECT i.id FROM staging_detalhes s JOIN imovel i ON i.id_imovel = s.id_imovel
+    """),
+    SQL_INCREMENTA_VERSAO.format(origem="""
+        SELECT DISTINCT i.cidade_id FROM staging_detalhes s JOIN imovel i ON i.id_imovel = s.id_imovel
+    """),
+)
+
+
+# ==============================================================================
+# LIMPEZA DOS REGISTROS (mesmas regras do notebook de tratamento)
+# ==============================================================================
+
+def _limpa_inteiro(valor):
+    if valor is None:
+        return None
+    encontrado = RE_DIGITOS.search(str(valor))
+    return int(encontrado.group(1)) if encontrado else None
+
+
+def _limpa_preco(valor):
+    # 'R$1234' (formato do motor de extração) ou 'R$ 1.234' -> 1234
+    if valor is None:
+        return None
+    texto = str(valor).replace('R$', '').replace('.', '').replace(',', '.').strip()
+    try:
+        return int(float(texto))
+    except ValueError:
+        return None
+
+
+def _limpa_data(valor):
+    try:
+        return datetime.strptime(str(valor), '%d/%m/%Y').date()
+    except (TypeError, ValueError):
+        return None
+
+
+def _limpa_nota(valor):
+    if valor is None or valor in ('N/A', 'Novo'):
+        return 0.0
+    try:
+        return float(str(valor).replace(',', '.'))
+    except ValueError:
+        return 0.0
+
+
+def normaliza_registro_busca(registro, estado='RJ'):
+    """
+    Converte um registro da página de busca (mesmas colunas do CSV do script 1)
+    em uma linha da tabela de staging. Retorna None para registros inválidos.
+    """
+    id_imovel = _limpa_inteiro(registro.get('ID Imóvel'))
+    data_checkin = _limpa_data(registro.get('Data de Check-in'))
+    data_checkout = _limpa_data(registro.get('Data de Check-out'))
+    preco_total = _limpa_preco(registro.get('Preço total'))
+    localizacao = registro.get('Localização') or ''
+    if not id_imovel or not data_checkin or not data_checkout or preco_total is None or ', ' not in localizacao:
+        return None
+
+    total_noites = (data_checkout - data_checkin).days
+    if total_noites <= 0:
+        return None
+
+    bairro, cidade = (parte.strip() for parte in localizacao.split(', ', 1))
+    titulo = registro.get('Título') or ''
+    tipo_acomodacao = registro.get('Tipo de Acomodação') or ''
+    return (
+        cidade, estado, bairro, id_imovel,
+        '' if tipo_acomodacao == 'N/A' else tipo_acomodacao,
+        '' if titulo == 'N/A' else titulo,
+        data_checkin, data_checkout,
+        _limpa_inteiro(registro.get('Número de Hóspedes')),
+        preco_total,
+        round(preco_total / total_noites, 2),
+        _limpa_nota(registro.get('Avaliação')),
+        _limpa_inteiro(registro.get('Quantidade de Avaliações')) or 0,
+        registro.get('Link') or '',
+    )
+
+
+def normaliza_registro_detalhes(id_imovel, detalhes):
+    """Converte o resultado de `extrair_detalhes_anuncio` em uma linha de staging."""
+    id_imovel = _limpa_inteiro(id_imovel)
+    if not id_imovel:
+        return None
+    return (
+        id_imovel,
+        _limpa_inteiro(detalhes.get('Quartos')),
+        _limpa_inteiro(detalhes.get('Camas')),
+        _limpa_inteiro(detalhes.get('Banheiros')),
+    )
+
+
+# ==============================================================================
+# SINK
+# ==============================================================================
+
+class SinkIngestao:
+    """
+    Recebe registros dos scrapers e os grava em lotes no banco de dados.
+
+    Uso:
+        with SinkIngestao('busca_copacabana') as sink:
+            if not sink.concluido(chave):
+                for registro in registros:
+                    sink.adicionar_busca(registro)
+                sink.marcar_concluido(chave)
+    """
+
+    def __init__(self, nome_checkpoint, tamanho_lote=2000, intervalo_maximo_s=5.0, estado='RJ',
+                 diretorio_checkpoint='.'):
+        self.tamanho_lote = tamanho_lote
+        self.intervalo_maximo_s = intervalo_maximo_s
+        self.estado = estado
+        self.caminho_checkpoint = os.path.join(diretorio_checkpoint, f"checkpoint_{nome_checkpoint}.json")
+
+        self._buffer_busca = []
+        self._buffer_detalhes = []
+        self._chaves_pendentes = []
+        self._ultima_gravacao = time.monotonic()
+
+        self.estatisticas = {'registros_gravados': 0, 'registros_descartados': 0, 'lotes': 0}
+        self._concluidas = set()
+        self._carregar_checkpoint()
+
+        self.conn, self.cursor = abre_conexao_banco_de_dados()
+        if self.conn is None:
+            raise ConnectionError("Falha ao abrir a conexão com o banco de dados.")
+        self.cursor.execute(SQL_CRIA_STAGING)
+        self.conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.gravar()
+        finally:
+            fecha_conexao_banco_de_dados(self.conn, self.cursor)
+
+    # --- Checkpoint ---
+
+    def _carregar_checkpoint(self):
+        if not os.path.exists(self.caminho_checkpoint):
+            return
+        with open(self.caminho_checkpoint, 'r', encoding='utf-8') as arquivo:
+            dados = json.load(arquivo)
+        self._concluidas = set(dados.get('concluidas', []))
+        self.estatisticas['registros_gravados'] = dados.get('registros_gravados', 0)
+        logging.info(f"Checkpoint carregado: {len(self._concluidas)} unidades já concluídas.")
+
+    def _salvar_checkpoint(self):
+        # Escrita atômica: um arquivo temporário substitui o checkpoint anterior de uma só vez
+        temporario = f"{self.caminho_checkpoint}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            json.dump({
+                'concluidas': sorted(self._concluidas),
+                'registros_gravados': self.estatisticas['registros_gravados'],
+                'atualizado_em': datetime.now().isoformat(),
+            }, arquivo)
+        os.replace(temporario, self.caminho_checkpoint)
+
+    def concluido(self, chave):
+        """Indica se a unidade de trabalho já foi gravada no banco em uma execução anterior."""
+        return chave in self._concluidas
+
+    def marcar_concluido(self, chave):
+        """A unidade só entra no checkpoint depois que o lote com seus registros for confirmado."""
+        self._chaves_pendentes.append(chave)
+        self._gravar_se_necessario()
+
+    # --- Entrada de registros ---
+
+    def adicionar_busca(self, registro):
+        linha = normaliza_registro_busca(registro, self.estado)
+        if linha is None:
+            self.estatisticas['registros_descartados'] += 1
+            return
+        self._buffer_busca.append(linha)
+        self._gravar_se_necessario()
+
+    def adicionar_detalhes(self, id_imovel, detalhes):
+        linha = normaliza_registro_detalhes(id_imovel, detalhes)
+        if linha is None:
+            self.estatisticas['registros_descartados'] += 1
+            return
+        self._buffer_detalhes.append(linha)
+        self._gravar_se_necessario()
+
+    def _gravar_se_necessario(self):
+        tamanho = len(self._buffer_busca) + len(self._buffer_detalhes)
+        expirou = time.monotonic() - self._ultima_gravacao >= self.intervalo_maximo_s
+        if tamanho >= self.tamanho_lote or (expirou and (tamanho or self._chaves_pendentes)):
+            self.gravar()
+
+    # --- Consultas auxiliares ---
+
+    def imoveis_sem_detalhes(self):
+        """Imóveis ainda sem quartos/camas/banheiros, com o link de um dos seus agendamentos."""
+        self.cursor.execute("""
+            SELECT DISTINCT ON (i.id_imovel) i.id_imovel, a.link
+            FROM imovel i JOIN agendamento a ON a.imovel_id = i.id
+            WHERE i.quartos IS NULL AND i.camas IS NULL AND i.banheiros IS NULL
+              AND a.link LIKE 'http%%'
+            ORDER BY i.id_imovel, a.data_checkin DESC
+        """)
+        return self.cursor.fetchall()
+
+    # --- Gravação ---
+
+    def _copiar(self, tabela, colunas, linhas):
+        buffer = StringIO()
+        for linha in linhas:
+            buffer.write('\t'.join(_campo_copy(valor) for valor in linha))
+            buffer.write('\n')
+        buffer.seek(0)
+        self.cursor.execute(f"TRUNCATE {tabela}")
+        self.cursor.copy_expert(f"COPY {tabela} ({', '.join(colunas)}) FROM STDIN", buffer)
+
+    def gravar(self):
+        """Grava o conteúdo do buffer em uma única transação e atualiza o checkpoint."""
+        linhas_busca, linhas_detalhes = self._buffer_busca, self._buffer_detalhes
+        if not linhas_busca and not linhas_detalhes and not self._chaves_pendentes:
+            return
+
+        inicio = time.perf_counter()
+        try:
+            if linhas_busca:
+                self._copiar('staging_busca', COLUNAS_STAGING_BUSCA, linhas_busca)
+                for sql in SQL_DISTRIBUI_BUSCA:
+                    self.cursor.execute(sql)
+            if linhas_detalhes:
+                self._copiar('staging_detalhes', COLUNAS_STAGING_DETALHES, linhas_detalhes)
+                for sql in SQL_DISTRIBUI_DETALHES:
+                    self.cursor.execute(sql)
+            self.conn.commit()
+        except Exception as e:
+            self.conn.rollback()
+            logging.error(f"Erro ao gravar lote de ingestão: {e}. Transação revertida.")
+            raise
+
+        total = len(linhas_busca) + len(linhas_detalhes)
+        self.estatisticas['registros_gravados'] += total
+        self.estatisticas['lotes'] += 1
+        self._concluidas.update(self._chaves_pendentes)
+        self._buffer_busca, self._buffer_detalhes, self._chaves_pendentes = [], [], []
+        self._ultima_gravacao = time.monotonic()
+        self._salvar_checkpoint()
+
+        if total:
+            mensagem = f"Lote de {total} registros gravado no banco em {time.perf_counter() - inicio:.2f}s."
+            logging.info(mensagem)
+            print(mensagem)
@@ -0,0 +1,320 @@
+"""
+Pool de navegadores Firefox (Selenium) para os scripts de coleta.
+
+Substitui a criação ad hoc de `webdriver.Firefox(options=options)` em cada script:
+- As instâncias são criadas "aquecidas" no início e reaproveitadas entre as páginas.
+- Imagens, fontes, mídia e domínios de analytics/rastreamento são bloqueados
+  diretamente nas preferências do Firefox (inclusive via PAC, que desvia os domínios
+  bloqueados para um proxy inexistente).
+- As esperas fixas (`time.sleep`) dão lugar a condições explícitas de prontidão.
+- O navegador é reciclado quando a memória (Firefox + geckodriver) passa de um limite,
+  em vez de reiniciar a cada N iterações.
+- O tempo de cada página é registrado em `MetricasPaginas`.
+"""
+import logging
+import os
+import queue
+import statistics
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+import psutil
+from selenium import webdriver
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.firefox.options import Options
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+from funcoes.extracao import SELETOR_CARD, SELETOR_REGRAS_MODAL, SELETOR_SECAO_VISAO_GERAL
+
+
+# Limite padrão de memória (MB) por navegador antes de reciclar a instância.
+LIMITE_MEMORIA_MB = int(os.getenv("AIRBNB_LIMITE_MEMORIA_MB", "1200"))
+
+# Domínios de analytics, anúncios e rastreamento que não influenciam o conteúdo extraído.
+DOMINIOS_BLOQUEADOS = (
+    'google-analytics.com',
+    'googletagmanager.com',
+    'googleadservices.com',
+    'doubleclick.net',
+    'facebook.net',
+    'facebook.com',
+    'hotjar.com',
+    'sentry.io',
+    'branch.io',
+    'bing.com',
+    'tiktok.com',
+    'pinterest.com',
+)
+
+
+def _pac_bloqueio(dominios):
+    """Gera um PAC (Proxy Auto-Config) que desvia os domínios bloqueados para uma porta fechada."""
+    condicoes = ' || '.join(f'dnsDomainIs(host, "{dominio}")' for dominio in dominios)
+    return (
+        "data:text/javascript,function FindProxyForURL(url, host) {"
+        f" if ({condicoes}) return 'PROXY 127.0.0.1:9';"
+        " return 'DIRECT'; }"
+    )
+
+
+def criar_opcoes_firefox(bloquear_folhas_estilo=False, dominios_bloqueados=DOMINIOS_BLOQUEADOS):
+    """Opções do Firefox otimizadas para coleta: headless, sem imagens/fontes/mídia/analytics."""
+    options = Options()
+    options.add_argument('--headless')
+    # 'eager' devolve o controle após o DOMContentLoaded; a prontidão real é
+    # verificada pelas condições explícitas abaixo.
+    options.page_load_strategy = 'eager'
+
+    options.set_preference("permissions.default.image", 2)
+    options.set_preference("gfx.downloadable_fonts.enabled", False)
+    options.set_preference("media.autoplay.default", 5)
+    options.set_preference("media.video_stats.enabled", False)
+    if bloquear_folhas_estilo:
+        # Pode quebrar a detecção de alguns elementos se a página depender de CSS para estrutura.
+        options.set_preference("permissions.default.stylesheet", 2)
+
+    # Proteção contra rastreamento nativa do Firefox + bloqueio explícito de domínios
+    options.set_preference("privacy.trackingprotection.enabled", True)
+    options.set_preference("privacy.trackingprotection.socialtracking.enabled", True)
+    if dominios_bloqueados:
+        options.set_preference("network.proxy.type", 2)
+        options.set_preference("network.proxy.autoconfig_url", _pac_bloqueio(dominios_bloqueados))
+
+    # Reduz o consumo de memória por instância
+    options.set_preference("browser.cache.memory.capacity", 65536)
+    options.set_preference("browser.sessionhistory.max_entries", 2)
+    options.set_preference("browser.sessionstore.max_tabs_undo", 0)
+    options.set_preference("dom.ipc.processCount", 1)
+    options.set_preference("network.prefetch-next", False)
+    options.set_preference("network.http.speculative-parallel-limit", 0)
+    return options
+
+
+# ==============================================================================
+# CONDIÇÕES DE PRONTIDÃO (substituem as esperas fixas)
+# ==============================================================================
+
+def cards_prontos(href_anterior=None):
+    """
+    Pronto quando há cards na página e todos já exibem a linha de preço.
+    Se `href_anterior` for informado (paginação), exige também que o primeiro card
+    seja diferente do da página anterior, evitando ler a página antiga.
+    """
+    script = (
+        "const cards = document.querySelectorAll(arguments[0]);"
+        "if (!cards.length) return null;"
+        "const precos = document.querySelectorAll(arguments[0] + \" div[data-testid='price-availability-row']\");"
+        "const link = cards[0].querySelector('a[href]');"
+        "return [cards.length, precos.length, link ? link.getAttribute('href') : null];"
+    )
+
+    def _condicao(driver):
+        estado = driver.execute_script(script, SELETOR_CARD)
+        if not estado:
+            return False
+        total_cards, total_precos, primeiro_href = estado
+        if href_anterior is not None and primeiro_href == href_anterior:
+            return False
+        return total_precos >= total_cards
+
+    return _condicao
+
+
+def primeiro_card_href(driver):
+    """Href do primeiro card da página atual (referência para a paginação)."""
+    return driver.execute_script(
+        "const a = document.querySelector(arguments[0] + ' a[href]'); return a ? a.getAttribute('href') : null;",
+        SELETOR_CARD,
+    )
+
+
+def detalhes_prontos():
+    """Pronto quando a seção de visão geral ou a de regras da casa foi renderizada."""
+    return EC.any_of(
+        EC.presence_of_element_located((By.CSS_SELECTOR, SELETOR_SECAO_VISAO_GERAL)),
+        EC.presence_of_element_located((By.CSS_SELECTOR, "div[data-section-id='POLICIES_DEFAULT']")),
+    )
+
+
+def modal_regras_pronto():
+    """Pronto quando os itens do modal de regras da casa estão no DOM."""
+    return EC.presence_of_element_located((By.CSS_SELECTOR, SELETOR_REGRAS_MODAL))
+
+
+# ==============================================================================
+# MÉTRICAS
+# ==============================================================================
+
+class MetricasPaginas:
+    """Acumula o tempo (em segundos) de cada página por tipo ('busca', 'detalhes' etc.)."""
+
+    def __init__(self):
+        self.tempos = defaultdict(list)
+        self.reciclagens = 0
+
+    def registrar(self, tipo, segundos):
+        self.tempos[tipo].append(segundos)
+
+    def resumo(self):
+        resultado = {}
+        for tipo, tempos in self.tempos.items():
+            ordenados = sorted(tempos)
+            resultado[tipo] = {
+                'paginas': len(ordenados),
+                'media_s': statistics.fmean(ordenados),
+                'p50_s': ordenados[len(ordenados) // 2],
+                'p95_s': ordenados[min(len(ordenados) - 1, int(len(ordenados) * 0.95))],
+                'max_s': ordenados[-1],
+            }
+        return resultado
+
+    def imprimir_resumo(self):
+        print("\n--- Métricas de carregamento de páginas ---")
+        for tipo, valores in self.resumo().items():
+            print(f"  {tipo}: {valores['paginas']} páginas | média {valores['media_s']:.2f}s | "
+                  f"p50 {valores['p50_s']:.2f}s | p95 {valores['p95_s']:.2f}s | máx {valores['max_s']:.2f}s")
+        print(f"  Navegadores reciclados por uso de memória: {self.reciclagens}")
+
+
+# ==============================================================================
+# NAVEGADOR E POOL
+# ==============================================================================
+
+class Navegador:
+    """Uma instância do Firefox com medição de tempo por página e controle de memória."""
+
+    def __init__(self, opcoes, metricas, limite_memoria_mb=LIMITE_MEMORIA_MB):
+        self.driver = webdriver.Firefox(options=opcoes)
+        self.driver.set_page_load_timeout(60)
+        self.metricas = metricas
+        self.limite_memoria_mb = limite_memoria_mb
+        self.paginas_carregadas = 0
+
+    def carregar(self, url, condicao=None, tipo='pagina', timeout=20):
+        """
+        Abre a URL e aguarda a condição de prontidão. Retorna False se a condição
+        não for atendida dentro do timeout (a página pode estar incompleta).
+        """
+        with self.cronometrar(tipo):
+            self.driver.get(url)
+            return self.aguardar(condicao, timeout)
+
+    def aguardar(self, condicao, timeout=20):
+        if condicao is None:
+            return True
+        try:
+            WebDriverWait(self.driver, timeout, poll_frequency=0.2).until(condicao)
+            return True
+        except TimeoutException:
+            return False
+
+    @contextmanager
+    def cronometrar(self, tipo):
+        """Registra nas métricas o tempo gasto no bloco (ex.: clique de paginação + espera)."""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.metricas.registrar(tipo, time.perf_counter() - inicio)
+            self.paginas_carregadas += 1
+
+    def memoria_mb(self):
+        """Memória residente do geckodriver e de todos os processos do Firefox filhos dele."""
+        try:
+            processo = psutil.Process(self.driver.service.process.pid)
+            processos = [processo] + processo.children(recursive=True)
+            return sum(p.memory_info().rss for p in processos if p.is_running()) / (1024 * 1024)
+        except (psutil.Error, AttributeError):
+            return 0.0
+
+    def encerrar(self):
+        try:
+            self.driver.quit()
+        except Exception as e:
+            logging.warning(f"Erro ao encerrar o navegador: {e}")
+
+
+class PoolNavegadores:
+    """
+    Pool de instâncias do Firefox pré-aquecidas.
+
+    Uso:
+        with PoolNavegadores(tamanho=1) as pool:
+            with pool.navegador() as navegador:
+                navegador.carregar(url, cards_prontos(), tipo='busca')
+            pool.metricas.imprimir_resumo()
+    """
+
+    def __init__(self, tamanho=1, limite_memoria_mb=LIMITE_MEMORIA_MB, bloquear_folhas_estilo=False,
+                 url_aquecimento=None):
+        self.tamanho = tamanho
+        self.limite_memoria_mb = limite_memoria_mb
+        self.opcoes = criar_opcoes_firefox(bloquear_folhas_estilo=bloquear_folhas_estilo)
+        self.url_aquecimento = url_aquecimento
+        self.metricas = MetricasPaginas()
+        self._disponiveis = queue.Queue()
+        self._todos = []
+
+    def __enter__(self):
+        self.iniciar()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.encerrar()
+
+    def _novo_navegador(self):
+        navegador = Navegador(self.opcoes, self.metricas, self.limite_memoria_mb)
+        if self.url_aquecimento:
+            # Primeira navegação paga DNS, TLS e cache de scripts fora da medição das páginas
+            try:
+                navegador.driver.get(self.url_aquecimento)
+            except Exception as e:
+                logging.warning(f"Falha ao aquecer o navegador: {e}")
+        self._todos.append(navegador)
+        return navegador
+
+    def iniciar(self):
+        print(f"\n--- Iniciando pool com {self.tamanho} navegador(es) ---")
+        for _ in range(self.tamanho):
+            self._disponiveis.put(self._novo_navegador())
+
+    @contextmanager
+    def navegador(self):
+        """
+        Empresta um navegador do pool; ao devolver, recicla a instância se passou do limite de memória.
+        Se o Firefox novo não subir, a vaga volta vazia (None) e o próximo empréstimo tenta criá-lo
+        de novo, levantando o erro em vez de esperar para sempre por uma instância que não existe.
+        """
+        navegador = self._disponiveis.get()
+        if navegador is None:
+            try:
+                navegador = self._novo_navegador()
+            except Exception:
+                self._disponiveis.put(None)
+                raise
+        try:
+            yield navegador
+        finally:
+            # Uma única varredura dos processos por devolução: o valor serve ao teste e ao log
+            memoria_mb = navegador.memoria_mb()
+            if memoria_mb > self.limite_memoria_mb:
+                print(f"\n--- Navegador usando {memoria_mb:.0f} MB "
+                      f"(limite {self.limite_memoria_mb} MB). Reciclando instância ---")
+                self._todos.remove(navegador)
+                navegador.encerrar()
+                self.metricas.reciclagens += 1
+                try:
+                    navegador = self._novo_navegador()
+                except Exception as e:
+                    logging.error(f"Falha ao recriar o navegador; a vaga fica vazia até o próximo uso: {e}")
+                    navegador = None
+            self._disponiveis.put(navegador)
+
+    def encerrar(self):
+        print("\n--- Encerrando navegadores do pool ---")
+        for navegador in self._todos:
+            navegador.encerrar()
+        self._todos = []
@@ -1,23 +1,32 @@
 import pandas as pd
-from selenium import webdriver
-from selenium.webdriver.firefox.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import NoSuchElementException, TimeoutException
-from bs4 import BeautifulSoup
-import time
 import sys
 import os
-import re
 
-
-def extrair_detalhes_anuncio(driver, url):
+# Permite importar o pacote 'funcoes' ao executar o script de dentro de 'scripts/'
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from funcoes.extracao import (
+    Pagina, extrair_regras, extrair_regras_modal, extrair_visao_geral,
+    extrair_visao_geral_texto, salvar_pagina_corpus, tem_secao_visao_geral
+)
+from funcoes.navegador import PoolNavegadores, detalhes_prontos, modal_regras_pronto
+from funcoes.ingestao import SinkIngestao
+from funcoes.cache_detalhes import CacheDetalhes
+from funcoes.armazenamento import (
+    carregar_detalhes, carregar_tabela, gravar_detalhes, ler_ids, mesclar_detalhes, salvar_tabela
+)
+
+
+def extrair_detalhes_anuncio(navegador, url):
     """
     Navega para a URL de um anúncio e extrai detalhes como número de quartos,
     camas, banheiros e horários de check-in/check-out.
-    (Esta função permanece inalterada, pois sua lógica interna de extração está correta)
+    O HTML da página é parseado uma única vez e compartilhado pelos extratores.
     """
+    driver = navegador.driver
     # Define a URL base para garantir que estamos na página principal do anúncio
     base_url = url.split('?')[0].split('/house-rules')[0]
 
@@ -26,6 +35,7 @@ def extrair_detalhes_anuncio(driver, url):
     banheiros = None
     horario_checkin = None
     horario_checkout = None
+    pagina = None
 
     # --------------------------------------------------------------------
     # Extrair Quartos, Camas e Banheiros da Página Principal
@@ -34,22 +44,17 @@ def extrair_detalhes_anuncio(driver, url):
     print("  - Extraindo Quartos, Camas e Banheiros...")
     try:
         driver.set_page_load_timeout(20)
-        driver.get(base_url)
-        WebDriverWait(driver, 20).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
-        time.sleep(3)
-
-        soup = BeautifulSoup(driver.page_source, 'html.parser')
-        overview_section = soup.find('div', {'data-plugin-in-point-id': 'OVERVIEW_DEFAULT_V2'})
-        if overview_section:
-            lista_itens = overview_section.find_all('li', class_='l7n4lsf')
-            for item in lista_itens:
-                texto_item = item.get_text(strip=True).replace('·', '').strip()
-                if 'quarto' in texto_item:
-                    quartos = texto_item
-                elif 'cama' in texto_item:
-                    camas = texto_item
-                elif 'banheiro' in texto_item:
-                    banheiros = texto_item
+        # Aguarda a seção de visão geral ou de regras em vez de um sleep fixo
+        navegador.carregar(base_url, detalhes_prontos(), tipo='detalhes', timeout=15)
+
+        page_source = driver.page_source
+        salvar_pagina_corpus(page_source, f"detalhes_{base_url.rstrip('/').rsplit('/', 1)[-1]}")
+        pagina = Pagina(page_source)
+        if tem_secao_visao_geral(pagina):
+            visao_geral = extrair_visao_geral(pagina)
+            quartos = visao_geral.get('Quartos')
+            camas = visao_geral.get('Camas')
+            banheiros = visao_geral.get('Banheiros')
         else:
             print("    Seção de visão geral não encontrada. Tentando método alternativo.")
             try:
@@ -58,12 +63,10 @@ def extrair_detalhes_anuncio(driver, url):
                 items = parent_div.find_elements(By.TAG_NAME, 'span')
                 full_text = ' '.join([item.text for item in items if item.text.strip()])
 
-                q = re.search(r'(\d+\s*quarto|Estúdio)', full_text)
-                c = re.search(r'(\d+\s*cama)', full_text)
-                b = re.search(r'(\d+\s*banheiro)', full_text)
-                if q: quartos = q.group(1)
-                if c: camas = c.group(1)
-                if b: banheiros = b.group(1)
+                visao_geral = extrair_visao_geral_texto(full_text)
+                quartos = visao_geral.get('Quartos')
+                camas = visao_geral.get('Camas')
+                banheiros = visao_geral.get('Banheiros')
             except Exception:
                 pass
 
@@ -80,16 +83,12 @@ def extrair_detalhes_anuncio(driver, url):
     # --------------------------------------------------------------------
     print("  - Extraindo Check-in/Check-out...")
     try:
-        soup_regras = BeautifulSoup(driver.page_source, 'html.parser')
-        policies_section = soup_regras.find('div', {'data-section-id': 'POLICIES_DEFAULT'})
-        if policies_section:
-            rule_items = policies_section.find_all('div', class_='i1303y2k')
-            for item in rule_items:
-                texto_item = item.get_text(strip=True)
-                if 'Check-in' in texto_item:
-                    horario_checkin = texto_item
-                elif 'Checkout' in texto_item:
-                    horario_checkout = texto_item
+        # Reaproveita o documento já parseado acima (antes a página era parseada duas vezes)
+        if pagina is None:
+            pagina = Pagina(driver.page_source)
+        regras = extrair_regras(pagina)
+        horario_checkin = regras.get('Horário de Check-in')
+        horario_checkout = regras.get('Horário de Check-out')
 
         if not horario_checkin or not horario_checkout:
             print("    Check-in/Check-out não encontradas na seção principal, tentando clicar em 'Mostrar mais'...")
@@ -99,16 +98,12 @@ def extrair_detalhes_anuncio(driver, url):
                                                 "//a[contains(., 'Mostrar regras da casa')] | //button[contains(., 'Mostrar mais')]"))
                 )
                 driver.execute_script("arguments[0].click();", show_more_button)
-                time.sleep(2)
-
-                soup_modal = BeautifulSoup(driver.page_source, 'html.parser')
-                modal_rule_items = soup_modal.find_all('div', class_='f15dgkuj')
-                for item in modal_rule_items:
-                    texto_item = item.get_text(strip=True)
-                    if 'Check-in:' in texto_item:
-                        horario_checkin = texto_item
-                    elif 'Checkout:' in texto_item:
-                        horario_checkout = texto_item
+                navegador.aguardar(modal_regras_pronto(), timeout=5)
+
+                # O modal altera o DOM, então esta é a única situação que exige um novo parse
+                regras_modal = extrair_regras_modal(Pagina(driver.page_source))
+                horario_checkin = regras_modal.get('Horário de Check-in', horario_checkin)
+                horario_checkout = regras_modal.get('Horário de Check-out', horario_checkout)
             except (TimeoutException, NoSuchElementException):
                 print("    Botão 'Mostrar mais' para Check-in/Check-out não encontrado.")
             except Exception as e:
@@ -136,9 +131,104 @@ def extrair_detalhes_anuncio(driver, url):
 # Bloco MAIN
 # --------------------------------------------------------------------
 
+def obter_detalhes(pool, cache, id_imovel, url):
+    """
+    Consulta o cache persistente antes de visitar a página: só imóveis novos ou com
+    registro expirado (TTL) são carregados no navegador.
+    """
+    detalhes = cache.obter(id_imovel)
+    if detalhes is not None:
+        print("  > Detalhes obtidos do cache (página não carregada).")
+        return detalhes
+
+    # O pool recicla o navegador ao devolvê-lo se a memória passar do limite
+    with pool.navegador() as navegador:
+        detalhes = extrair_detalhes_anuncio(navegador, url)
+    cache.salvar(id_imovel, detalhes)
+    return detalhes
+
+
+def extrair_detalhes_para_banco():
+    """
+    Modo '--banco': lê do banco os imóveis que ainda não têm detalhes e grava o resultado
+    diretamente na tabela imovel, sem os CSVs parciais e sem a mesclagem final.
+    O checkpoint do sink permite retomar a coleta após uma falha.
+    """
+    with SinkIngestao("detalhes_imoveis", tamanho_lote=50) as sink, CacheDetalhes() as cache:
+        pendentes = [(id_imovel, url) for id_imovel, url in sink.imoveis_sem_detalhes()
+                     if not sink.concluido(str(id_imovel))]
+        print(f"\nEncontrados {len(pendentes)} imóveis sem detalhes no banco.")
+
+        with PoolNavegadores(tamanho=1, bloquear_folhas_estilo=True,
+                             url_aquecimento="https://www.airbnb.com.br") as pool:
+            for posicao, (id_imovel, url) in enumerate(pendentes, start=1):
+                print(f"Processando anúncio {posicao}/{len(pendentes)} (ID: {id_imovel}): {url}")
+                detalhes = obter_detalhes(pool, cache, id_imovel, url)
+                sink.adicionar_detalhes(id_imovel, detalhes)
+                sink.marcar_concluido(str(id_imovel))
+
+            pool.metricas.imprimir_resumo()
+            cache.imprimir_resumo()
+
+    print("\nExtração concluída. Detalhes gravados no banco de dados.")
+
+
+def extrair_detalhes_para_parquet(diretorio_busca, tamanho_lote=25):
+    """
+    Modo Parquet: a entrada é o diretório particionado gerado pelo script 1 com '--parquet'.
+    Apenas as colunas de ID e link são lidas, a retomada lê só a coluna de ID do dataset de
+    detalhes e a mesclagem final é um join do Arrow.
+    """
+    diretorio_base = diretorio_busca.rstrip('/\\')
+    diretorio_detalhes = f"{diretorio_base}_detalhes"
+    arquivo_final = f"{diretorio_base}_completo.parquet"
+
+    links = carregar_tabela(diretorio_busca, colunas=['ID Imóvel', 'Link']).to_pandas()
+    df_para_scrape = links.drop_duplicates(subset=['ID Imóvel']).dropna(subset=['Link'])
+    processed_ids = ler_ids(diretorio_detalhes)
+    df_para_scrape = df_para_scrape[~df_para_scrape['ID Imóvel'].isin(processed_ids)]
+    print(f"\n{len(processed_ids)} imóveis já processados. {len(df_para_scrape)} novos anúncios a processar.")
+
+    lote = []
+    with CacheDetalhes() as cache, PoolNavegadores(tamanho=1, bloquear_folhas_estilo=True,
+                                                   url_aquecimento="https://www.airbnb.com.br") as pool:
+        for posicao, (id_imovel, url) in enumerate(df_para_scrape.itertuples(index=False), start=1):
+            print(f"Processando anúncio {posicao}/{len(df_para_scrape)} (ID: {id_imovel}): {url}")
+            detalhes = dict(obter_detalhes(pool, cache, id_imovel, url))
+            detalhes['ID Imóvel'] = id_imovel
+            lote.append(detalhes)
+
+            # Um arquivo por lote: nada é relido nem reescrito a cada anúncio
+            if len(lote) >= tamanho_lote:
+                gravar_detalhes(pd.DataFrame(lote), diretorio_detalhes)
+                lote = []
+        if lote:
+            gravar_detalhes(pd.DataFrame(lote), diretorio_detalhes)
+
+        pool.metricas.imprimir_resumo()
+        cache.imprimir_resumo()
+
+    print("\nMesclando os detalhes com os dados da busca...")
+    tabela_final = mesclar_detalhes(
+        carregar_tabela(diretorio_busca), carregar_detalhes(diretorio_detalhes)
+    )
+    salvar_tabela(tabela_final, arquivo_final)
+    print(f"\nDados finais salvos com sucesso em '{arquivo_final}'")
+
+
 if __name__ == "__main__":
+    if sys.argv[1:] == ['--banco']:
+        extrair_detalhes_para_banco()
+        sys.exit(0)
+
+    if len(sys.argv) == 2 and os.path.isdir(sys.argv[1]):
+        extrair_detalhes_para_parquet(sys.argv[1])
+        sys.exit(0)
+
     if len(sys.argv) != 2:
         print("Uso: python script.py <nome_do_arquivo.csv>")
+        print("     python script.py <diretorio_parquet>")
+        print("     python script.py --banco")
         sys.exit(1)
 
     input_filename = sys.argv[1]
@@ -170,67 +260,56 @@ if __name__ == "__main__":
         processed_ids = set(df_parcial['ID Imóvel'])
         print(f"Resumindo trabalho. {len(processed_ids)} imóveis já foram processados e serão pulados.")
 
-    options = Options()
-    options.add_argument('--headless')
-    options.set_preference("permissions.default.image", 2)
-    options.set_preference("permissions.default.stylesheet", 2)
-    options.set_preference("gfx.downloadable_fonts.enabled", False)
-
-    print("\nIniciando o navegador Firefox...")
-    driver = webdriver.Firefox(options=options)
-
-    # --- NOVO: Contador para reinício do navegador ---
     processed_in_this_session = 0
     total_a_processar = total_links_unicos - len(processed_ids)
     print(f"\nIniciando a extração para {total_a_processar} novos anúncios únicos...")
 
-    for index, row in df_para_scrape.iterrows():
-        id_imovel = row['ID Imóvel']
-        url = row['Link']
-
-        # --- ALTERADO: Pula se o ID já foi processado ---
-        if id_imovel in processed_ids:
-            continue
-
-        # --- ALTERADO: Lógica de reinício do navegador ---
-        if processed_in_this_session > 0 and processed_in_this_session % 50 == 0:
-            print(f"\n--- Processados {processed_in_this_session} links nesta sessão. Reiniciando o navegador... ---")
-            driver.quit()
-            time.sleep(5)
-            driver = webdriver.Firefox(options=options)
-            print("--- Navegador reiniciado. Continuando a extração... ---\n")
-
-        print(f"Processando anúncio {processed_in_this_session + 1}/{total_a_processar} (ID: {id_imovel}): {url}")
-
-        if pd.notna(url) and isinstance(url, str) and url.startswith("http"):
-            detalhes = extrair_detalhes_anuncio(driver, url)
-        else:
-            print(f"Link inválido ou ausente para o ID Imóvel {id_imovel}. Pulando.")
-            detalhes = {
-                "Quartos": 'Link Inválido', "Camas": 'Link Inválido',
-                "Banheiros": 'Link Inválido', "Horário de Check-in": 'Link Inválido',
-                "Horário de Check-out": 'Link Inválido'
-            }
-
-        # --- NOVO: Anexa o resultado ao arquivo CSV parcial ---
-        detalhes['ID Imóvel'] = id_imovel
-        df_resultado_atual = pd.DataFrame([detalhes])
-
-        # Escreve o cabeçalho apenas se o arquivo não existir
-        escrever_header = not os.path.exists(partial_results_filename)
-
-        df_resultado_atual.to_csv(
-            partial_results_filename,
-            mode='a',  # 'a' para anexar (append)
-            header=escrever_header,
-            index=False
-        )
-        print(f"  > Resultado para ID {id_imovel} salvo em '{partial_results_filename}'")
-
-        processed_in_this_session += 1
+    # --- ALTERADO: Pool de navegadores com bloqueio de recursos e reciclagem por memória ---
+    print("\nIniciando o navegador Firefox...")
+    # --- NOVO: Cache persistente de detalhes, evita recarregar imóveis já vistos em execuções anteriores ---
+    with CacheDetalhes() as cache, PoolNavegadores(tamanho=1, bloquear_folhas_estilo=True,
+                                                   url_aquecimento="https://www.airbnb.com.br") as pool:
+        for index, row in df_para_scrape.iterrows():
+            id_imovel = row['ID Imóvel']
+            url = row['Link']
+
+            # --- ALTERADO: Pula se o ID já foi processado ---
+            if id_imovel in processed_ids:
+                continue
+
+            print(f"Processando anúncio {processed_in_this_session + 1}/{total_a_processar} (ID: {id_imovel}): {url}")
+
+            if pd.notna(url) and isinstance(url, str) and url.startswith("http"):
+                detalhes = dict(obter_detalhes(pool, cache, id_imovel, url))
+            else:
+                print(f"Link inválido ou ausente para o ID Imóvel {id_imovel}. Pulando.")
+                detalhes = {
+                    "Quartos": 'Link Inválido', "Camas": 'Link Inválido',
+                    "Banheiros": 'Link Inválido', "Horário de Check-in": 'Link Inválido',
+                    "Horário de Check-out": 'Link Inválido'
+                }
+
+            # --- NOVO: Anexa o resultado ao arquivo CSV parcial ---
+            detalhes['ID Imóvel'] = id_imovel
+            df_resultado_atual = pd.DataFrame([detalhes])
+
+            # Escreve o cabeçalho apenas se o arquivo não existir
+            escrever_header = not os.path.exists(partial_results_filename)
+
+            df_resultado_atual.to_csv(
+                partial_results_filename,
+                mode='a',  # 'a' para anexar (append)
+                header=escrever_header,
+                index=False
+            )
+            print(f"  > Resultado para ID {id_imovel} salvo em '{partial_results_filename}'")
+
+            processed_in_this_session += 1
+
+        pool.metricas.imprimir_resumo()
+        cache.imprimir_resumo()
 
     print("\nExtração de todos os novos links concluída.")
-    driver.quit()
 
     # --- NOVO: Lógica final para mesclar e salvar ---
     print("\nMapeando dados extraídos de volta para o DataFrame completo...")
@@ -1,25 +1,24 @@
 import pandas as pd
-from selenium import webdriver
-from selenium.webdriver.firefox.options import Options
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import NoSuchElementException, TimeoutException
-from bs4 import BeautifulSoup
-import time
+from selenium.common.exceptions import TimeoutException
 import sys
 import os
-import re
 import multiprocessing
 import numpy as np
 import glob
 
+# Permite importar o pacote 'funcoes' ao executar o script de dentro de 'scripts/'
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from funcoes.extracao import Pagina, extrair_visao_geral, extrair_visao_geral_texto, tem_secao_visao_geral
+from funcoes.navegador import PoolNavegadores, detalhes_prontos
 
-def extrair_detalhes_anuncio(driver, url):
+
+def extrair_detalhes_anuncio(navegador, url):
     """
     Navega para a URL de um anúncio e extrai detalhes como número de quartos,
     camas e banheiros.
     """
+    driver = navegador.driver
     base_url = url.split('?')[0].split('/house-rules')[0]
 
     quartos = None
@@ -31,22 +30,14 @@ def extrair_detalhes_anuncio(driver, url):
     # --------------------------------------------------------------------
     try:
         driver.set_page_load_timeout(20)
-        driver.get(base_url)
-        WebDriverWait(driver, 20).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
-        time.sleep(3)
-
-        soup = BeautifulSoup(driver.page_source, 'html.parser')
-        overview_section = soup.find('div', {'data-plugin-in-point-id': 'OVERVIEW_DEFAULT_V2'})
-        if overview_section:
-            lista_itens = overview_section.find_all('li', class_='l7n4lsf')
-            for item in lista_itens:
-                texto_item = item.get_text(strip=True).replace('·', '').strip()
-                if 'quarto' in texto_item:
-                    quartos = texto_item
-                elif 'cama' in texto_item:
-                    camas = texto_item
-                elif 'banheiro' in texto_item:
-                    banheiros = texto_item
+        navegador.carregar(base_url, detalhes_prontos(), tipo='detalhes', timeout=15)
+
+        pagina = Pagina(driver.page_source)
+        if tem_secao_visao_geral(pagina):
+            visao_geral = extrair_visao_geral(pagina)
+            quartos = visao_geral.get('Quartos')
+            camas = visao_geral.get('Camas')
+            banheiros = visao_geral.get('Banheiros')
         else:
             try:
                 overview_element = driver.find_element(By.XPATH, "//*[contains(text(), 'hóspedes')]")
@@ -54,12 +45,10 @@ def extrair_detalhes_anuncio(driver, url):
                 items = parent_div.find_elements(By.TAG_NAME, 'span')
                 full_text = ' '.join([item.text for item in items if item.text.strip()])
 
-                q = re.search(r'(\d+\s*quarto|Estúdio)', full_text)
-                c = re.search(r'(\d+\s*cama)', full_text)
-                b = re.search(r'(\d+\s*banheiro)', full_text)
-                if q: quartos = q.group(1)
-                if c: camas = c.group(1)
-                if b: banheiros = b.group(1)
+                visao_geral = extrair_visao_geral_texto(full_text)
+                quartos = visao_geral.get('Quartos')
+                camas = visao_geral.get('Camas')
+                banheiros = visao_geral.get('Banheiros')
             except Exception:
                 pass
 
@@ -87,26 +76,21 @@ def worker_process(worker_id, df_chunk, base_name):
 
     worker_results_filename = f"{base_name}_worker_{worker_id}_temp_results.csv"
 
-    options = Options()
-    options.add_argument('--headless')
-    options.set_preference("permissions.default.image", 2)
-    options.set_preference("permissions.default.stylesheet", 2)
-    options.set_preference("gfx.downloadable_fonts.enabled", False)
-
-    driver = webdriver.Firefox(options=options)
+    # Cada worker tem seu próprio pool (um navegador aquecido, reciclado por uso de memória)
+    pool = PoolNavegadores(tamanho=1, bloquear_folhas_estilo=True)
+    pool.iniciar()
 
+    processed_in_this_session = 0
     try:
-        processed_in_this_session = 0
         for index, row in df_chunk.iterrows():
-            # --- REMOVIDO: Bloco de reinicialização do navegador ---
-
             id_imovel = row['ID Imóvel']
             url = row['Link']
 
             print(f"{worker_log_prefix} Processando ID {id_imovel}: {url}")
 
             if pd.notna(url) and isinstance(url, str) and url.startswith("http"):
-                detalhes = extrair_detalhes_anuncio(driver, url)
+                with pool.navegador() as navegador:
+                    detalhes = extrair_detalhes_anuncio(navegador, url)
             else:
                 print(f"{worker_log_prefix} Link inválido para ID {id_imovel}.")
                 detalhes = {
@@ -125,7 +109,8 @@ def worker_process(worker_id, df_chunk, base_name):
         print(f"{worker_log_prefix} OCORREU UM ERRO INESPERADO: {e}")
     finally:
         print(f"{worker_log_prefix} Finalizado. Total processado: {processed_in_this_session}.")
-        driver.quit()
+        pool.metricas.imprimir_resumo()
+        pool.encerrar()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,77 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from funcoes.armazenamento import (  # noqa: E402
+    COLUNA_ID, PYARROW_DISPONIVEL, carregar_detalhes, gravar_detalhes, mesclar_detalhes,
+)
+
+if PYARROW_DISPONIVEL:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+
+def _detalhes(quartos, camas='1 cama', banheiros='1 banheiro'):
+    return pd.DataFrame([{
+        COLUNA_ID: 42, 'Quartos': quartos, 'Camas': camas, 'Banheiros': banheiros,
+        'Horário de Check-in': '15:00', 'Horário de Check-out': '11:00',
+    }])
+
+
+@unittest.skipUnless(PYARROW_DISPONIVEL, "requer pyarrow")
+class MesclarDetalhesTests(unittest.TestCase):
+
+    def setUp(self):
+        self.diretorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.diretorio)
+        self.busca = pa.table({COLUNA_ID: pa.array([42, 7], pa.int64())})
+        self.agora = datetime.now(timezone.utc)
+
+    def _mesclar(self, detalhes=None):
+        if detalhes is None:
+            detalhes = carregar_detalhes(self.diretorio)
+        linhas = mesclar_detalhes(self.busca, detalhes).to_pylist()
+        return {linha[COLUNA_ID]: linha for linha in linhas}
+
+    def test_vale_a_extracao_mais_recente_em_qualquer_ordem_de_arquivos(self):
+        gravar_detalhes(_detalhes('3 quartos'), self.diretorio, self.agora)
+        gravar_detalhes(_detalhes('1 quarto'), self.diretorio, self.agora - timedelta(days=10))
+        detalhes = carregar_detalhes(self.diretorio)
+        self.assertEqual(detalhes.num_rows, 2)
+
+        # As duas ordens de leitura das partes dão o mesmo resultado
+        for tabela in (detalhes, detalhes.take([1, 0])):
+            resultado = self._mesclar(tabela)
+            self.assertEqual(resultado[42]['Quartos'], 3)
+            self.assertIsNone(resultado[7]['Quartos'])
+            self.assertNotIn('Extraído em', resultado[42])
+
+    def test_registro_mais_recente_vale_inteiro(self):
+        ontem = self.agora - timedelta(days=1)
+        gravar_detalhes(_detalhes('2 quartos', banheiros='2 banheiros'), self.diretorio, ontem)
+        gravar_detalhes(_detalhes('3 quartos', banheiros=None), self.diretorio, self.agora)
+
+        resultado = self._mesclar()[42]
+        self.assertEqual(resultado['Quartos'], 3)
+        self.assertIsNone(resultado['Banheiros'])
+
+    def test_partes_antigas_sem_data_perdem_para_as_novas(self):
+        gravar_detalhes(_detalhes('3 quartos'), self.diretorio, self.agora)
+        antiga = pa.table({
+            COLUNA_ID: pa.array([42], pa.int64()), 'Quartos': pa.array([1], pa.int16()),
+            'Camas': pa.array([1], pa.int16()), 'Banheiros': pa.array([1], pa.int16()),
+            'Horário de Check-in': ['14:00'], 'Horário de Check-out': ['10:00'],
+        })
+        pq.write_table(antiga, os.path.join(self.diretorio, 'parte-0-antiga.parquet'))
+
+        self.assertEqual(self._mesclar()[42]['Quartos'], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from funcoes.cache_detalhes import CacheDetalhes  # noqa: E402
+
+DETALHES = {
+    'Quartos': '2 quartos', 'Camas': '3 camas', 'Banheiros': '1 banheiro',
+    'Horário de Check-in': '15:00', 'Horário de Check-out': '11:00',
+}
+
+
+class CacheDetalhesTests(unittest.TestCase):
+
+    def setUp(self):
+        arquivo = tempfile.NamedTemporaryFile(suffix='.sqlite3', delete=False)
+        arquivo.close()
+        self.caminho = arquivo.name
+        self.addCleanup(os.remove, self.caminho)
+
+    def test_falha_parcial_nao_entra_no_cache(self):
+        with CacheDetalhes(self.caminho) as cache:
+            cache.salvar(1, {**DETALHES, 'Quartos': 'Erro'})
+            cache.salvar(2, {**DETALHES, 'Banheiros': None})
+            cache.salvar(3, DETALHES)
+            self.assertIsNone(cache.obter(1))
+            self.assertIsNone(cache.obter(2))
+            self.assertEqual(cache.obter(3), DETALHES)
+
+    def test_visto_em_gravado_em_lote(self):
+        with CacheDetalhes(self.caminho, lote_visto_em=2) as cache:
+            for id_imovel in (1, 2, 3):
+                cache.salvar(id_imovel, DETALHES)
+            cache.conn.execute("UPDATE detalhes_imovel SET visto_em = '2000-01-01T00:00:00'")
+            cache.conn.commit()
+            cache.obter(1)
+            cache.obter(3)
+            cache.obter(2)
+            # O lote de dois acertos já foi gravado; o terceiro só ao fechar
+            self.assertEqual(len(cache._vistos), 1)
+
+        with sqlite3.connect(self.caminho) as conn:
+            vistos = [visto_em for visto_em, in conn.execute("SELECT visto_em FROM detalhes_imovel")]
+        self.assertEqual(len(vistos), 3)
+        self.assertNotIn('2000-01-01T00:00:00', vistos)
+
+
+if __name__ == '__main__':
+    unittest.main()
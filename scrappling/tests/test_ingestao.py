@@ -0,0 +1,23 @@
+import os
+import sys
+import unittest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from funcoes.ingestao import _campo_copy  # noqa: E402
+
+
+class CampoCopyTests(unittest.TestCase):
+
+    def test_nulo(self):
+        self.assertEqual(_campo_copy(None), '\\N')
+
+    def test_caracteres_de_controle_nao_quebram_o_lote(self):
+        self.assertEqual(_campo_copy('Casa\r\nno\tcentro'), 'Casa  no centro')
+
+    def test_barra_invertida_escapada(self):
+        self.assertEqual(_campo_copy('a\\b'), 'a\\\\b')
+        self.assertEqual(_campo_copy(12.5), '12.5')
+
+
+if __name__ == '__main__':
+    unittest.main()